@@ -6,9 +6,15 @@ Gestione centralizzata delle impostazioni e configurazioni
 
 import os
 import json
+import tempfile
 from pathlib import Path
 from typing import Dict, Any, Optional
-from PyQt6.QtCore import QStandardPaths
+from PyQt6.QtCore import QStandardPaths, QRunnable, QThreadPool
+
+try:
+    import orjson  # Serializzazione più veloce, opzionale
+except ImportError:
+    orjson = None
 
 
 class AppConfig:
@@ -99,6 +105,9 @@ class AppConfig:
         # Export e salvataggio
         "default_export_format": "json",
         "export_directory": "",
+        "last_save_dir": "",       # Ultime cartelle usate nei dialog dei file
+        "last_load_dir": "",
+        "last_attach_dir": "",
         "include_timestamps": True,
         "include_model_info": True,
         "include_project_info": True,
@@ -234,16 +243,16 @@ def load_user_settings() -> Dict[str, Any]:
     # Carica impostazioni salvate se esistono
     if settings_file.exists():
         try:
-            with open(settings_file, 'r', encoding='utf-8') as f:
-                user_settings = json.load(f)
-                
-                # Valida e merge le impostazioni
-                for key, value in user_settings.items():
-                    if key in AppConfig.DEFAULT_SETTINGS:
-                        if AppConfig.validate_setting(key, value):
-                            settings[key] = value
-                        else:
-                            print(f"⚠️ Impostazione non valida ignorata: {key}={value}")
+            data = settings_file.read_bytes()
+            user_settings = orjson.loads(data) if orjson else json.loads(data)
+            
+            # Valida e merge le impostazioni
+            for key, value in user_settings.items():
+                if key in AppConfig.DEFAULT_SETTINGS:
+                    if AppConfig.validate_setting(key, value):
+                        settings[key] = value
+                    else:
+                        print(f"⚠️ Impostazione non valida ignorata: {key}={value}")
         
         except (json.JSONDecodeError, FileNotFoundError, PermissionError) as e:
             print(f"⚠️ Errore nel caricamento delle impostazioni: {e}")
@@ -269,9 +278,25 @@ def save_user_settings(settings: Dict[str, Any]) -> bool:
                 else:
                     print(f"⚠️ Impostazione non valida non salvata: {key}={value}")
         
-        # Salva su file
-        with open(settings_file, 'w', encoding='utf-8') as f:
-            json.dump(valid_settings, f, indent=2, ensure_ascii=False)
+        # Serializza
+        if orjson:
+            data = orjson.dumps(valid_settings, option=orjson.OPT_INDENT_2)
+        else:
+            data = json.dumps(valid_settings, indent=2, ensure_ascii=False).encode('utf-8')
+        
+        # Scrittura atomica: file temporaneo univoco e poi sostituzione
+        fd, tmp_name = tempfile.mkstemp(dir=settings_file.parent,
+                                        prefix=settings_file.name + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_name, settings_file)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
         
         return True
         
@@ -280,6 +305,42 @@ def save_user_settings(settings: Dict[str, Any]) -> bool:
         return False
 
 
+class SaveSettingsTask(QRunnable):
+    """Salvataggio delle impostazioni in un thread del pool"""
+    
+    def __init__(self, settings: Dict[str, Any]):
+        super().__init__()
+        # Copia: il dizionario originale può cambiare durante il salvataggio
+        self.settings = dict(settings)
+    
+    def run(self):
+        save_user_settings(self.settings)
+
+
+_save_pool: Optional[QThreadPool] = None
+
+
+def _get_save_pool() -> QThreadPool:
+    """Pool dedicato ai salvataggi: un solo thread, quindi uno alla volta e in ordine"""
+    global _save_pool
+    if _save_pool is None:
+        _save_pool = QThreadPool()
+        _save_pool.setMaxThreadCount(1)
+    return _save_pool
+
+
+def save_user_settings_async(settings: Dict[str, Any]):
+    """Salva le impostazioni utente senza bloccare il thread della GUI"""
+    _get_save_pool().start(SaveSettingsTask(settings))
+
+
+def wait_for_pending_saves(timeout_ms: int = 2000) -> bool:
+    """Attende il completamento dei salvataggi in corso"""
+    if _save_pool is None:
+        return True
+    return _save_pool.waitForDone(timeout_ms)
+
+
 def reset_user_settings() -> bool:
     """Ripristina le impostazioni di default"""
     try:
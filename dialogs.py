@@ -16,11 +16,15 @@ from PyQt6.QtWidgets import (
     QProgressBar, QScrollArea, QGridLayout, QFrame, QSpacerItem,
     QSizePolicy, QDialogButtonBox, QPlainTextEdit, QSizePolicy
 )
-from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QThread
+from PyQt6.QtCore import Qt, pyqtSignal, QThread
 from PyQt6.QtGui import QFont, QPixmap, QPalette
 
 from project_manager import ProjectManager, FileManager, KnowledgeBase
 from widgets import ProjectCard, LoadingIndicator, CustomProgressBar
+from utils import get_font
+
+# Caratteri massimi mostrati nell'anteprima di un file
+PREVIEW_MAX_CHARS = 200_000
 
 
 class ModernDialog(QDialog):
@@ -114,7 +118,7 @@ class ProjectCreationDialog(ModernDialog):
         self.name_input.setPlaceholderText("Es: Progetto Marketing 2024")
         self.name_input.textChanged.connect(self.validate_inputs)
         # Font coerente
-        self.name_input.setFont(QFont("Segoe UI", 12, QFont.Weight.Normal))
+        self.name_input.setFont(get_font(12, QFont.Weight.Normal))
         self.name_input.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         
         # Descrizione
@@ -122,7 +126,7 @@ class ProjectCreationDialog(ModernDialog):
         self.description_input.setObjectName("projectDescInput")
         self.description_input.setPlaceholderText("Descrivi brevemente il progetto...")
         self.description_input.setMaximumHeight(100)
-        self.description_input.setFont(QFont("Segoe UI", 12, QFont.Weight.Normal))
+        self.description_input.setFont(get_font(12, QFont.Weight.Normal))
         self.description_input.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
         
         # Template progetto
@@ -135,7 +139,7 @@ class ProjectCreationDialog(ModernDialog):
             "Progetto Ricerca",
             "Progetto Personale"
         ])
-        self.template_combo.setFont(QFont("Segoe UI", 12, QFont.Weight.Normal))
+        self.template_combo.setFont(get_font(12, QFont.Weight.Normal))
         self.template_combo.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         
         form_layout.addRow("📛 Nome Progetto:", self.name_input)
@@ -150,11 +154,11 @@ class ProjectCreationDialog(ModernDialog):
         
         self.auto_backup_check = QCheckBox("Backup automatico")
         self.auto_backup_check.setChecked(True)
-        self.auto_backup_check.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.auto_backup_check.setFont(get_font(11, QFont.Weight.Normal))
         
         self.enable_search_check = QCheckBox("Abilita ricerca full-text")
         self.enable_search_check.setChecked(True)
-        self.enable_search_check.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.enable_search_check.setFont(get_font(11, QFont.Weight.Normal))
         
         advanced_layout.addWidget(self.auto_backup_check)
         advanced_layout.addWidget(self.enable_search_check)
@@ -167,13 +171,13 @@ class ProjectCreationDialog(ModernDialog):
         self.cancel_btn = QPushButton("❌ Annulla")
         self.cancel_btn.setObjectName("secondaryButton")
         self.cancel_btn.clicked.connect(self.reject)
-        self.cancel_btn.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.cancel_btn.setFont(get_font(12, QFont.Weight.Medium))
         
         self.create_btn = QPushButton("✨ Crea Progetto")
         self.create_btn.setObjectName("primaryButton")
         self.create_btn.clicked.connect(self.accept_project)
         self.create_btn.setEnabled(False)
-        self.create_btn.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.create_btn.setFont(get_font(12, QFont.Weight.Medium))
         
         buttons_layout.addWidget(self.cancel_btn)
         buttons_layout.addStretch()
@@ -219,13 +223,6 @@ class KnowledgeDialog(ModernDialog):
         
         self.setup_knowledge_ui()
         self.load_projects()
-
-        # Forza l'applicazione degli stili dopo il caricamento
-        QTimer.singleShot(100, self._refresh_styles)
-    
-    def _refresh_styles(self):
-        """Riapplica gli stili al dialog"""
-        self.setStyleSheet(self.styleSheet())
     
     def setup_knowledge_ui(self):
         """Configura l'interfaccia della knowledge base"""
@@ -252,19 +249,19 @@ class KnowledgeDialog(ModernDialog):
         self.new_project_btn = QPushButton("✨ Nuovo Progetto")
         self.new_project_btn.setObjectName("primaryButton")
         self.new_project_btn.clicked.connect(self.create_new_project)
-        self.new_project_btn.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.new_project_btn.setFont(get_font(12, QFont.Weight.Medium))
         
         self.import_files_btn = QPushButton("📁 Importa File")
         self.import_files_btn.setObjectName("secondaryButton")
         self.import_files_btn.clicked.connect(self.import_files)
         self.import_files_btn.setEnabled(False)
-        self.import_files_btn.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.import_files_btn.setFont(get_font(12, QFont.Weight.Medium))
         
         self.export_project_btn = QPushButton("📤 Esporta")
         self.export_project_btn.setObjectName("secondaryButton")
         self.export_project_btn.clicked.connect(self.export_project)
         self.export_project_btn.setEnabled(False)
-        self.export_project_btn.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.export_project_btn.setFont(get_font(12, QFont.Weight.Medium))
         
         actions_layout.addWidget(self.new_project_btn)
         actions_layout.addWidget(self.import_files_btn)
@@ -294,14 +291,14 @@ class KnowledgeDialog(ModernDialog):
         # Header
         header = QLabel("🚀 I Miei Progetti")
         header.setObjectName("panelTitle")
-        header.setFont(QFont("Segoe UI", 14, QFont.Weight.DemiBold))
+        header.setFont(get_font(14, QFont.Weight.DemiBold))
         header.setAlignment(Qt.AlignmentFlag.AlignCenter)
         
         # Stats
         self.stats_label = QLabel("0 progetti • 0 file totali")
         self.stats_label.setObjectName("statsLabel")
         self.stats_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.stats_label.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.stats_label.setFont(get_font(11, QFont.Weight.Normal))
         
         layout.addWidget(header)
         layout.addWidget(self.stats_label)
@@ -330,7 +327,7 @@ class KnowledgeDialog(ModernDialog):
         self.delete_project_btn.setObjectName("warningButton")
         self.delete_project_btn.clicked.connect(self.delete_project)
         self.delete_project_btn.setEnabled(False)
-        self.delete_project_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.delete_project_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         project_actions.addWidget(self.delete_project_btn)
         project_actions.addStretch()
@@ -378,7 +375,7 @@ class KnowledgeDialog(ModernDialog):
         # Font coerenti
         for label in [self.project_name_label, self.project_desc_label, 
                      self.project_created_label, self.project_files_count_label]:
-            label.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+            label.setFont(get_font(11, QFont.Weight.Normal))
         
         info_layout.addRow("📛 Nome:", self.project_name_label)
         info_layout.addRow("📝 Descrizione:", self.project_desc_label)
@@ -395,13 +392,13 @@ class KnowledgeDialog(ModernDialog):
         self.knowledge_summary.setObjectName("knowledgeSummary")
         self.knowledge_summary.setMaximumHeight(200)
         self.knowledge_summary.setReadOnly(True)
-        self.knowledge_summary.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.knowledge_summary.setFont(get_font(11, QFont.Weight.Normal))
         
         self.generate_summary_btn = QPushButton("🔄 Genera Riassunto")
         self.generate_summary_btn.setObjectName("primaryButton")
         self.generate_summary_btn.clicked.connect(self.generate_summary)
         self.generate_summary_btn.setEnabled(False)
-        self.generate_summary_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.generate_summary_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         summary_layout.addWidget(self.knowledge_summary)
         summary_layout.addWidget(self.generate_summary_btn)
@@ -420,13 +417,13 @@ class KnowledgeDialog(ModernDialog):
         header_layout = QHBoxLayout()
         
         files_title = QLabel("📁 File del Progetto")
-        files_title.setFont(QFont("Segoe UI", 12, QFont.Weight.DemiBold))
+        files_title.setFont(get_font(12, QFont.Weight.DemiBold))
         
         self.add_files_btn = QPushButton("➕ Aggiungi File")
         self.add_files_btn.setObjectName("primaryButton")
         self.add_files_btn.clicked.connect(self.add_files_to_project)
         self.add_files_btn.setEnabled(False)
-        self.add_files_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.add_files_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         header_layout.addWidget(files_title)
         header_layout.addStretch()
@@ -440,7 +437,7 @@ class KnowledgeDialog(ModernDialog):
         self.files_tree.itemDoubleClicked.connect(self.preview_file)
         self.files_tree.itemSelectionChanged.connect(self.on_file_selected)
         # Font coerente
-        self.files_tree.setFont(QFont("Segoe UI", 10, QFont.Weight.Normal))
+        self.files_tree.setFont(get_font(10, QFont.Weight.Normal))
         
         layout.addWidget(self.files_tree)
         
@@ -451,13 +448,13 @@ class KnowledgeDialog(ModernDialog):
         self.preview_file_btn.setObjectName("secondaryButton")
         self.preview_file_btn.clicked.connect(self.preview_selected_file)
         self.preview_file_btn.setEnabled(False)
-        self.preview_file_btn.setFont(QFont("Segoe UI", 10, QFont.Weight.Medium))
+        self.preview_file_btn.setFont(get_font(10, QFont.Weight.Medium))
         
         self.remove_file_btn = QPushButton("🗑️ Rimuovi")
         self.remove_file_btn.setObjectName("warningButton")
         self.remove_file_btn.clicked.connect(self.remove_file)
         self.remove_file_btn.setEnabled(False)
-        self.remove_file_btn.setFont(QFont("Segoe UI", 10, QFont.Weight.Medium))
+        self.remove_file_btn.setFont(get_font(10, QFont.Weight.Medium))
         
         file_actions.addWidget(self.preview_file_btn)
         file_actions.addWidget(self.remove_file_btn)
@@ -476,17 +473,17 @@ class KnowledgeDialog(ModernDialog):
         search_layout = QHBoxLayout()
         
         search_label = QLabel("🔍 Cerca:")
-        search_label.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        search_label.setFont(get_font(11, QFont.Weight.Medium))
         
         self.knowledge_search = QLineEdit()
         self.knowledge_search.setPlaceholderText("Cerca nei contenuti...")
         self.knowledge_search.returnPressed.connect(self.search_knowledge)
-        self.knowledge_search.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.knowledge_search.setFont(get_font(11, QFont.Weight.Normal))
         
         self.search_btn = QPushButton("🔍")
         self.search_btn.setObjectName("primaryButton")
         self.search_btn.clicked.connect(self.search_knowledge)
-        self.search_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.search_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         search_layout.addWidget(search_label)
         search_layout.addWidget(self.knowledge_search)
@@ -498,7 +495,7 @@ class KnowledgeDialog(ModernDialog):
         self.search_results = QTextEdit()
         self.search_results.setPlaceholderText("I risultati della ricerca appariranno qui...")
         self.search_results.setReadOnly(True)
-        self.search_results.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.search_results.setFont(get_font(11, QFont.Weight.Normal))
         
         layout.addWidget(self.search_results)
         
@@ -644,12 +641,11 @@ class KnowledgeDialog(ModernDialog):
             progress = CustomProgressBar()
             progress.setRange(0, len(files))
             
-            added_count = 0
-            for i, file_path in enumerate(files):
-                result = self.file_manager.add_file(file_path, self.current_project['id'])
-                if result['status'] == 'added':
-                    added_count += 1
-                progress.setValue(i + 1)
+            # Un solo commit per tutti i file selezionati
+            results = self.file_manager.add_files(
+                files, self.current_project['id'], progress_callback=progress.setValue
+            )
+            added_count = sum(1 for result in results if result['status'] == 'added')
             
             self.load_project_files()
             self.update_project_info()
@@ -684,8 +680,11 @@ class KnowledgeDialog(ModernDialog):
         if not self.file_manager:
             return
         
-        content = self.file_manager.get_file_content(file_id)
+        # Per i file molto grandi si legge e mostra solo la parte iniziale
+        content = self.file_manager.get_file_content(file_id, length=PREVIEW_MAX_CHARS + 1)
         if content:
+            if len(content) > PREVIEW_MAX_CHARS:
+                content = content[:PREVIEW_MAX_CHARS] + "\n\n... (anteprima troncata)"
             dialog = FilePreviewDialog(content, self)
             dialog.exec()
     
@@ -798,7 +797,7 @@ class FilePreviewDialog(ModernDialog):
         self.content_display = QPlainTextEdit()
         self.content_display.setPlainText(content)
         self.content_display.setReadOnly(True)
-        self.content_display.setFont(QFont("Consolas", 10, QFont.Weight.Normal))
+        self.content_display.setFont(get_font(10, QFont.Weight.Normal, "Consolas"))
         
         self.add_content_widget(self.content_display)
         
@@ -806,7 +805,7 @@ class FilePreviewDialog(ModernDialog):
         close_btn = QPushButton("✅ Chiudi")
         close_btn.setObjectName("primaryButton")
         close_btn.clicked.connect(self.accept)
-        close_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        close_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         button_layout = QHBoxLayout()
         button_layout.addStretch()
@@ -852,17 +851,17 @@ class SettingsDialog(ModernDialog):
         reset_btn = QPushButton("🔄 Ripristina")
         reset_btn.setObjectName("secondaryButton")
         reset_btn.clicked.connect(self.reset_settings)
-        reset_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        reset_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         apply_btn = QPushButton("✅ Applica")
         apply_btn.setObjectName("primaryButton")
         apply_btn.clicked.connect(self.apply_settings)
-        apply_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        apply_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         cancel_btn = QPushButton("❌ Annulla")
         cancel_btn.setObjectName("secondaryButton")
         cancel_btn.clicked.connect(self.reject)
-        cancel_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        cancel_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         buttons_layout.addWidget(reset_btn)
         buttons_layout.addStretch()
@@ -879,7 +878,7 @@ class SettingsDialog(ModernDialog):
         # URL Server
         self.server_url_input = QLineEdit()
         self.server_url_input.setText(self.current_settings.get("server_url", "http://localhost:11434"))
-        self.server_url_input.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.server_url_input.setFont(get_font(11, QFont.Weight.Normal))
         self.server_url_input.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         
         # Timeout
@@ -887,13 +886,13 @@ class SettingsDialog(ModernDialog):
         self.timeout_spin.setRange(5, 300)
         self.timeout_spin.setValue(self.current_settings.get("request_timeout", 30))
         self.timeout_spin.setSuffix(" secondi")
-        self.timeout_spin.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.timeout_spin.setFont(get_font(11, QFont.Weight.Normal))
         self.timeout_spin.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         
         # Auto refresh
         self.auto_refresh_check = QCheckBox()
         self.auto_refresh_check.setChecked(self.current_settings.get("auto_refresh_models", True))
-        self.auto_refresh_check.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.auto_refresh_check.setFont(get_font(11, QFont.Weight.Normal))
         self.auto_refresh_check.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         
         layout.addRow("🌐 URL Server:", self.server_url_input)
@@ -911,23 +910,23 @@ class SettingsDialog(ModernDialog):
         self.font_size_spin = QSpinBox()
         self.font_size_spin.setRange(8, 20)
         self.font_size_spin.setValue(self.current_settings.get("font_size", 11))
-        self.font_size_spin.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.font_size_spin.setFont(get_font(11, QFont.Weight.Normal))
         
         # Timestamp
         self.show_timestamps_check = QCheckBox()
         self.show_timestamps_check.setChecked(self.current_settings.get("show_timestamps", True))
-        self.show_timestamps_check.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.show_timestamps_check.setFont(get_font(11, QFont.Weight.Normal))
         
         # Animazioni
         self.animations_check = QCheckBox()
         self.animations_check.setChecked(self.current_settings.get("animations", True))
-        self.animations_check.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.animations_check.setFont(get_font(11, QFont.Weight.Normal))
         
         # Theme
         self.theme_combo = QComboBox()
         self.theme_combo.addItems(["Light", "Dark"])
         self.theme_combo.setCurrentText(self.current_settings.get("theme", "light").capitalize())
-        self.theme_combo.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.theme_combo.setFont(get_font(11, QFont.Weight.Normal))
 
         layout.addRow("🎨 Tema:", self.theme_combo)
         layout.addRow("📝 Dimensione Font:", self.font_size_spin)
@@ -945,18 +944,18 @@ class SettingsDialog(ModernDialog):
         self.max_messages_spin = QSpinBox()
         self.max_messages_spin.setRange(50, 1000)
         self.max_messages_spin.setValue(self.current_settings.get("max_messages", 200))
-        self.max_messages_spin.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.max_messages_spin.setFont(get_font(11, QFont.Weight.Normal))
         
         # Knowledge
         self.use_knowledge_check = QCheckBox()
         self.use_knowledge_check.setChecked(self.current_settings.get("use_knowledge", True))
-        self.use_knowledge_check.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.use_knowledge_check.setFont(get_font(11, QFont.Weight.Normal))
         
         # Context length
         self.context_length_spin = QSpinBox()
         self.context_length_spin.setRange(500, 5000)
         self.context_length_spin.setValue(self.current_settings.get("knowledge_context_length", 2000))
-        self.context_length_spin.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        self.context_length_spin.setFont(get_font(11, QFont.Weight.Normal))
         
         layout.addRow("💬 Max Messaggi:", self.max_messages_spin)
         layout.addRow("🧠 Usa Knowledge Base:", self.use_knowledge_check)
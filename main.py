@@ -8,8 +8,9 @@ Versione refactorizzata con stile centralizzato e coerente
 import sys
 import os
 import json
+import logging
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget,
@@ -25,17 +26,39 @@ from widgets import MessageWidget, SmartScrollArea, LoadingIndicator, Collapsibl
 from project_manager import ProjectManager, FileManager, KnowledgeBase
 from ollama_worker import OllamaWorker, ConnectionMonitor
 from dialogs import KnowledgeDialog, SettingsDialog, ProjectCreationDialog
-from config import AppConfig, load_user_settings, save_user_settings
-from utils import format_timestamp, sanitize_filename, show_error_dialog
+from config import AppConfig, load_user_settings, save_user_settings_async, wait_for_pending_saves
+from utils import format_timestamp, sanitize_filename, show_error_dialog, get_font
+
+logger = logging.getLogger(__name__)
+
+# Filtri dei dialog di selezione file
+CHAT_FILE_FILTER = "JSON Files (*.json);;Text Files (*.txt)"
+ALL_FILES_FILTER = "Tutti i file (*.*)"
+
+
+def connect_unique(signal, slot):
+    """Connette un segnale a uno slot una sola volta (ignora i duplicati)"""
+    try:
+        signal.connect(slot, Qt.ConnectionType.UniqueConnection)
+    except TypeError:
+        # Connessione già presente
+        pass
 
 
 class ChatArea(QWidget):
     """Area principale della chat ottimizzata con stile coerente"""
-    
+
+    # Messaggi renderizzati per volta quando si carica una cronologia
+    HISTORY_PAGE_SIZE = 50
+    # Oltre questa soglia i messaggi più vecchi tornano in archivio (come dati)
+    MAX_RENDERED_MESSAGES = 2 * HISTORY_PAGE_SIZE
+
     def __init__(self, settings: Dict[str, Any], parent=None):
         super().__init__(parent)
         self.settings = settings
         self.messages = []
+        # Messaggi più vecchi non ancora renderizzati (caricati a richiesta)
+        self.archived_messages = []
         self.current_response_widget = None
         self.setup_ui()
     
@@ -65,6 +88,7 @@ class ChatArea(QWidget):
         self.messages_layout.addStretch()
         
         self.scroll_area.setWidget(self.messages_container)
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self.on_scroll_changed)
         layout.addWidget(self.scroll_area, 1)
         
         # Area input
@@ -83,7 +107,7 @@ class ChatArea(QWidget):
         # Titolo chat - usa font coerente
         self.chat_title = QLabel("💬 Seleziona un modello per iniziare")
         self.chat_title.setObjectName("chatTitle")
-        self.chat_title.setFont(QFont("Segoe UI", 18, QFont.Weight.DemiBold))
+        self.chat_title.setFont(get_font(18, QFont.Weight.DemiBold))
         self.chat_title.setWordWrap(True)
         self.chat_title.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
         
@@ -91,7 +115,8 @@ class ChatArea(QWidget):
         self.typing_indicator = QLabel()
         self.typing_indicator.setObjectName("typingIndicator")
         self.typing_indicator.setVisible(False)
-        self.typing_indicator.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.typing_text = None  # Testo mostrato, None se nascosto
+        self.typing_indicator.setFont(get_font(12, QFont.Weight.Medium))
         self.typing_indicator.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
         
         layout.addWidget(self.chat_title)
@@ -113,7 +138,7 @@ class ChatArea(QWidget):
         # Context info
         self.context_label = QLabel("📚 Context: Nessun progetto attivo")
         self.context_label.setObjectName("contextLabel")
-        self.context_label.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.context_label.setFont(get_font(11, QFont.Weight.Medium))
         self.context_label.setWordWrap(True)
         self.context_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
         
@@ -125,7 +150,7 @@ class ChatArea(QWidget):
         self.message_input.setObjectName("messageInput")
         self.message_input.setPlaceholderText("Scrivi il tuo messaggio qui... ✨")
         self.message_input.setMinimumHeight(45)
-        self.message_input.setFont(QFont("Segoe UI", 13, QFont.Weight.Normal))
+        self.message_input.setFont(get_font(13, QFont.Weight.Normal))
         
         # Pulsante allega
         self.attach_btn = QPushButton("📎")
@@ -138,7 +163,7 @@ class ChatArea(QWidget):
         self.send_btn.setObjectName("sendButton")
         self.send_btn.setMinimumSize(100, 45)
         self.send_btn.setEnabled(False)
-        self.send_btn.setFont(QFont("Segoe UI", 13, QFont.Weight.Medium))
+        self.send_btn.setFont(get_font(13, QFont.Weight.Medium))
         self.send_btn.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed)
         
         # Pulsante stop
@@ -146,7 +171,7 @@ class ChatArea(QWidget):
         self.stop_btn.setObjectName("stopButton")
         self.stop_btn.setMinimumSize(100, 45)
         self.stop_btn.setVisible(False)
-        self.stop_btn.setFont(QFont("Segoe UI", 13, QFont.Weight.Medium))
+        self.stop_btn.setFont(get_font(13, QFont.Weight.Medium))
         self.stop_btn.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed)
         
         input_row.addWidget(self.message_input)
@@ -161,6 +186,13 @@ class ChatArea(QWidget):
     
     def add_message(self, content: str, is_user: bool = True) -> MessageWidget:
         """Aggiunge un messaggio alla chat"""
+        # Con la vista in fondo i messaggi più vecchi non sono visibili:
+        # si possono archiviare senza spostare ciò che l'utente sta leggendo
+        scrollbar = self.scroll_area.verticalScrollBar()
+        if (len(self.messages) >= self.MAX_RENDERED_MESSAGES
+                and scrollbar.value() >= scrollbar.maximum() - scrollbar.pageStep() // 2):
+            self.archive_oldest_messages(len(self.messages) - self.HISTORY_PAGE_SIZE + 1)
+        
         message_widget = MessageWidget(
             content, is_user, 
             settings=self.settings
@@ -177,7 +209,65 @@ class ChatArea(QWidget):
             QTimer.singleShot(100, self.scroll_area.smooth_scroll_to_bottom)
         
         return message_widget
-    
+
+    def load_history(self, messages: List[Dict[str, Any]]):
+        """Carica una cronologia renderizzando solo gli ultimi messaggi"""
+        page_size = self.HISTORY_PAGE_SIZE
+        self.archived_messages = list(messages[:-page_size])
+
+        # Inserimento in blocco prima dello stretch, con un solo scroll finale
+        self.insert_message_widgets(len(self.messages), messages[-page_size:])
+        if self.settings.get("smart_scroll", True):
+            QTimer.singleShot(100, self.scroll_area.smooth_scroll_to_bottom)
+
+    def on_scroll_changed(self, value: int):
+        """Carica i messaggi più vecchi quando si raggiunge l'inizio della chat"""
+        if value == 0 and self.archived_messages:
+            self.load_older_messages()
+
+    def load_older_messages(self):
+        """Inserisce in cima la pagina successiva di messaggi archiviati"""
+        page = self.archived_messages[-self.HISTORY_PAGE_SIZE:]
+        del self.archived_messages[-self.HISTORY_PAGE_SIZE:]
+
+        scrollbar = self.scroll_area.verticalScrollBar()
+        previous_maximum = scrollbar.maximum()
+
+        self.insert_message_widgets(0, page)
+
+        # Mantieni la posizione visibile dopo l'inserimento in cima
+        QTimer.singleShot(0, lambda: scrollbar.setValue(scrollbar.maximum() - previous_maximum))
+
+    def insert_message_widgets(self, index: int, records: List[Dict[str, Any]]):
+        """Crea e inserisce in blocco i widget di più messaggi a partire da index"""
+        # Niente ridisegni intermedi: un solo aggiornamento per tutto il blocco
+        self.messages_container.setUpdatesEnabled(False)
+        try:
+            widgets = [
+                MessageWidget(msg_data["content"], msg_data["role"] == "user", settings=self.settings)
+                for msg_data in records
+            ]
+            for offset, widget in enumerate(widgets):
+                self.messages_layout.insertWidget(index + offset, widget)
+            self.messages[index:index] = widgets
+        finally:
+            self.messages_container.setUpdatesEnabled(True)
+
+    def archive_oldest_messages(self, count: int):
+        """Distrugge i widget dei messaggi più vecchi conservandone solo i dati"""
+        widgets = self.messages[:count]
+        del self.messages[:count]
+        
+        # Tornano in coda all'archivio: load_older_messages li ricrea a richiesta
+        self.archived_messages.extend(widget.get_message_data() for widget in widgets)
+        for widget in widgets:
+            self.messages_layout.removeWidget(widget)
+            widget.deleteLater()
+
+    def get_messages_data(self) -> List[Dict[str, Any]]:
+        """Restituisce tutti i messaggi, inclusi quelli non ancora renderizzati"""
+        return self.archived_messages + [widget.get_message_data() for widget in self.messages]
+
     def update_current_response(self, content: str):
         """Aggiorna la risposta corrente (streaming)"""
         if self.current_response_widget:
@@ -191,6 +281,7 @@ class ChatArea(QWidget):
     
     def clear_messages(self):
         """Pulisce tutti i messaggi"""
+        self.archived_messages = []
         while self.messages:
             widget = self.messages.pop()
             widget.deleteLater()
@@ -211,11 +302,17 @@ class ChatArea(QWidget):
     
     def show_typing_indicator(self, message: str = "🤖 Generando risposta..."):
         """Mostra l'indicatore di digitazione"""
+        if self.typing_text == message:
+            return
+        self.typing_text = message
         self.typing_indicator.setText(message)
         self.typing_indicator.setVisible(True)
     
     def hide_typing_indicator(self):
         """Nasconde l'indicatore di digitazione"""
+        if self.typing_text is None:
+            return
+        self.typing_text = None
         self.typing_indicator.setVisible(False)
 
 
@@ -297,7 +394,7 @@ class Sidebar(QWidget):
         
         self.manage_projects_btn = QPushButton("🧠 Gestisci Progetti")
         self.manage_projects_btn.setObjectName("primaryButton")
-        self.manage_projects_btn.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.manage_projects_btn.setFont(get_font(12, QFont.Weight.Medium))
         self.manage_projects_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         
         layout.addWidget(title)
@@ -316,11 +413,11 @@ class Sidebar(QWidget):
         
         self.model_combo = QComboBox()
         self.model_combo.setObjectName("modernCombo")
-        self.model_combo.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.model_combo.setFont(get_font(12, QFont.Weight.Medium))
         
         self.refresh_models_btn = QPushButton("🔄 Aggiorna")
         self.refresh_models_btn.setObjectName("secondaryButton")
-        self.refresh_models_btn.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.refresh_models_btn.setFont(get_font(12, QFont.Weight.Medium))
         
         layout.addWidget(title)
         layout.addWidget(self.model_combo)
@@ -338,17 +435,17 @@ class Sidebar(QWidget):
         
         self.new_chat_btn = QPushButton("✨ Nuova Chat")
         self.new_chat_btn.setObjectName("primaryButton")
-        self.new_chat_btn.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.new_chat_btn.setFont(get_font(12, QFont.Weight.Medium))
         
         buttons_row = QHBoxLayout()
         
         self.save_chat_btn = QPushButton("💾 Salva")
         self.save_chat_btn.setObjectName("secondaryButton")
-        self.save_chat_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.save_chat_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         self.load_chat_btn = QPushButton("📂 Carica")
         self.load_chat_btn.setObjectName("secondaryButton")
-        self.load_chat_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.load_chat_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         buttons_row.addWidget(self.save_chat_btn)
         buttons_row.addWidget(self.load_chat_btn)
@@ -369,11 +466,11 @@ class Sidebar(QWidget):
         
         self.clear_chat_btn = QPushButton("🗑️ Cancella Chat")
         self.clear_chat_btn.setObjectName("warningButton")
-        self.clear_chat_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.clear_chat_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         self.export_chat_btn = QPushButton("📤 Esporta Chat")
         self.export_chat_btn.setObjectName("secondaryButton")
-        self.export_chat_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.export_chat_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         layout.addWidget(title)
         layout.addWidget(self.clear_chat_btn)
@@ -444,7 +541,7 @@ class Sidebar(QWidget):
         
         self.manage_projects_btn = QPushButton("🧠 Gestisci Progetti")
         self.manage_projects_btn.setObjectName("primaryButton")
-        self.manage_projects_btn.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.manage_projects_btn.setFont(get_font(12, QFont.Weight.Medium))
         self.manage_projects_btn.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
 
         self.project_section.add_widget(self.current_project_label)
@@ -453,11 +550,11 @@ class Sidebar(QWidget):
     def setup_model_section(self):
         self.model_combo = QComboBox()
         self.model_combo.setObjectName("modernCombo")
-        self.model_combo.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.model_combo.setFont(get_font(12, QFont.Weight.Medium))
         
         self.refresh_models_btn = QPushButton("🔄 Aggiorna")
         self.refresh_models_btn.setObjectName("secondaryButton")
-        self.refresh_models_btn.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.refresh_models_btn.setFont(get_font(12, QFont.Weight.Medium))
 
         self.model_section.add_widget(self.model_combo)
         self.model_section.add_widget(self.refresh_models_btn)
@@ -465,17 +562,17 @@ class Sidebar(QWidget):
     def setup_chat_section(self):
         self.new_chat_btn = QPushButton("✨ Nuova Chat")
         self.new_chat_btn.setObjectName("primaryButton")
-        self.new_chat_btn.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        self.new_chat_btn.setFont(get_font(12, QFont.Weight.Medium))
         
         buttons_row = QHBoxLayout()
         
         self.save_chat_btn = QPushButton("💾 Salva")
         self.save_chat_btn.setObjectName("secondaryButton")
-        self.save_chat_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.save_chat_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         self.load_chat_btn = QPushButton("📂 Carica")
         self.load_chat_btn.setObjectName("secondaryButton")
-        self.load_chat_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.load_chat_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         buttons_row.addWidget(self.save_chat_btn)
         buttons_row.addWidget(self.load_chat_btn)
@@ -486,11 +583,11 @@ class Sidebar(QWidget):
     def setup_actions_section(self):
         self.clear_chat_btn = QPushButton("🗑️ Cancella Chat")
         self.clear_chat_btn.setObjectName("warningButton")
-        self.clear_chat_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.clear_chat_btn.setFont(get_font(11, QFont.Weight.Medium))
         
         self.export_chat_btn = QPushButton("📤 Esporta Chat")
         self.export_chat_btn.setObjectName("secondaryButton")
-        self.export_chat_btn.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.export_chat_btn.setFont(get_font(11, QFont.Weight.Medium))
 
         self.actions_section.add_widget(self.clear_chat_btn)
         self.actions_section.add_widget(self.export_chat_btn)
@@ -523,6 +620,31 @@ class Sidebar(QWidget):
 class OllamaChatMainWindow(QMainWindow):
     """Finestra principale dell'applicazione con stile coerente"""
     
+    # Testo del dialog Informazioni: solo server e progetto cambiano
+    ABOUT_TEMPLATE = """
+        <h2>🚀 Ollama Chat - Knowledge Edition</h2>
+        <p><b>Versione:</b> 1.0</p>
+        <p><b>Descrizione:</b> Sistema completo di chat con AI e knowledge base</p>
+        
+        <h3>✨ Caratteristiche:</h3>
+        <ul>
+        <li>🧠 Knowledge Base con gestione progetti</li>
+        <li>📁 Gestione file avanzata</li>
+        <li>🔍 Ricerca intelligente nei contenuti</li>
+        <li>💬 Chat con streaming in tempo reale</li>
+        <li>🎨 Interfaccia moderna e coerente</li>
+        <li>⚙️ Configurazione completa</li>
+        </ul>
+        
+        <h3>🌐 Server Corrente:</h3>
+        <p>{server_url}</p>
+        
+        <h3>📁 Progetto Attivo:</h3>
+        <p>{project_name}</p>
+        
+        <p><i>Sviluppato con PyQt6 e design pulito e professionale! ✨</i></p>
+        """
+    
     def __init__(self):
         super().__init__()
         
@@ -535,6 +657,8 @@ class OllamaChatMainWindow(QMainWindow):
         self.knowledge_base = None
         self.current_project = None
         self.file_manager = None
+        # Conteggio file per progetto, aggiornato in modo incrementale
+        self._project_file_counts: Dict[str, int] = {}
         
         # Worker Ollama
         self.ollama_worker = None
@@ -548,6 +672,10 @@ class OllamaChatMainWindow(QMainWindow):
         self.current_model = None
         self.is_generating = False
         self.current_response = ""
+        # Ultimo stato applicato al pulsante di invio
+        self._last_can_send = None
+        # Foglio di stile applicato all'applicazione
+        self._applied_stylesheet = None
         
         self.theme_manager = ThemeManager(self.settings.get("theme", "light"))
         self.settings_dialog = None
@@ -556,11 +684,13 @@ class OllamaChatMainWindow(QMainWindow):
         self.setup_ui()
         self.setup_connections()
         self.apply_theme()
+        self.start_workers()
 
     def open_settings_dialog(self):
         if not self.settings_dialog:
             self.settings_dialog = SettingsDialog(self.settings, self)
-        self.settings_dialog.settings_changed.connect(self.on_settings_changed)
+        # Il dialog viene riutilizzato: evita di collegare lo slot più volte
+        connect_unique(self.settings_dialog.settings_changed, self.on_settings_changed)
         self.settings_dialog.exec()
 
     def apply_theme(self):
@@ -722,28 +852,38 @@ class OllamaChatMainWindow(QMainWindow):
         
         # Worker connections
         if self.ollama_worker:
-            self.ollama_worker.models_received.connect(self.on_models_received)
-            self.ollama_worker.message_chunk_received.connect(self.on_message_chunk)
-            self.ollama_worker.message_completed.connect(self.on_message_completed)
-            self.ollama_worker.error_occurred.connect(self.on_error_occurred)
-            self.ollama_worker.connection_status_changed.connect(self.on_connection_changed)
-            self.ollama_worker.generation_stopped.connect(self.on_generation_stopped)
+            worker = self.ollama_worker
+            connect_unique(worker.models_received, self.on_models_received)
+            connect_unique(worker.message_chunk_received, self.on_message_chunk)
+            connect_unique(worker.message_completed, self.on_message_completed)
+            connect_unique(worker.error_occurred, self.on_error_occurred)
+            connect_unique(worker.connection_status_changed, self.on_connection_changed)
+            connect_unique(worker.generation_stopped, self.on_generation_stopped)
     
     def start_workers(self):
         """Avvia i thread worker"""
         if self.ollama_worker:
-            # Avvia connection monitor
+            # Avvia connection monitor (polling con QTimer sul thread principale)
             self.connection_monitor = ConnectionMonitor(
-                self.ollama_worker.request_manager
+                self.settings.get("server_url", "http://localhost:11434"),
+                self.settings.get("check_connection_interval", 30),
+                self.settings.get("connection_timeout", 10),
+                self
             )
-            self.connection_monitor.connection_changed.connect(self.on_connection_changed)
+            connect_unique(self.connection_monitor.connection_changed, self.on_connection_changed)
             self.connection_monitor.start()
     
     def apply_theme(self):
         """Applica il tema all'applicazione"""
         theme_manager = ThemeManager(self.settings.get("theme", "clean_professional"))
         stylesheet = theme_manager.get_themed_stylesheet()
-        self.setStyleSheet(stylesheet)
+        
+        # Un solo foglio di stile per tutta l'applicazione (dialog compresi):
+        # Qt lo analizza una volta. Riapplicarlo identico forzerebbe comunque
+        # un nuovo polish di tutti i widget
+        if stylesheet is not self._applied_stylesheet:
+            QApplication.instance().setStyleSheet(stylesheet)
+            self._applied_stylesheet = stylesheet
         
         # Aggiorna info server nella sidebar
         server_url = self.settings.get("server_url", "http://localhost:11434")
@@ -819,6 +959,10 @@ class OllamaChatMainWindow(QMainWindow):
         has_model = bool(self.current_model)
         can_send = has_model and not self.is_generating
         
+        # Evita di richiamare Qt ad ogni tasto se lo stato non cambia
+        if can_send == self._last_can_send:
+            return
+        self._last_can_send = can_send
         self.chat_area.send_btn.setEnabled(can_send)
     
     # Tutti gli altri metodi rimangono invariati ma con stili coerenti
@@ -849,23 +993,25 @@ class OllamaChatMainWindow(QMainWindow):
         self.chat_area.current_response_widget = self.chat_area.add_message("", is_user=False)
         
         # Ottieni contesto dalla knowledge base
+        settings = self.settings
+        use_knowledge = settings.get("use_knowledge", True)
+        context_length = settings.get("knowledge_context_length", 2000)
+        project = self.current_project
+        
         context = ""
-        if self.current_project and self.settings.get("use_knowledge", True):
-            print(f"DEBUG: current_project = {self.current_project['name'] if self.current_project else None}")
-            print(f"DEBUG: use_knowledge = {self.settings.get('use_knowledge', True)}")
-            print(f"DEBUG: knowledge_context_length = {self.settings.get('knowledge_context_length', 2000)}")
+        if project and use_knowledge:
+            logger.debug("Contesto knowledge: progetto=%s, lunghezza massima=%d",
+                         project['name'], context_length)
 
             context = self.knowledge_base.get_context_for_query(
                 message_text, 
-                self.current_project['id'],
-                self.settings.get("knowledge_context_length", 2000)
+                project['id'],
+                context_length
             )
-            print(f"DEBUG: Generated context length: {len(context)}")
-            if context:
-                print(f"DEBUG: Context preview: {context[:200]}...")
+            logger.debug("Contesto generato: %d caratteri", len(context))
         else:
-            print(f"DEBUG: No context generation - current_project={self.current_project is not None}, use_knowledge={self.settings.get('use_knowledge', True)}")
-            self.chat_area.show_typing_indicator("🧠 Generando con knowledge base...")
+            logger.debug("Nessun contesto: progetto=%s, use_knowledge=%s",
+                         project is not None, use_knowledge)
             self.chat_area.show_typing_indicator()
         
         # Aggiorna UI
@@ -915,24 +1061,31 @@ class OllamaChatMainWindow(QMainWindow):
             self.ollama_worker.clear_conversation()
         self.status_bar.showMessage("🗑️ Chat pulita")
     
+    def get_last_dir(self, key: str) -> str:
+        """Restituisce l'ultima cartella usata per un dialog (default: home)"""
+        last_dir = self.settings.get(key)
+        if last_dir and Path(last_dir).is_dir():
+            return last_dir
+        return str(Path.home())
+    
     def save_chat(self):
         """Salva la chat"""
         if not self.chat_area.messages:
             QMessageBox.information(self, "Salva Chat", "Non ci sono messaggi da salvare.")
             return
         
+        start_dir = self.get_last_dir("last_save_dir")
         filename, _ = QFileDialog.getSaveFileName(
             self, "Salva Chat",
-            f"chat_{format_timestamp()}.json",
-            "JSON Files (*.json);;Text Files (*.txt)"
+            str(Path(start_dir) / f"chat_{format_timestamp()}.json"),
+            CHAT_FILE_FILTER
         )
         
         if filename:
+            self.settings["last_save_dir"] = str(Path(filename).parent)
             try:
-                messages_data = []
-                for widget in self.chat_area.messages:
-                    messages_data.append(widget.get_message_data())
-                
+                messages_data = self.chat_area.get_messages_data()
+
                 with open(filename, 'w', encoding='utf-8') as f:
                     json.dump({
                         "timestamp": format_timestamp(),
@@ -949,12 +1102,13 @@ class OllamaChatMainWindow(QMainWindow):
     def load_chat(self):
         """Carica una chat"""
         filename, _ = QFileDialog.getOpenFileName(
-            self, "Carica Chat", "",
-            "JSON Files (*.json);;Text Files (*.txt)"
+            self, "Carica Chat", self.get_last_dir("last_load_dir"),
+            CHAT_FILE_FILTER
         )
         
         if not filename:
             return
+        self.settings["last_load_dir"] = str(Path(filename).parent)
         
         try:
             with open(filename, 'r', encoding='utf-8') as f:
@@ -963,18 +1117,15 @@ class OllamaChatMainWindow(QMainWindow):
             # Pulisci chat corrente
             self.clear_chat()
             
-            # Carica messaggi
-            messages = data.get("messages", [])
-            for msg_data in messages:
-                is_user = msg_data["role"] == "user"
-                self.chat_area.add_message(msg_data["content"], is_user)
+            # Carica messaggi (solo l'ultima pagina, il resto su scroll)
+            self.chat_area.load_history(data.get("messages", []))
             
-            # Imposta modello se disponibile
-            if "model" in data and data["model"] in [
-                self.sidebar.model_combo.itemText(i) 
-                for i in range(self.sidebar.model_combo.count())
-            ]:
-                self.sidebar.model_combo.setCurrentText(data["model"])
+            # Imposta modello se disponibile (findText scansiona lato C++)
+            model_name = data.get("model")
+            if model_name:
+                index = self.sidebar.model_combo.findText(model_name)
+                if index >= 0:
+                    self.sidebar.model_combo.setCurrentIndex(index)
             
             self.status_bar.showMessage(f"📂 Chat caricata da {Path(filename).name}")
             
@@ -993,7 +1144,10 @@ class OllamaChatMainWindow(QMainWindow):
     def show_knowledge_dialog(self):
         """Mostra il dialog della knowledge base"""
         dialog = KnowledgeDialog(self.project_manager, self)
-        if dialog.exec() == QDialog.DialogCode.Accepted:
+        result = dialog.exec()
+        # Il dialog può aggiungere o rimuovere file: invalida i conteggi
+        self._project_file_counts.clear()
+        if result == QDialog.DialogCode.Accepted:
             # Aggiorna progetto corrente se cambiato
             if dialog.current_project:
                 self.set_current_project(dialog.current_project['id'])
@@ -1016,16 +1170,24 @@ class OllamaChatMainWindow(QMainWindow):
             self.file_manager = FileManager(str(project_dir))
             
             # Aggiorna UI
-            files_count = len(self.file_manager.get_files(project_id))
-            self.sidebar.update_project_info(self.current_project['name'], files_count)
-            
-            # Aggiorna context info
-            self.chat_area.set_context_info(
-                f"📚 Context: {self.current_project['name']} ({files_count} file)"
-            )
+            self.update_project_display(self.get_project_files_count(project_id))
             
             self.status_bar.showMessage(f"📁 Progetto attivo: {self.current_project['name']}")
     
+    def get_project_files_count(self, project_id: str) -> int:
+        """Restituisce il numero di file del progetto, contandoli solo se non in cache"""
+        files_count = self._project_file_counts.get(project_id)
+        if files_count is None:
+            files_count = len(self.file_manager.get_files(project_id))
+            self._project_file_counts[project_id] = files_count
+        return files_count
+    
+    def update_project_display(self, files_count: int):
+        """Aggiorna sidebar e context info del progetto corrente"""
+        project_name = self.current_project['name']
+        self.sidebar.update_project_info(project_name, files_count)
+        self.chat_area.set_context_info(f"📚 Context: {project_name} ({files_count} file)")
+    
     def attach_files(self):
         """Allega file al progetto corrente"""
         if not self.current_project:
@@ -1041,28 +1203,30 @@ class OllamaChatMainWindow(QMainWindow):
         # Apri dialog per selezionare file
         files, _ = QFileDialog.getOpenFileNames(
             self, "Seleziona File da Allegare",
-            "", "Tutti i file (*.*)"
+            self.get_last_dir("last_attach_dir"), ALL_FILES_FILTER
         )
         
+        if files:
+            self.settings["last_attach_dir"] = str(Path(files[0]).parent)
+        
         if files and self.file_manager:
-            added_count = 0
-            for file_path in files:
-                result = self.file_manager.add_file(file_path, self.current_project['id'])
-                if result['status'] == 'added':
-                    added_count += 1
+            project_id = self.current_project['id']
+            files_count = self.get_project_files_count(project_id)
+            # Un solo commit per tutti i file selezionati
+            results = self.file_manager.add_files(files, project_id)
+            added_count = sum(1 for result in results if result['status'] == 'added')
             
             if added_count > 0:
-                # Aggiorna info progetto
-                files_count = len(self.file_manager.get_files(self.current_project['id']))
-                self.sidebar.update_project_info(self.current_project['name'], files_count)
-                self.chat_area.set_context_info(
-                    f"📚 Context: {self.current_project['name']} ({files_count} file)"
-                )
+                # Aggiorna info progetto senza ricontare i file
+                files_count += added_count
+                self._project_file_counts[project_id] = files_count
+                self.update_project_display(files_count)
                 
                 self.status_bar.showMessage(f"📎 Aggiunti {added_count} file al progetto")
     
     def show_settings(self):
         """Mostra il dialog delle impostazioni"""
+        # Nuovo dialog ad ogni apertura: la connessione non può duplicarsi
         dialog = SettingsDialog(self.settings, self)
         dialog.settings_changed.connect(self.on_settings_changed)
         dialog.exec()
@@ -1071,11 +1235,13 @@ class OllamaChatMainWindow(QMainWindow):
     def on_settings_changed(self, new_settings):
         """Gestisce il cambio delle impostazioni"""
         self.settings.update(new_settings)
-        save_user_settings(self.settings)
+        save_user_settings_async(self.settings)
         
         # Aggiorna worker
         if self.ollama_worker:
             self.ollama_worker.update_settings(self.settings)
+        if self.connection_monitor:
+            self.connection_monitor.set_base_url(self.settings.get("server_url", "http://localhost:11434"))
         
         # Riapplica tema
         self.apply_theme()
@@ -1084,29 +1250,10 @@ class OllamaChatMainWindow(QMainWindow):
     
     def show_about(self):
         """Mostra informazioni sull'applicazione"""
-        about_text = f"""
-        <h2>🚀 Ollama Chat - Knowledge Edition</h2>
-        <p><b>Versione:</b> 1.0</p>
-        <p><b>Descrizione:</b> Sistema completo di chat con AI e knowledge base</p>
-        
-        <h3>✨ Caratteristiche:</h3>
-        <ul>
-        <li>🧠 Knowledge Base con gestione progetti</li>
-        <li>📁 Gestione file avanzata</li>
-        <li>🔍 Ricerca intelligente nei contenuti</li>
-        <li>💬 Chat con streaming in tempo reale</li>
-        <li>🎨 Interfaccia moderna e coerente</li>
-        <li>⚙️ Configurazione completa</li>
-        </ul>
-        
-        <h3>🌐 Server Corrente:</h3>
-        <p>{self.settings.get('server_url', 'Non configurato')}</p>
-        
-        <h3>📁 Progetto Attivo:</h3>
-        <p>{self.current_project['name'] if self.current_project else 'Nessuno'}</p>
-        
-        <p><i>Sviluppato con PyQt6 e design pulito e professionale! ✨</i></p>
-        """
+        about_text = self.ABOUT_TEMPLATE.format(
+            server_url=self.settings.get('server_url', 'Non configurato'),
+            project_name=self.current_project['name'] if self.current_project else 'Nessuno'
+        )
         
         QMessageBox.about(self, "Informazioni", about_text)
     
@@ -1115,17 +1262,19 @@ class OllamaChatMainWindow(QMainWindow):
         # Salva impostazioni finestra
         self.settings["window_width"] = self.width()
         self.settings["window_height"] = self.height()
-        save_user_settings(self.settings)
+        save_user_settings_async(self.settings)
         
         # Ferma i worker
         if self.connection_monitor:
-            self.connection_monitor.requestInterruption()
-            self.connection_monitor.wait(3000)
+            self.connection_monitor.stop()
         
         if self.ollama_worker:
             self.ollama_worker.requestInterruption()
             self.ollama_worker.wait(3000)
         
+        # Assicura che le impostazioni siano state scritte prima di uscire
+        wait_for_pending_saves(2000)
+        
         event.accept()
 
 
@@ -1140,6 +1289,16 @@ def main():
         print("💡 Installa con: pip install PyQt6 requests")
         return 1
     
+    # Logging: i messaggi di debug dei worker sono visibili solo se richiesti
+    log_settings = load_user_settings()
+    if log_settings.get("debug_mode"):
+        log_level = logging.DEBUG
+    elif log_settings.get("enable_logging"):
+        log_level = log_settings.get("log_level", "INFO")
+    else:
+        log_level = logging.WARNING
+    logging.basicConfig(level=log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    
     # Crea applicazione
     app = QApplication(sys.argv)
     app.setApplicationName("Ollama Chat")
@@ -1150,8 +1309,11 @@ def main():
     # Imposta stile e font predefinito
     app.setStyle('Fusion')
     
-    # Font dell'applicazione
-    default_font = QFont("Segoe UI", 11, QFont.Weight.Normal)
+    # Font dell'applicazione: i fogli di stile non ripetono font-family in
+    # ogni regola, la famiglia principale (con i fallback) arriva da qui
+    default_font = QFont(get_font(11, QFont.Weight.Normal))  # copia: get_font è condiviso
+    default_font.setFamilies([family.strip().strip('"')
+                              for family in StyleManager.FONTS['primary'].split(',')])
     app.setFont(default_font)
     
     # Crea e mostra finestra principale
@@ -4,13 +4,49 @@ Ollama Worker - VERSIONE CORRETTA con gestione timeout migliorata
 """
 
 import json
+import socket
+import http.client
+import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
 import threading
 import time
+import queue
 import random
+from urllib.parse import urlsplit
+from collections import deque
 from enum import Enum
-from typing import List, Dict, Optional, Any, Iterator
-from PyQt6.QtCore import QThread, pyqtSignal, QMutex, QWaitCondition
+from itertools import chain
+from typing import List, Dict, Optional, Any, Iterator, Tuple, Deque
+from PyQt6.QtCore import QThread, QObject, QTimer, QUrl, pyqtSignal, QMutex
+from PyQt6.QtNetwork import QTcpSocket
+
+try:
+    import orjson  # Parser JSON in C, molto più veloce sui chunk piccoli
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+    
+    def json_dumps(obj: Any) -> bytes:
+        """Serializza in bytes UTF-8 come orjson.dumps"""
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+logger = logging.getLogger(__name__)
+
+# Dimensione massima di ogni lettura dallo stream di risposta
+STREAM_READ_SIZE = 65536
+
+# Letture massime dopo la riga "done" per arrivare alla fine della risposta
+DRAIN_MAX_READS = 4
+
+# Chiavi cercate direttamente nei chunk NDJSON (evita il parse completo)
+CONTENT_KEY = b'"content":"'
+DONE_TRUE = b'"done":true'
+BACKSLASH = 0x5C
 
 
 class OllamaError(Exception):
@@ -28,40 +64,181 @@ class RequestState(Enum):
     ERROR = "error"
 
 
+class LocalHttpClient:
+    """Client HTTP minimale per un server Ollama locale
+    
+    Usa direttamente http.client: sul loopback lo stack requests/urllib3
+    costa più della rete stessa. Gestisce solo le POST in streaming.
+    """
+    
+    LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+    
+    # Header fissi, preparati una sola volta
+    HEADERS = {
+        'Content-Type': 'application/json',
+        'User-Agent': 'OllamaChat/1.0',
+        'Accept-Encoding': 'identity',
+    }
+    
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.connection: Optional[http.client.HTTPConnection] = None
+    
+    @classmethod
+    def for_url(cls, base_url: str) -> Optional['LocalHttpClient']:
+        """Restituisce un client se l'URL punta a un server locale in chiaro"""
+        parts = urlsplit(base_url)
+        if parts.scheme != 'http' or parts.hostname not in cls.LOCAL_HOSTS:
+            return None
+        return cls(parts.hostname, parts.port or 80)
+    
+    def close(self):
+        """Chiude la connessione persistente"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+    
+    def post_stream(self, path: str, body: bytes, connection_timeout: float,
+                    read_timeout: float) -> Iterator[bytes]:
+        """Invia una POST e restituisce i blocchi della risposta man mano che arrivano"""
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=connection_timeout, blocksize=STREAM_READ_SIZE
+            )
+        connection = self.connection
+        
+        try:
+            if connection.sock is None:
+                connection.connect()
+            connection.sock.settimeout(read_timeout)
+            connection.request('POST', path, body=body, headers=self.HEADERS)
+            response = connection.getresponse()
+        except Exception:
+            # Connessione keep-alive chiusa dal server o errore di rete
+            self.close()
+            raise
+        
+        if response.status >= 400:
+            detail = response.read()[:200].decode('utf-8', 'replace')
+            self.close()
+            raise OllamaError(f"HTTP {response.status} {response.reason}: {detail}")
+        
+        return self._read_blocks(response)
+    
+    def _read_blocks(self, response: http.client.HTTPResponse) -> Iterator[bytes]:
+        """Legge i blocchi della risposta (chunked decodificato da http.client)"""
+        completed = False
+        tail = b''
+        try:
+            while True:
+                block = response.read1(STREAM_READ_SIZE)
+                if not block:
+                    completed = True
+                    return
+                # Riga "done" ricevuta: il chiamante smetterà di leggere, quindi
+                # si consuma subito il terminatore chunked per riusare la connessione
+                if DONE_TRUE in tail + block[:len(DONE_TRUE)] or DONE_TRUE in block:
+                    completed = self._drain(response)
+                    yield block
+                    return
+                tail = block[-len(DONE_TRUE):]
+                yield block
+        finally:
+            # Risposta letta a metà (stop o errore): la connessione non è riutilizzabile
+            if not completed:
+                self.close()
+    
+    @staticmethod
+    def _drain(response: http.client.HTTPResponse) -> bool:
+        """Legge la risposta fino alla fine (al massimo qualche blocco)
+        
+        Restituisce True se la risposta è stata consumata del tutto.
+        """
+        try:
+            for _ in range(DRAIN_MAX_READS):
+                if not response.read1(STREAM_READ_SIZE):
+                    return True
+        except (OSError, http.client.HTTPException) as e:
+            logger.debug("Errore leggendo la fine della risposta: %s", e)
+        return False
+
+
+class StreamingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter con opzioni socket adatte allo streaming dei token"""
+    
+    # I default di urllib3 includono già TCP_NODELAY; qui solo un buffer di ricezione più ampio
+    SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20),
+    ]
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+
 class RequestManager:
     """Pure networking layer with FIXED timeout handling"""
     
-    def __init__(self, base_url: str, connection_timeout: int = 10, read_timeout: int = 60, max_retries: int = 3):
+    # Sessioni condivise per server: conservano le connessioni keep-alive
+    _sessions: Dict[str, requests.Session] = {}
+    _sessions_lock = threading.Lock()
+    
+    def __init__(self, base_url: str, connection_timeout: int = 10, read_timeout: int = 60,
+                 max_retries: int = 3, session: Optional[requests.Session] = None):
         self.base_url = base_url.rstrip('/')
         self.connection_timeout = connection_timeout
         self.read_timeout = read_timeout  # NUOVO: timeout separato per la lettura
         self.max_retries = max_retries
-        self.session = requests.Session()
+        self.session = session or self.get_session(self.base_url)
+        # Percorso veloce per i server locali (None per quelli remoti)
+        self.local_client = LocalHttpClient.for_url(self.base_url)
         self.state = RequestState.IDLE
         
-        # Headers di default
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'User-Agent': 'OllamaChat/1.0'
-        })
-        
-        print(f"DEBUG: RequestManager initialized with connection_timeout={connection_timeout}, read_timeout={read_timeout}")
+        logger.debug("RequestManager initialized with connection_timeout=%s, read_timeout=%s", connection_timeout, read_timeout)
+    
+    @classmethod
+    def get_session(cls, base_url: str) -> requests.Session:
+        """Restituisce la sessione condivisa per il server, creandola se necessario"""
+        with cls._sessions_lock:
+            session = cls._sessions.get(base_url)
+            if session is None:
+                session = requests.Session()
+                # Pool più ampio; i retry sono gestiti dal nostro backoff
+                adapter = StreamingHTTPAdapter(pool_connections=4, pool_maxsize=32,
+                                               pool_block=False, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                # Headers di default
+                session.headers.update({
+                    'Content-Type': 'application/json',
+                    'User-Agent': 'OllamaChat/1.0',
+                    'Connection': 'keep-alive'
+                })
+                cls._sessions[base_url] = session
+            return session
+    
+    def _set_state(self, state: RequestState):
+        """Aggiorna lo stato della richiesta solo se cambia"""
+        if self.state is not state:
+            self.state = state
     
     def _exponential_backoff(self, attempt: int) -> float:
         """Calcola delay per retry con backoff esponenziale"""
-        base_delay = 1.0
-        max_delay = 30.0
-        delay = min(base_delay * (2 ** attempt) + random.uniform(0, 1), max_delay)
-        return delay
+        # Jitter a ogni tentativo, così i client non ritentano tutti insieme
+        delay = (1 << attempt) + random.random()
+        return delay if delay < 30.0 else 30.0
     
     def _should_retry(self, exception: Exception, attempt: int) -> bool:
         """Determina se ritentare la richiesta"""
         if attempt >= self.max_retries:
             return False
         
-        # Retry per errori di rete temporanei
+        # Retry per errori di rete temporanei (anche dal client locale)
         if isinstance(exception, (requests.exceptions.ConnectionError,
-                                requests.exceptions.Timeout)):
+                                requests.exceptions.Timeout,
+                                ConnectionError, TimeoutError,
+                                http.client.RemoteDisconnected)):
             return True
         
         # Retry per status code 5xx
@@ -77,8 +254,8 @@ class RequestManager:
         
         for attempt in range(self.max_retries + 1):
             try:
-                print(f"DEBUG: Getting models (attempt {attempt + 1})")
-                self.state = RequestState.CONNECTING
+                logger.debug("Getting models (attempt %s)", attempt + 1)
+                self._set_state(RequestState.CONNECTING)
                 
                 # USA SOLO CONNECTION TIMEOUT per le richieste non-streaming
                 response = self.session.get(
@@ -89,18 +266,18 @@ class RequestManager:
                 
                 data = response.json()
                 models = [model['name'] for model in data.get('models', [])]
-                self.state = RequestState.COMPLETED
-                print(f"DEBUG: Found {len(models)} models")
+                self._set_state(RequestState.COMPLETED)
+                logger.debug("Found %s models", len(models))
                 return sorted(models)
                 
             except Exception as e:
                 last_exception = e
-                self.state = RequestState.ERROR
-                print(f"DEBUG: Error getting models (attempt {attempt + 1}): {e}")
+                self._set_state(RequestState.ERROR)
+                logger.debug("Error getting models (attempt %s): %s", attempt + 1, e)
                 
                 if self._should_retry(e, attempt):
                     delay = self._exponential_backoff(attempt)
-                    print(f"DEBUG: Retrying in {delay:.1f}s...")
+                    logger.debug("Retrying in %.1fs...", delay)
                     time.sleep(delay)
                     continue
                 else:
@@ -110,8 +287,11 @@ class RequestManager:
         raise OllamaError(f"Errore nel recuperare i modelli: {str(last_exception)}")
     
     def chat_stream(self, model: str, messages: List[Dict], 
-                   options: Dict = None, stop_event: threading.Event = None) -> Iterator[Dict]:
-        """Invia una richiesta di chat con streaming e TIMEOUT CORRETTO"""
+                   options: Dict = None, stop_event: threading.Event = None) -> Iterator[Tuple[str, bool]]:
+        """Invia una richiesta di chat con streaming e TIMEOUT CORRETTO
+        
+        Restituisce coppie (contenuto, done) per ogni chunk ricevuto.
+        """
         payload = {
             "model": model,
             "messages": messages,
@@ -121,121 +301,218 @@ class RequestManager:
         if options:
             payload["options"] = options
         
-        print(f"DEBUG: Starting chat stream with model={model}")
-        print(f"DEBUG: Using timeout=(connect={self.connection_timeout}, read={self.read_timeout})")
+        # Serializza una sola volta: i retry riutilizzano lo stesso corpo
+        body = json_dumps(payload)
+        
+        logger.debug("Starting chat stream with model=%s", model)
+        logger.debug("Using timeout=(connect=%s, read=%s)", self.connection_timeout, self.read_timeout)
         
         last_exception = None
+        # Metodo legato una sola volta: il controllo nel loop è una sola chiamata C
+        is_stopped = stop_event.is_set if stop_event else (lambda: False)
         
         for attempt in range(self.max_retries + 1):
             try:
-                self.state = RequestState.CONNECTING
-                print(f"DEBUG: Chat stream attempt {attempt + 1}")
+                self._set_state(RequestState.CONNECTING)
+                logger.debug("Chat stream attempt %s", attempt + 1)
                 
                 # Controllo stop prima di iniziare
-                if stop_event and stop_event.is_set():
-                    print("DEBUG: Stop requested before connection")
-                    self.state = RequestState.STOPPED
+                if is_stopped():
+                    logger.debug("Stop requested before connection")
+                    self._set_state(RequestState.STOPPED)
                     return
                 
-                # USA TIMEOUT SEPARATI: connection per connessione, read per stream
-                response = self.session.post(
-                    f"{self.base_url}/api/chat",
-                    json=payload,
-                    stream=True,
-                    timeout=(self.connection_timeout, self.read_timeout)  # CORRETTO!
-                )
-                response.raise_for_status()
+                if self.local_client is not None:
+                    # Server locale: http.client senza lo stack requests/urllib3
+                    blocks = self.local_client.post_stream(
+                        "/api/chat", body, self.connection_timeout, self.read_timeout
+                    )
+                else:
+                    # USA TIMEOUT SEPARATI: connection per connessione, read per stream
+                    response = self.session.post(
+                        f"{self.base_url}/api/chat",
+                        data=body,  # Content-Type già impostato negli header di sessione
+                        stream=True,
+                        # Niente compressione: gzip accumula i dati e ritarda i token
+                        headers={'Accept-Encoding': 'identity'},
+                        timeout=(self.connection_timeout, self.read_timeout)  # CORRETTO!
+                    )
+                    response.raise_for_status()
+                    blocks = self._response_blocks(response)
                 
-                self.state = RequestState.STREAMING
-                print("DEBUG: Stream started successfully")
+                self._set_state(RequestState.STREAMING)
+                logger.debug("Stream started successfully")
                 
-                chunk_count = 0
                 # Genera i chunk della risposta
-                for line in response.iter_lines(chunk_size=1, decode_unicode=True):
-                    # Controlla stop ad ogni chunk
-                    if stop_event and stop_event.is_set():
-                        print("DEBUG: Stop requested during streaming")
-                        self.state = RequestState.STOPPED
-                        return
-                    
-                    if line:
-                        try:
-                            chunk = json.loads(line)
-                            chunk_count += 1
-                            if chunk_count % 10 == 0:
-                                print(f"DEBUG: Processed {chunk_count} chunks")
-                            yield chunk
-                        except json.JSONDecodeError as je:
-                            print(f"DEBUG: JSON decode error: {je}")
-                            continue
+                for line in self._iter_stream_lines(blocks, stop_event):
+                    # Frammenti incompleti o righe vuote: inutile invocare il parser
+                    if line.rstrip()[-1:] not in (b'}', b']'):
+                        logger.debug("Skipping incomplete line: %r", line[:80])
+                        continue
+                    try:
+                        chunk = self._extract_chunk(line)
+                        yield chunk
+                    # orjson.JSONDecodeError è sottoclasse di json.JSONDecodeError
+                    except json.JSONDecodeError as je:
+                        logger.debug("JSON decode error: %s", je)
+                        continue
+                
+                # Controlla stop (l'iterazione delle righe si interrompe subito)
+                if is_stopped():
+                    logger.debug("Stop requested during streaming")
+                    self._set_state(RequestState.STOPPED)
+                    return
                 
-                print(f"DEBUG: Stream completed successfully ({chunk_count} chunks)")
-                self.state = RequestState.COMPLETED
+                logger.debug("Stream completed successfully")
+                self._set_state(RequestState.COMPLETED)
                 return
                 
             except requests.exceptions.Timeout as te:
                 last_exception = te
-                self.state = RequestState.ERROR
-                print(f"DEBUG: Timeout error (attempt {attempt + 1}): {te}")
+                self._set_state(RequestState.ERROR)
+                logger.debug("Timeout error (attempt %s): %s", attempt + 1, te)
                 
                 # Se stop è stato richiesto, non ritentare
-                if stop_event and stop_event.is_set():
-                    print("DEBUG: Stop requested, not retrying timeout")
-                    self.state = RequestState.STOPPED
+                if is_stopped():
+                    logger.debug("Stop requested, not retrying timeout")
+                    self._set_state(RequestState.STOPPED)
                     return
                 
                 if self._should_retry(te, attempt):
                     delay = self._exponential_backoff(attempt)
-                    print(f"DEBUG: Retrying timeout in {delay:.1f}s...")
+                    logger.debug("Retrying timeout in %.1fs...", delay)
                     time.sleep(delay)
                     continue
                 else:
-                    print("DEBUG: Max retries reached for timeout")
+                    logger.debug("Max retries reached for timeout")
                     break
                     
             except Exception as e:
                 last_exception = e
-                self.state = RequestState.ERROR
-                print(f"DEBUG: General error (attempt {attempt + 1}): {e}")
+                self._set_state(RequestState.ERROR)
+                logger.debug("General error (attempt %s): %s", attempt + 1, e)
                 
                 # Se stop è stato richiesto, non ritentare
-                if stop_event and stop_event.is_set():
-                    print("DEBUG: Stop requested, not retrying")
-                    self.state = RequestState.STOPPED
+                if is_stopped():
+                    logger.debug("Stop requested, not retrying")
+                    self._set_state(RequestState.STOPPED)
                     return
                 
                 if self._should_retry(e, attempt):
                     delay = self._exponential_backoff(attempt)
-                    print(f"DEBUG: Retrying error in {delay:.1f}s...")
+                    logger.debug("Retrying error in %.1fs...", delay)
                     time.sleep(delay)
                     continue
                 else:
-                    print("DEBUG: Max retries reached for error")
+                    logger.debug("Max retries reached for error")
                     break
         
         # Se arriviamo qui, tutti i retry sono falliti
-        if stop_event and stop_event.is_set():
-            print("DEBUG: Final state: stopped")
-            self.state = RequestState.STOPPED
+        if is_stopped():
+            logger.debug("Final state: stopped")
+            self._set_state(RequestState.STOPPED)
             return
         
         error_msg = f"Errore nella richiesta di chat: {str(last_exception)}"
-        print(f"DEBUG: Final error: {error_msg}")
+        logger.debug("Final error: %s", error_msg)
         raise OllamaError(error_msg)
     
+    @staticmethod
+    def _parse_ollama_chunk(line: bytes) -> Optional[Tuple[str, bool]]:
+        """Scansiona la riga una sola volta estraendo content e done
+        
+        Restituisce None se la riga non ha la forma attesa.
+        """
+        start = line.find(CONTENT_KEY)
+        if start < 0:
+            return None
+        start += len(CONTENT_KEY)
+        
+        # Cerca le virgolette di chiusura non precedute da un backslash "attivo"
+        end = line.find(b'"', start)
+        while end >= 0:
+            i = end - 1
+            while i >= start and line[i] == BACKSLASH:
+                i -= 1
+            if (end - 1 - i) % 2 == 0:
+                break
+            end = line.find(b'"', end + 1)
+        if end < 0:
+            return None
+        
+        if line.find(b'\\', start, end) < 0:
+            content = str(memoryview(line)[start:end], 'utf-8')
+        else:
+            # Sequenze di escape (\n, \uXXXX...): decodifica solo la stringa, virgolette incluse
+            content = json_loads(line[start - 1:end + 1])
+        return content, DONE_TRUE in line
+    
+    @classmethod
+    def _extract_chunk(cls, line: bytes) -> Tuple[str, bool]:
+        """Estrae contenuto e flag done da una riga NDJSON senza deserializzarla tutta"""
+        parsed = cls._parse_ollama_chunk(line)
+        if parsed is not None:
+            return parsed
+        
+        # Formato inatteso: parse completo
+        chunk = json_loads(line)
+        message = chunk.get('message') or {}
+        return message.get('content') or "", bool(chunk.get('done', False))
+    
+    @staticmethod
+    def _response_blocks(response: requests.Response) -> Iterator[bytes]:
+        """Blocchi di byte letti direttamente dal socket della risposta requests"""
+        raw = response.raw
+        raw.decode_content = True
+        
+        read_block = getattr(raw, 'read1', None)
+        if read_block is not None:
+            return iter(lambda: read_block(STREAM_READ_SIZE), b'')
+        # urllib3 < 2.0 non espone read1
+        return raw.stream(STREAM_READ_SIZE, decode_content=True)
+    
+    def _iter_stream_lines(self, blocks: Iterator[bytes],
+                           stop_event: threading.Event = None) -> Iterator[bytes]:
+        """Divide in righe NDJSON i blocchi letti dallo stream"""
+        is_stopped = stop_event.is_set if stop_event else (lambda: False)
+        buffer = bytearray()
+        for block in blocks:
+            # Controlla stop una volta per blocco letto
+            if is_stopped():
+                # Chiude subito lo stream (e la connessione locale letta a metà)
+                close = getattr(blocks, 'close', None)
+                if close is not None:
+                    close()
+                return
+            
+            buffer += block
+            if b'\n' not in block:
+                continue
+            
+            # Tutte le righe complete; l'ultima parte resta nel buffer
+            lines = buffer.split(b'\n')
+            buffer = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield bytes(line)
+        
+        # Eventuale ultima riga senza newline finale
+        if buffer.strip():
+            yield bytes(buffer)
+    
     def test_connection(self) -> bool:
         """Testa la connessione al server Ollama"""
         try:
-            print("DEBUG: Testing connection...")
+            logger.debug("Testing connection...")
             response = self.session.get(
                 f"{self.base_url}/api/tags",
                 timeout=self.connection_timeout
             )
             success = response.status_code == 200
-            print(f"DEBUG: Connection test result: {success}")
+            logger.debug("Connection test result: %s", success)
             return success
         except Exception as e:
-            print(f"DEBUG: Connection test failed: {e}")
+            logger.debug("Connection test failed: %s", e)
             return False
 
 
@@ -243,49 +520,70 @@ class ConversationManager:
     """Thread-safe conversation cache with intelligent trimming"""
     
     def __init__(self, max_messages: int = 100):
-        self.messages: List[Dict[str, str]] = []
-        self.max_messages = max_messages
+        # System message separato: il trimming non deve mai scansionare la lista
+        self._system: List[Dict[str, Any]] = []
+        self._other: Deque[Dict[str, Any]] = deque(maxlen=max_messages)
+        self._max_messages = max_messages
+        # Snapshot per l'API, ricostruito solo dopo una modifica
+        self._api_cache: Optional[List[Dict[str, str]]] = None
         self.mutex = QMutex()
     
+    @property
+    def max_messages(self) -> int:
+        return self._max_messages
+    
+    @max_messages.setter
+    def max_messages(self, value: int):
+        """Aggiorna il limite mantenendo gli ultimi messaggi"""
+        self.mutex.lock()
+        try:
+            self._max_messages = value
+            self._other = deque(self._other, maxlen=value)
+            self._trim_messages()
+            self._api_cache = None
+        finally:
+            self.mutex.unlock()
+    
     def add_message(self, role: str, content: str):
         """Aggiunge un messaggio alla conversazione thread-safe"""
         self.mutex.lock()
         try:
-            self.messages.append({
+            message = {
                 "role": role,
                 "content": content,
                 "timestamp": time.time()
-            })
+            }
+            
+            if role == 'system':
+                self._system = [message]
+            else:
+                # La deque scarta da sola i messaggi oltre maxlen
+                self._other.append(message)
             
             self._trim_messages()
+            self._api_cache = None
             
         finally:
             self.mutex.unlock()
     
     def _trim_messages(self):
         """Mantieni solo gli ultimi N messaggi preservando il system message"""
-        if len(self.messages) <= self.max_messages:
-            return
-        
-        # Separa system messages dagli altri
-        system_messages = [msg for msg in self.messages if msg['role'] == 'system']
-        other_messages = [msg for msg in self.messages if msg['role'] != 'system']
-        
-        if system_messages:
-            # Mantieni system messages + ultimi messaggi fino al limite
-            keep_count = self.max_messages - len(system_messages)
-            self.messages = system_messages + other_messages[-keep_count:]
-        else:
-            # Solo ultimi messaggi
-            self.messages = self.messages[-self.max_messages:]
+        # Il system message occupa un posto nel limite complessivo
+        while self._other and len(self._system) + len(self._other) > self._max_messages:
+            self._other.popleft()
     
     def get_messages(self) -> List[Dict[str, str]]:
-        """Restituisce i messaggi per l'API Ollama (thread-safe)"""
+        """Restituisce i messaggi per l'API Ollama (thread-safe)
+        
+        La lista è condivisa tra le chiamate: va trattata come sola lettura.
+        """
         self.mutex.lock()
         try:
-            # Rimuovi timestamp per l'API
-            return [{"role": msg["role"], "content": msg["content"]} 
-                   for msg in self.messages]
+            if self._api_cache is None:
+                # Rimuovi timestamp per l'API
+                self._api_cache = [{"role": msg["role"], "content": msg["content"]}
+                                   for msg in chain(self._system, self._other)]
+            return self._api_cache
         finally:
             self.mutex.unlock()
     
@@ -293,7 +591,9 @@ class ConversationManager:
         """Pulisce la conversazione"""
         self.mutex.lock()
         try:
-            self.messages.clear()
+            self._system = []
+            self._other.clear()
+            self._api_cache = None
         finally:
             self.mutex.unlock()
     
@@ -301,7 +601,7 @@ class ConversationManager:
         """Restituisce il numero di messaggi"""
         self.mutex.lock()
         try:
-            return len(self.messages)
+            return len(self._system) + len(self._other)
         finally:
             self.mutex.unlock()
     
@@ -309,16 +609,17 @@ class ConversationManager:
         """Imposta o aggiorna il messaggio di sistema"""
         self.mutex.lock()
         try:
-            # Rimuovi eventuali messaggi di sistema esistenti
-            self.messages = [msg for msg in self.messages if msg['role'] != 'system']
-            
-            # Aggiungi il nuovo messaggio di sistema all'inizio
+            # Sostituisce l'eventuale messaggio di sistema esistente
             if content.strip():
-                self.messages.insert(0, {
+                self._system = [{
                     "role": "system",
                     "content": content,
                     "timestamp": time.time()
-                })
+                }]
+                self._trim_messages()
+            else:
+                self._system = []
+            self._api_cache = None
         finally:
             self.mutex.unlock()
 
@@ -335,6 +636,9 @@ class OllamaWorker(QThread):
     generation_stopped = pyqtSignal()
     progress_updated = pyqtSignal(int)
     
+    # Intervallo minimo tra due segnali di chunk (20 ms, ~50 aggiornamenti/s)
+    CHUNK_EMIT_INTERVAL_NS = 20_000_000
+    
     def __init__(self, settings: Dict[str, Any], parent=None):
         super().__init__(parent)
         
@@ -343,14 +647,14 @@ class OllamaWorker(QThread):
         self.conversation = ConversationManager(settings.get("max_messages", 100))
         
         # Controllo thread
-        self.current_task = None
+        self._tasks: "queue.SimpleQueue[str]" = queue.SimpleQueue()
         self.current_model = None
         self.stop_event = threading.Event()
         self.is_busy = False
         
-        # Mutex per thread safety
-        self.task_mutex = QMutex()
-        self.task_condition = QWaitCondition()
+        # Chunk in attesa di essere inviati alla GUI in un unico segnale
+        self._pending_chunks: List[str] = []
+        self._last_emit_ns = 0
         
         self.update_settings(settings)
     
@@ -364,88 +668,82 @@ class OllamaWorker(QThread):
         read_timeout = settings.get("read_timeout", 120)  # 2 minuti per lo streaming
         max_retries = settings.get("max_retries", 3)
         
-        print(f"DEBUG: Updating RequestManager settings:")
-        print(f"  base_url: {base_url}")
-        print(f"  connection_timeout: {connection_timeout}")
-        print(f"  read_timeout: {read_timeout}")
-        print(f"  max_retries: {max_retries}")
+        logger.debug("Updating RequestManager settings: base_url=%s, connection_timeout=%s, "
+                     "read_timeout=%s, max_retries=%s",
+                     base_url, connection_timeout, read_timeout, max_retries)
         
-        self.request_manager = RequestManager(base_url, connection_timeout, read_timeout, max_retries)
+        manager = self.request_manager
+        if manager and manager.base_url == base_url.rstrip('/'):
+            # Stesso server: aggiorna i parametri senza perdere le connessioni aperte
+            manager.connection_timeout = connection_timeout
+            manager.read_timeout = read_timeout
+            manager.max_retries = max_retries
+        else:
+            self.request_manager = RequestManager(base_url, connection_timeout, read_timeout, max_retries)
         self.conversation.max_messages = settings.get("max_messages", 100)
     
     def set_model(self, model: str):
         """Imposta il modello corrente"""
         self.current_model = model
-        print(f"DEBUG: Model set to: {model}")
+        logger.debug("Model set to: %s", model)
+    
+    def _queue_task(self, task: str):
+        """Accoda un task e avvia il thread se necessario"""
+        logger.debug("Queuing %s task", task)
+        # Occupato da subito: in coda c'è al massimo un task alla volta
+        self.is_busy = True
+        self._tasks.put(task)
+        
+        if not self.isRunning():
+            logger.debug("Starting worker thread")
+            self.start()
     
     def load_models(self):
         """Carica i modelli disponibili"""
-        self.task_mutex.lock()
-        try:
-            if self.is_busy:
-                print("DEBUG: Worker busy, cannot load models")
-                return False
-            
-            print("DEBUG: Queuing load_models task")
-            self.current_task = "load_models"
-            self.task_condition.wakeAll()
-            
-            if not self.isRunning():
-                print("DEBUG: Starting worker thread")
-                self.start()
-            
-            return True
-        finally:
-            self.task_mutex.unlock()
+        if self.is_busy:
+            logger.debug("Worker busy, cannot load models")
+            return False
+        
+        self._queue_task("load_models")
+        return True
     
     def send_message(self, message: str, context: str = ""):
         """Invia un messaggio"""
         if not self.current_model:
-            print("DEBUG: No model selected")
+            logger.debug("No model selected")
             self.error_occurred.emit("Nessun modello selezionato")
             return False
         
-        self.task_mutex.lock()
-        try:
-            if self.is_busy:
-                print("DEBUG: Worker busy, cannot send message")
-                return False
-            
-            # Costruisci il messaggio finale
-            final_message = message
-            if context.strip():
-                print(f"DEBUG: Adding context ({len(context)} chars)")
-                final_message = f"{context.strip()}\n\nDOMANDA UTENTE: {message}\n\nRispondi utilizzando le informazioni del contesto quando rilevanti."
-            else:
-                print("DEBUG: No context provided")
-                
-            self.conversation.add_message("user", final_message)
-            
-            print("DEBUG: Queuing send_message task")
-            self.current_task = "send_message"
-            self.task_condition.wakeAll()
-            
-            if not self.isRunning():
-                print("DEBUG: Starting worker thread")
-                self.start()
+        if self.is_busy:
+            logger.debug("Worker busy, cannot send message")
+            return False
+        
+        # Costruisci il messaggio finale
+        final_message = message
+        if context.strip():
+            logger.debug("Adding context (%s chars)", len(context))
+            final_message = f"{context.strip()}\n\nDOMANDA UTENTE: {message}\n\nRispondi utilizzando le informazioni del contesto quando rilevanti."
+        else:
+            logger.debug("No context provided")
             
-            return True
-        finally:
-            self.task_mutex.unlock()
+        self.conversation.add_message("user", final_message)
+        
+        self._queue_task("send_message")
+        return True
     
     def stop_generation(self):
         """Ferma la generazione corrente"""
-        print("DEBUG: Stop generation requested")
+        logger.debug("Stop generation requested")
         self.stop_event.set()
     
     def clear_conversation(self):
         """Pulisce la conversazione"""
-        print("DEBUG: Clearing conversation")
+        logger.debug("Clearing conversation")
         self.conversation.clear()
     
     def set_system_message(self, message: str):
         """Imposta il messaggio di sistema"""
-        print(f"DEBUG: Setting system message ({len(message)} chars)")
+        logger.debug("Setting system message (%s chars)", len(message))
         self.conversation.set_system_message(message)
     
     def get_conversation_history(self) -> List[Dict[str, str]]:
@@ -460,24 +758,16 @@ class OllamaWorker(QThread):
     
     def run(self):
         """Loop principale del thread con ERROR HANDLING MIGLIORATO"""
-        print("DEBUG: Worker thread started")
+        logger.debug("Worker thread started")
         
         while not self.isInterruptionRequested():
-            self.task_mutex.lock()
-            
-            # Aspetta un nuovo task
-            if not self.current_task:
-                self.task_condition.wait(self.task_mutex, 1000)  # Timeout 1 secondo
-                
-            current_task = self.current_task
-            self.current_task = None
-            self.task_mutex.unlock()
-            
-            if not current_task:
+            # Aspetta un nuovo task (timeout per controllare l'interruzione)
+            try:
+                current_task = self._tasks.get(timeout=1.0)
+            except queue.Empty:
                 continue
             
-            print(f"DEBUG: Processing task: {current_task}")
-            self.is_busy = True
+            logger.debug("Processing task: %s", current_task)
             self.stop_event.clear()
             
             try:
@@ -487,64 +777,71 @@ class OllamaWorker(QThread):
                     self._handle_send_message()
                     
             except Exception as e:
-                print(f"DEBUG: Exception in worker: {e}")
+                logger.debug("Exception in worker: %s", e)
                 self.error_occurred.emit(f"Errore nel worker: {str(e)}")
             finally:
                 self.is_busy = False
-                print(f"DEBUG: Task {current_task} completed")
+                logger.debug("Task %s completed", current_task)
         
-        print("DEBUG: Worker thread ended")
+        logger.debug("Worker thread ended")
     
     def _handle_load_models(self):
         """Gestisce il caricamento dei modelli con ERROR HANDLING"""
         try:
-            print("DEBUG: Handling load_models")
+            logger.debug("Handling load_models")
             
             # Test connessione
             if not self.request_manager.test_connection():
-                print("DEBUG: Connection test failed")
+                logger.debug("Connection test failed")
                 self.connection_status_changed.emit(False)
                 self.error_occurred.emit("Impossibile connettersi al server Ollama. Verifica che sia in esecuzione su localhost:11434")
                 return
             
-            print("DEBUG: Connection test passed")
+            logger.debug("Connection test passed")
             self.connection_status_changed.emit(True)
             
             # Carica modelli
             models = self.request_manager.get_models()
-            print(f"DEBUG: Loaded {len(models)} models")
+            logger.debug("Loaded %s models", len(models))
             self.models_received.emit(models)
             
         except OllamaError as e:
-            print(f"DEBUG: OllamaError in load_models: {e}")
+            logger.debug("OllamaError in load_models: %s", e)
             self.connection_status_changed.emit(False)
             self.error_occurred.emit(str(e))
         except Exception as e:
-            print(f"DEBUG: Unexpected error in load_models: {e}")
+            logger.debug("Unexpected error in load_models: %s", e)
             self.connection_status_changed.emit(False)
             self.error_occurred.emit(f"Errore imprevisto: {str(e)}")
     
+    def _flush_chunks(self):
+        """Invia alla GUI i chunk accumulati come un unico segnale"""
+        if self._pending_chunks:
+            self.message_chunk_received.emit(''.join(self._pending_chunks))
+            self._pending_chunks.clear()
+        self._last_emit_ns = time.monotonic_ns()
+    
     def _handle_send_message(self):
         """Gestisce l'invio di un messaggio con TIMEOUT E ERROR HANDLING MIGLIORATI"""
         if not self.current_model:
-            print("DEBUG: No model selected for send_message")
+            logger.debug("No model selected for send_message")
             self.error_occurred.emit("Nessun modello selezionato")
             return
         
         # Controlla stop PRIMA di iniziare
         if self.stop_event.is_set():
-            print("DEBUG: Stop requested before sending message")
+            logger.debug("Stop requested before sending message")
             self.generation_stopped.emit()
             return
         
         try:
             messages = self.conversation.get_messages()
             if not messages:
-                print("DEBUG: No messages to send")
+                logger.debug("No messages to send")
                 self.error_occurred.emit("Nessun messaggio da inviare")
                 return
             
-            print(f"DEBUG: Sending {len(messages)} messages to model {self.current_model}")
+            logger.debug("Sending %s messages to model %s", len(messages), self.current_model)
             
             # Opzioni per il modello
             options = {}
@@ -555,11 +852,13 @@ class OllamaWorker(QThread):
             if "top_k" in self.settings:
                 options["top_k"] = self.settings["top_k"]
             
-            full_response = ""
-            chunk_count = 0
+            # Parti della risposta, unite una sola volta a fine stream
+            response_parts: List[str] = []
             stream_started = False
+            self._pending_chunks.clear()
+            self._last_emit_ns = 0
             
-            print("DEBUG: Starting stream...")
+            logger.debug("Starting stream...")
             
             try:
                 # Stream della risposta con gestione robusta
@@ -572,40 +871,40 @@ class OllamaWorker(QThread):
                 
                 # Se l'iteratore è None (stop immediato), emetti stopped
                 if stream_iterator is None:
-                    print("DEBUG: Stream iterator is None (immediate stop)")
+                    logger.debug("Stream iterator is None (immediate stop)")
                     self.generation_stopped.emit()
                     return
                 
-                for chunk in stream_iterator:
+                is_stopped = self.stop_event.is_set
+                for index, (content, done) in enumerate(stream_iterator):
                     stream_started = True
                     
-                    # Doppio controllo stop
-                    if self.stop_event.is_set():
-                        print("DEBUG: Stop requested during chunk processing")
+                    # Doppio controllo stop, ogni 16 chunk (lo stream si ferma già a ogni lettura)
+                    if not index & 15 and is_stopped():
+                        logger.debug("Stop requested during chunk processing")
+                        # Il testo già ricevuto arriva alla GUI prima della chiusura
+                        self._flush_chunks()
                         self.generation_stopped.emit()
                         return
                     
-                    if 'message' in chunk and 'content' in chunk['message']:
-                        content = chunk['message']['content']
-                        if content:
-                            full_response += content
-                            self.message_chunk_received.emit(content)
-                            
-                            chunk_count += 1
-                            
-                            # Debug periodico
-                            if chunk_count % 50 == 0:
-                                print(f"DEBUG: Processed {chunk_count} chunks, response length: {len(full_response)}")
+                    if content:
+                        response_parts.append(content)
+                        self._pending_chunks.append(content)
+                        if time.monotonic_ns() - self._last_emit_ns >= self.CHUNK_EMIT_INTERVAL_NS:
+                            self._flush_chunks()
                     
                     # Fine del messaggio
-                    if chunk.get('done', False):
-                        print("DEBUG: Stream marked as done")
+                    if done:
+                        logger.debug("Stream marked as done")
                         break
                 
-                print(f"DEBUG: Stream completed. Total chunks: {chunk_count}, response length: {len(full_response)}")
+                self._flush_chunks()
+                full_response = ''.join(response_parts)
+                logger.debug("Stream completed. Response length: %s", len(full_response))
                 
             except OllamaError as oe:
-                print(f"DEBUG: OllamaError during streaming: {oe}")
+                logger.debug("OllamaError during streaming: %s", oe)
+                self._flush_chunks()
                 if self.stop_event.is_set():
                     self.generation_stopped.emit()
                 else:
@@ -613,7 +912,8 @@ class OllamaWorker(QThread):
                 return
                 
             except Exception as se:
-                print(f"DEBUG: Stream exception: {se}")
+                logger.debug("Stream exception: %s", se)
+                self._flush_chunks()
                 if self.stop_event.is_set():
                     self.generation_stopped.emit()
                 else:
@@ -622,22 +922,23 @@ class OllamaWorker(QThread):
             
             # Gestione completamento o stop
             if self.stop_event.is_set():
-                print("DEBUG: Generation was stopped")
+                logger.debug("Generation was stopped")
                 self.generation_stopped.emit()
             elif full_response:
-                print(f"DEBUG: Message completed successfully ({len(full_response)} chars)")
+                logger.debug("Message completed successfully (%s chars)", len(full_response))
                 # Aggiungi la risposta alla conversazione
                 self.conversation.add_message("assistant", full_response)
                 self.message_completed.emit(full_response)
             else:
-                print("DEBUG: Empty response received")
+                logger.debug("Empty response received")
                 if stream_started:
                     self.message_completed.emit("")
                 else:
                     self.error_occurred.emit("Nessuna risposta ricevuta dal modello")
             
         except Exception as e:
-            print(f"DEBUG: Unexpected error in send_message: {e}")
+            logger.debug("Unexpected error in send_message: %s", e)
+            self._flush_chunks()
             # Per qualsiasi altra eccezione
             if self.stop_event.is_set():
                 self.generation_stopped.emit()
@@ -645,31 +946,71 @@ class OllamaWorker(QThread):
                 self.error_occurred.emit(f"Errore imprevisto: {str(e)}")
 
 
-class ConnectionMonitor(QThread):
-    """Monitor per lo stato della connessione"""
+class ConnectionMonitor(QObject):
+    """Monitor per lo stato della connessione (QTimer sul thread principale)"""
     
     connection_changed = pyqtSignal(bool)
     
-    def __init__(self, request_manager: RequestManager, parent=None):
+    def __init__(self, base_url: str, check_interval: int = 30,
+                 timeout: int = 10, parent=None):
         super().__init__(parent)
-        self.request_manager = request_manager
-        self.check_interval = 30  # secondi
+        self.base_url = base_url.rstrip('/')
+        self.check_interval = check_interval  # secondi
+        self.timeout = timeout
         self.last_status = None
+        self.probe_socket = None
+        
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.check_interval * 1000)
+        self.timer.timeout.connect(self.check_connection)
+        
+        # Timeout del singolo controllo
+        self.probe_timer = QTimer(self)
+        self.probe_timer.setSingleShot(True)
+        self.probe_timer.timeout.connect(lambda: self._finish_probe(self.probe_socket, False))
     
-    def run(self):
-        """Loop di monitoring"""
-        while not self.isInterruptionRequested():
-            try:
-                current_status = self.request_manager.test_connection()
-                
-                if current_status != self.last_status:
-                    self.connection_changed.emit(current_status)
-                    self.last_status = current_status
-                
-                self.msleep(self.check_interval * 1000)
-                
-            except Exception:
-                if self.last_status is not False:
-                    self.connection_changed.emit(False)
-                    self.last_status = False
-                self.msleep(5000)  # Retry più frequente in caso di errore
\ No newline at end of file
+    def start(self):
+        """Avvia il monitoring con un controllo immediato"""
+        self.check_connection()
+        self.timer.start()
+    
+    def stop(self):
+        """Ferma il monitoring senza attese"""
+        self.timer.stop()
+        self.probe_timer.stop()
+        sock, self.probe_socket = self.probe_socket, None
+        if sock is not None:
+            sock.abort()
+            sock.deleteLater()
+    
+    def set_base_url(self, base_url: str):
+        """Aggiorna l'URL del server da controllare"""
+        self.base_url = base_url.rstrip('/')
+    
+    def check_connection(self):
+        """Verifica asincrona che il server accetti connessioni TCP"""
+        if self.probe_socket is not None:
+            return  # Controllo precedente ancora in corso
+        
+        url = QUrl(self.base_url)
+        port = url.port(443 if url.scheme() == 'https' else 80)
+        
+        sock = QTcpSocket(self)
+        sock.connected.connect(lambda: self._finish_probe(sock, True))
+        sock.errorOccurred.connect(lambda _error: self._finish_probe(sock, False))
+        self.probe_socket = sock
+        self.probe_timer.start(self.timeout * 1000)
+        sock.connectToHost(url.host(), port)
+    
+    def _finish_probe(self, sock: Optional[QTcpSocket], current_status: bool):
+        """Chiude il controllo in corso e notifica i cambi di stato"""
+        if sock is None or sock is not self.probe_socket:
+            return  # Controllo già concluso o annullato da stop()
+        self.probe_socket = None
+        self.probe_timer.stop()
+        sock.abort()
+        sock.deleteLater()
+        
+        if current_status != self.last_status:
+            self.connection_changed.emit(current_status)
+            self.last_status = current_status
@@ -5,16 +5,62 @@ Sistema completo di file management e ricerca con debug migliorato
 """
 
 import os
+import re
 import json
 import sqlite3
 import hashlib
+import heapq
+import logging
 import mimetypes
 import shutil
 import zipfile
 import time
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator, Callable
+
+try:
+    import zstandard  # Compressione dei contenuti estratti, opzionale
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Tabella per str.translate: elimina i caratteri di controllo (C0 tranne tab e
+# newline, DEL e C1) in un unico passaggio in C
+_CTRL_DROP = {i: None for i in range(32) if i not in (9, 10)}
+_CTRL_DROP.update({i: None for i in range(127, 160)})
+
+# Spazi bianchi a fine riga, righe vuote e indentazione della riga successiva
+_LINE_BREAK_RE = re.compile(r'[^\S\n]*\n\s*')
+
+
+@lru_cache(maxsize=64)
+def _snippet_patterns(query: str) -> tuple:
+    """Espressioni per cercare la query completa e le sue parole (senza maiuscole)"""
+    query_pattern = re.compile(re.escape(query), re.IGNORECASE)
+    # Un'unica alternanza per tutte le parole: il contenuto si scorre una volta sola.
+    # Parole ripetute eliminate e più lunghe prima, così a parità di posizione
+    # vince la corrispondenza più lunga e non si provano alternative inutili
+    query_words = sorted({w.casefold(): w for w in query.split() if len(w) > 2}.values(),
+                         key=len, reverse=True)
+    # Query di una sola parola: la seconda ricerca ripeterebbe la prima
+    if query_words == [query]:
+        query_words = []
+    words_pattern = (re.compile('|'.join(map(re.escape, query_words)), re.IGNORECASE)
+                     if query_words else None)
+    return query_pattern, words_pattern
+
+
+class ExtractionError(Exception):
+    """Testo non estratto (errore o libreria mancante); il messaggio descrive il motivo"""
 
 
 class FileProcessor:
@@ -23,6 +69,15 @@ class FileProcessor:
     @staticmethod
     def extract_text_content(file_path: Path) -> str:
         """Estrae il contenuto testuale da diversi tipi di file"""
+        return FileProcessor.extract_text(file_path)[0]
+    
+    @staticmethod
+    def extract_text(file_path: Path) -> tuple:
+        """Estrae il contenuto testuale indicando se l'estrazione è riuscita
+        
+        Restituisce (testo, True), oppure (messaggio segnaposto, False) se il
+        testo non è stato estratto: in quel caso il risultato non va in cache.
+        """
         try:
             mime_type = mimetypes.guess_type(str(file_path))[0] or ""
             
@@ -31,59 +86,79 @@ class FileProcessor:
                 file_path.suffix.lower() in ['.py', '.js', '.html', '.css', '.json', 
                                               '.md', '.txt', '.xml', '.yaml', '.yml', 
                                               '.ini', '.cfg', '.conf', '.log']):
-                return FileProcessor._read_text_file(file_path)
+                return FileProcessor._read_text_file(file_path), True
             
             # PDF
             elif file_path.suffix.lower() == '.pdf':
-                return FileProcessor._extract_pdf_content(file_path)
+                return FileProcessor._extract_pdf_content(file_path), True
             
             # Word documents
             elif file_path.suffix.lower() in ['.docx', '.doc']:
-                return FileProcessor._extract_word_content(file_path)
+                return FileProcessor._extract_word_content(file_path), True
             
             # Excel files
             elif file_path.suffix.lower() in ['.xlsx', '.xls']:
-                return FileProcessor._extract_excel_content(file_path)
+                return FileProcessor._extract_excel_content(file_path), True
             
             # Altri formati
             else:
-                return f"File binario: {file_path.name} ({mime_type})"
+                return f"File binario: {file_path.name} ({mime_type})", True
                 
+        except ExtractionError as e:
+            return str(e), False
         except Exception as e:
-            return f"Errore nell'estrazione del contenuto: {str(e)}"
+            return f"Errore nell'estrazione del contenuto: {str(e)}", False
     
     @staticmethod
     def _read_text_file(file_path: Path) -> str:
         """Legge un file di testo"""
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+        # Una sola lettura: le codifiche si provano sui byte già in memoria
+        with open(file_path, 'rb', buffering=1 << 20) as f:
+            raw = f.read()
         
+        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
         for encoding in encodings:
             try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
+                text = raw.decode(encoding)
+                break
             except UnicodeDecodeError:
                 continue
+        else:
+            # Se tutti i codifiche falliscono, ignora i byte non validi
+            text = raw.decode('utf-8', errors='ignore')
         
-        # Se tutti i codifiche falliscono, leggi come binario
-        with open(file_path, 'rb') as f:
-            content = f.read()
-            return content.decode('utf-8', errors='ignore')
+        # Fine riga normalizzati come nella lettura in modalità testo
+        return text.replace('\r\n', '\n').replace('\r', '\n')
     
     @staticmethod
     def _extract_pdf_content(file_path: Path) -> str:
-        """Estrae contenuto da file PDF"""
+        """Estrae contenuto da file PDF (PyMuPDF, con PyPDF2 come alternativa)"""
+        try:
+            import fitz
+        except ImportError:
+            return FileProcessor._extract_pdf_content_pypdf2(file_path)
+        
+        # Un solo documento in un solo thread: PyMuPDF non supporta il multithreading
+        try:
+            with fitz.open(file_path) as doc:
+                parts = [page.get_text("text") for page in doc]
+            return "\n".join(parts).strip()
+        except Exception as e:
+            raise ExtractionError(f"Errore nell'estrazione PDF: {str(e)}") from e
+    
+    @staticmethod
+    def _extract_pdf_content_pypdf2(file_path: Path) -> str:
+        """Estrae contenuto da file PDF con PyPDF2"""
         try:
             import PyPDF2
-            text = ""
             with open(file_path, 'rb') as f:
                 reader = PyPDF2.PdfReader(f)
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-            return text.strip()
+                parts = [page.extract_text() or "" for page in reader.pages]
+            return "\n".join(parts).strip()
         except ImportError:
-            return f"File PDF: {file_path.name} (PyPDF2 non installato per l'estrazione)"
+            raise ExtractionError(f"File PDF: {file_path.name} (PyMuPDF o PyPDF2 non installato per l'estrazione)")
         except Exception as e:
-            return f"Errore nell'estrazione PDF: {str(e)}"
+            raise ExtractionError(f"Errore nell'estrazione PDF: {str(e)}") from e
     
     @staticmethod
     def _extract_word_content(file_path: Path) -> str:
@@ -96,13 +171,40 @@ class FileProcessor:
                 text += paragraph.text + "\n"
             return text.strip()
         except ImportError:
-            return f"File Word: {file_path.name} (python-docx non installato)"
+            raise ExtractionError(f"File Word: {file_path.name} (python-docx non installato)")
         except Exception as e:
-            return f"Errore nell'estrazione Word: {str(e)}"
+            raise ExtractionError(f"Errore nell'estrazione Word: {str(e)}") from e
     
     @staticmethod
     def _extract_excel_content(file_path: Path) -> str:
         """Estrae contenuto da file Excel"""
+        # openpyxl legge solo .xlsx; per .xls o se manca si usa pandas
+        if file_path.suffix.lower() == '.xlsx':
+            try:
+                from openpyxl import load_workbook
+            except ImportError:
+                pass
+            else:
+                try:
+                    wb = load_workbook(file_path, read_only=True, data_only=True)
+                    try:
+                        out = []
+                        for ws in wb.worksheets:
+                            out.append(f"=== Foglio: {ws.title} ===")
+                            for row in ws.iter_rows(values_only=True):
+                                out.append("\t".join("" if v is None else str(v) for v in row))
+                            out.append("")
+                    finally:
+                        wb.close()
+                    return "\n".join(out).strip()
+                except Exception as e:
+                    raise ExtractionError(f"Errore nell'estrazione Excel: {str(e)}") from e
+        
+        return FileProcessor._extract_excel_content_pandas(file_path)
+    
+    @staticmethod
+    def _extract_excel_content_pandas(file_path: Path) -> str:
+        """Estrae contenuto da file Excel con pandas"""
         try:
             import pandas as pd
             df = pd.read_excel(file_path, sheet_name=None)
@@ -112,23 +214,114 @@ class FileProcessor:
                 text += sheet_data.to_string() + "\n\n"
             return text.strip()
         except ImportError:
-            return f"File Excel: {file_path.name} (pandas non installato)"
+            raise ExtractionError(f"File Excel: {file_path.name} (openpyxl o pandas non installato)")
         except Exception as e:
-            return f"Errore nell'estrazione Excel: {str(e)}"
+            raise ExtractionError(f"Errore nell'estrazione Excel: {str(e)}") from e
 
 
 class DatabaseManager:
     """Gestore centralizzato del database"""
     
+    # Impostazioni applicate a ogni nuova connessione
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA cache_size=-65536",
+    )
+    
+    # Versione dello schema, salvata in PRAGMA user_version
+    SCHEMA_VERSION = 3
+    
+    # Istanze attive, per chiudere i file prima di eliminare un progetto
+    _instances = weakref.WeakSet()
+    
     def __init__(self, db_path: str):
         self.db_path = db_path
+        # Una connessione persistente per thread
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        DatabaseManager._instances.add(self)
         self.init_database()
     
+    def _conn(self) -> sqlite3.Connection:
+        """Restituisce la connessione del thread corrente, creandola se necessario"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: autocommit, transazioni esplicite con transaction()
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def close(self):
+        """Chiude le connessioni aperte (verranno riaperte al prossimo uso)"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+    
+    @classmethod
+    def close_all_in(cls, directory: Path):
+        """Chiude i database che si trovano nella directory indicata"""
+        directory = os.path.abspath(directory)
+        for db in list(cls._instances):
+            if os.path.abspath(db.db_path).startswith(directory + os.sep):
+                db.close()
+    
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Esegue più scritture in un'unica transazione (un solo commit)"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+    
     def init_database(self):
         """Inizializza le tabelle del database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn = self._conn()
+        # Schema già aggiornato: niente DDL da rieseguire
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= self.SCHEMA_VERSION:
+            self.fts_enabled = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'file_content_fts'"
+            ).fetchone() is not None
+        else:
+            with self.transaction() as conn:
+                self._create_schema(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
         
+        self._check_compressed_content()
+    
+    def _check_compressed_content(self):
+        """Con contenuti salvati compressi zstandard diventa obbligatorio
+        
+        Meglio fallire all'apertura che restituire contenuti vuoti in silenzio
+        (anteprime e contesto della knowledge base).
+        """
+        if zstandard is not None:
+            return
+        compressed = self._conn().execute(
+            "SELECT 1 FROM file_content WHERE content_zstd IS NOT NULL LIMIT 1"
+        ).fetchone()
+        if compressed:
+            raise RuntimeError(
+                f"Il database {self.db_path} contiene file compressi con zstd: "
+                "installa il pacchetto 'zstandard' (pip install zstandard) per aprirlo"
+            )
+    
+    def _create_schema(self, cursor):
+        """Crea tabelle, indici e indice full-text"""
         # Tabella progetti
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS projects (
@@ -155,10 +348,20 @@ class DatabaseManager:
                 content_preview TEXT,
                 tags TEXT,
                 project_id TEXT,
+                mtime_ns INTEGER,
+                filename_lower TEXT GENERATED ALWAYS AS (lower(filename)) VIRTUAL,
                 FOREIGN KEY (project_id) REFERENCES projects (id)
             )
         """)
         
+        # Migrazione: database creati prima delle colonne mtime_ns e filename_lower
+        for column in ("mtime_ns INTEGER",
+                       "filename_lower TEXT GENERATED ALWAYS AS (lower(filename)) VIRTUAL"):
+            try:
+                cursor.execute(f"ALTER TABLE files ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass  # Colonna già presente
+        
         # Tabella contenuti file
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS file_content (
@@ -166,22 +369,97 @@ class DatabaseManager:
                 content TEXT,
                 processed_content TEXT,
                 embedding BLOB,
+                processed_content_lower TEXT,
+                content_zstd BLOB,
                 FOREIGN KEY (file_id) REFERENCES files (id)
             )
         """)
         
+        # Migrazione: contenuto già in minuscolo, calcolato una volta sola, e
+        # contenuto originale compresso con zstd (al posto di content)
+        for column in ("processed_content_lower TEXT", "content_zstd BLOB"):
+            try:
+                cursor.execute(f"ALTER TABLE file_content ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass  # Colonna già presente
+        # str.lower gestisce anche i caratteri non ASCII, a differenza di lower() di SQLite
+        cursor.connection.create_function("py_lower", 1, lambda text: text.lower() if text else text,
+                                          deterministic=True)
+        cursor.execute("""
+            UPDATE file_content SET processed_content_lower = py_lower(processed_content)
+            WHERE processed_content_lower IS NULL AND processed_content IS NOT NULL
+        """)
+        
         # Indici per performance
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_project ON files(project_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_hash ON files(file_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_original_path ON files(original_path)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_created ON files(created_at DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_project_created ON files(project_id, created_at DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_filename_lower ON files(filename_lower COLLATE NOCASE, project_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_projects_modified ON projects(last_modified)")
         
-        conn.commit()
-        conn.close()
+        # Indice full-text sui contenuti (se SQLite include FTS5)
+        self.fts_enabled = self._init_fts(cursor)
+    
+    def _init_fts(self, cursor) -> bool:
+        """Crea l'indice FTS5 dei contenuti e i trigger che lo mantengono allineato"""
+        try:
+            exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'file_content_fts'"
+            ).fetchone()
+            
+            # Sorgente dell'indice: contenuti + nome del file
+            cursor.execute("""
+                CREATE VIEW IF NOT EXISTS file_search_source AS
+                SELECT fc.file_id, fc.content, fc.processed_content, f.filename
+                FROM file_content fc JOIN files f ON f.id = fc.file_id
+            """)
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS file_content_fts USING fts5(
+                    content, processed_content, filename,
+                    content='file_search_source', content_rowid='file_id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+            
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS file_content_fts_insert AFTER INSERT ON file_content BEGIN
+                    INSERT INTO file_content_fts(rowid, content, processed_content, filename)
+                    VALUES (new.file_id, new.content, new.processed_content,
+                            (SELECT filename FROM files WHERE id = new.file_id));
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS file_content_fts_delete AFTER DELETE ON file_content BEGIN
+                    INSERT INTO file_content_fts(file_content_fts, rowid, content, processed_content, filename)
+                    VALUES ('delete', old.file_id, old.content, old.processed_content,
+                            (SELECT filename FROM files WHERE id = old.file_id));
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS file_content_fts_update AFTER UPDATE ON file_content BEGIN
+                    INSERT INTO file_content_fts(file_content_fts, rowid, content, processed_content, filename)
+                    VALUES ('delete', old.file_id, old.content, old.processed_content,
+                            (SELECT filename FROM files WHERE id = old.file_id));
+                    INSERT INTO file_content_fts(rowid, content, processed_content, filename)
+                    VALUES (new.file_id, new.content, new.processed_content,
+                            (SELECT filename FROM files WHERE id = new.file_id));
+                END
+            """)
+            
+            # Database esistente: indicizza i contenuti già presenti
+            if not exists:
+                cursor.execute("INSERT INTO file_content_fts(file_content_fts) VALUES('rebuild')")
+            
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning("FTS5 non disponibile, ricerca senza indice: %s", e)
+            return False
     
     def execute_query(self, query: str, params: tuple = None):
         """Esegue una query e restituisce i risultati"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn().cursor()
         
         try:
             if params:
@@ -190,19 +468,28 @@ class DatabaseManager:
                 cursor.execute(query)
                 
             if query.strip().upper().startswith('SELECT'):
-                results = cursor.fetchall()
-            else:
-                results = cursor.lastrowid
-                
-            conn.commit()
-            return results
+                return cursor.fetchall()
+            return cursor.lastrowid
         finally:
-            conn.close()
+            cursor.close()
 
 
 class FileManager:
     """Gestore per i file del progetto"""
     
+    # Hash già calcolati nella sessione, per (percorso, dimensione, mtime_ns)
+    _hash_cache: "OrderedDict[tuple, str]" = OrderedDict()
+    HASH_CACHE_SIZE = 1024
+    
+    # Livello zstd per i contenuti estratti (buon rapporto velocità/dimensione)
+    ZSTD_LEVEL = 3
+    
+    # Risultati di get_files per (database, progetto, versione dei dati)
+    _files_cache: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+    FILES_CACHE_SIZE = 128
+    # Scritture fatte da questo processo, per database
+    _write_counts: Dict[str, int] = {}
+    
     def __init__(self, project_dir: str):
         self.project_dir = Path(project_dir)
         self.files_dir = self.project_dir / "files"
@@ -215,65 +502,199 @@ class FileManager:
         # Database per metadati
         db_path = self.project_dir / "files_metadata.db"
         self.db = DatabaseManager(str(db_path))
+        self._db_key = os.path.abspath(db_path)
+    
+    def _data_version(self) -> tuple:
+        """Identifica lo stato dei dati: scritture locali e mtime di database e WAL"""
+        versions = [FileManager._write_counts.get(self._db_key, 0)]
+        for path in (self._db_key, self._db_key + "-wal"):
+            try:
+                versions.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                versions.append(None)
+        return tuple(versions)
+    
+    def _invalidate_files_cache(self):
+        """Segnala una modifica ai file: le liste in cache non sono più valide"""
+        FileManager._write_counts[self._db_key] = FileManager._write_counts.get(self._db_key, 0) + 1
     
     def add_file(self, file_path: str, project_id: str = "default") -> Dict[str, Any]:
         """Aggiunge un file al progetto"""
-        try:
-            file_path = Path(file_path)
-            if not file_path.exists():
-                raise FileNotFoundError(f"File non trovato: {file_path}")
-            
-            # Calcola hash del file
-            file_hash = self._calculate_file_hash(file_path)
-            
-            # Verifica se il file esiste già
-            existing = self.db.execute_query(
-                "SELECT id FROM files WHERE file_hash = ?", (file_hash,)
-            )
-            if existing:
-                return {"status": "exists", "hash": file_hash, "file_id": existing[0][0]}
-            
-            # Copia il file nella directory del progetto
-            dest_filename = f"{file_hash}_{file_path.name}"
-            dest_path = self.files_dir / dest_filename
-            shutil.copy2(file_path, dest_path)
-            
-            # Estrai contenuto
-            content = FileProcessor.extract_text_content(file_path)
-            processed_content = self._process_content(content)
-            
-            # Salva metadati
-            file_info = {
-                "filename": file_path.name,
-                "original_path": str(file_path),
-                "file_hash": file_hash,
-                "mime_type": mimetypes.guess_type(str(file_path))[0] or "application/octet-stream",
-                "size": file_path.stat().st_size,
-                "content_preview": content[:500] if content else "",
-                "project_id": project_id
-            }
-            
-            file_id = self._save_file_metadata(file_info, content, processed_content)
+        return self.add_files([file_path], project_id)[0]
+    
+    def add_files(self, file_paths: List[str], project_id: str = "default",
+                  progress_callback: Optional[Callable[[int], None]] = None) -> List[Dict[str, Any]]:
+        """Aggiunge più file al progetto salvando i metadati con un solo commit
+        
+        Hash, copia ed estrazione del contenuto avvengono fuori dalla transazione;
+        progress_callback riceve il numero di file elaborati.
+        """
+        results: List[Dict[str, Any]] = []
+        pending = []  # (indice risultato, file_info, content, processed_content)
+        batch_hashes = set()
+        
+        for index, file_path in enumerate(file_paths):
+            try:
+                prepared = self._prepare_file(Path(file_path), project_id, batch_hashes)
+                if isinstance(prepared, dict):
+                    results.append(prepared)
+                else:
+                    file_info = prepared[0]
+                    batch_hashes.add(file_info["file_hash"])
+                    results.append({})
+                    pending.append((index,) + prepared)
+            except Exception as e:
+                results.append({"status": "error", "error": str(e)})
             
-            return {
+            if progress_callback:
+                progress_callback(index + 1)
+        
+        if not pending:
+            return results
+        
+        try:
+            file_ids = self._save_files_metadata([item[1:] for item in pending])
+        except Exception as e:
+            for index, *_ in pending:
+                results[index] = {"status": "error", "error": str(e)}
+            return results
+        
+        for (index, file_info, _, _), file_id in zip(pending, file_ids):
+            results[index] = {
                 "status": "added",
                 "file_id": file_id,
-                "hash": file_hash,
-                "filename": file_path.name,
+                "hash": file_info["file_hash"],
+                "filename": file_info["filename"],
                 "size": file_info["size"],
                 "type": file_info["mime_type"]
             }
-            
-        except Exception as e:
-            return {"status": "error", "error": str(e)}
+        
+        return results
+    
+    def _prepare_file(self, file_path: Path, project_id: str, batch_hashes: set):
+        """Copia il file ed estrae il contenuto
+        
+        Restituisce (file_info, content, processed_content), oppure il dizionario
+        di risultato se il file esiste già.
+        """
+        if not file_path.exists():
+            raise FileNotFoundError(f"File non trovato: {file_path}")
+        
+        # Stesso percorso, dimensione e data di modifica: già importato, niente hash
+        st = file_path.stat()
+        unchanged = self.db.execute_query(
+            "SELECT id, file_hash FROM files WHERE original_path = ? AND size = ? AND mtime_ns = ?",
+            (str(file_path), st.st_size, st.st_mtime_ns)
+        )
+        if unchanged:
+            return {"status": "exists", "hash": unchanged[0][1], "file_id": unchanged[0][0]}
+        
+        # Calcola hash del file
+        file_hash = self._get_file_hash(file_path, st)
+        
+        # Verifica se il file esiste già (anche nello stesso gruppo)
+        if file_hash in batch_hashes:
+            return {"status": "exists", "hash": file_hash, "file_id": None}
+        existing = self.db.execute_query(
+            "SELECT id FROM files WHERE file_hash = ?", (file_hash,)
+        )
+        if existing:
+            return {"status": "exists", "hash": file_hash, "file_id": existing[0][0]}
+        
+        # Copia il file nella directory del progetto
+        dest_filename = f"{file_hash}_{file_path.name}"
+        dest_path = self.files_dir / dest_filename
+        self._fast_copy(file_path, dest_path)
+        
+        # Estrai contenuto (dalla cache se lo stesso contenuto è già stato elaborato)
+        content, processed_content = self._extract_content(file_path, file_hash)
+        
+        file_info = {
+            "filename": file_path.name,
+            "original_path": str(file_path),
+            "file_hash": file_hash,
+            "mime_type": mimetypes.guess_type(str(file_path))[0] or "application/octet-stream",
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "content_preview": content[:500] if content else "",
+            "project_id": project_id
+        }
+        return file_info, content, processed_content
+    
+    @staticmethod
+    def _fast_copy(src: Path, dst: Path):
+        """Copia un file lasciando il lavoro al kernel quando possibile
+        
+        Con copy_file_range (Linux) i dati non passano dallo spazio utente e sui
+        filesystem copy-on-write (btrfs, xfs) la copia diventa un reflink.
+        Negli altri casi shutil.copy2, che usa già sendfile/fcopyfile.
+        """
+        if hasattr(os, 'copy_file_range'):
+            try:
+                with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                    remaining = os.fstat(fsrc.fileno()).st_size
+                    while remaining > 0:
+                        copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                        if copied == 0:
+                            break
+                        remaining -= copied
+                if remaining == 0:
+                    shutil.copystat(src, dst)
+                    return
+            except OSError:
+                pass  # Non supportato (es. filesystem diversi su kernel vecchi)
+        
+        shutil.copy2(src, dst)
+    
+    def _extract_content(self, file_path: Path, file_hash: str) -> tuple:
+        """Estrae il testo del file, riusando quello salvato in cache per lo stesso hash"""
+        raw_cache = self.cache_dir / f"{file_hash}.txt"
+        proc_cache = self.cache_dir / f"{file_hash}.proc.txt"
+        try:
+            return (raw_cache.read_bytes().decode('utf-8'),
+                    proc_cache.read_bytes().decode('utf-8'))
+        except (OSError, UnicodeDecodeError):
+            pass
+        
+        content, extracted = FileProcessor.extract_text(file_path)
+        processed_content = self._process_content(content)
+        
+        # Solo le estrazioni riuscite: errori e librerie mancanti si riprovano al prossimo import
+        if extracted:
+            try:
+                # In byte per conservare i fine riga così come sono
+                raw_cache.write_bytes(content.encode('utf-8'))
+                proc_cache.write_bytes(processed_content.encode('utf-8'))
+            except (OSError, UnicodeEncodeError):
+                pass
+        return content, processed_content
+    
+    def _get_file_hash(self, file_path: Path, st: os.stat_result) -> str:
+        """Hash del file, riutilizzato se già calcolato per lo stesso file invariato"""
+        key = (str(file_path), st.st_size, st.st_mtime_ns)
+        cache = FileManager._hash_cache
+        file_hash = cache.get(key)
+        if file_hash is not None:
+            cache.move_to_end(key)
+            return file_hash
+        
+        file_hash = self._calculate_file_hash(file_path)
+        cache[key] = file_hash
+        if len(cache) > self.HASH_CACHE_SIZE:
+            cache.popitem(last=False)
+        return file_hash
     
     def _calculate_file_hash(self, file_path: Path) -> str:
         """Calcola l'hash SHA256 del file"""
-        hash_sha256 = hashlib.sha256()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            # Python 3.11+: lettura e hashing interamente in C
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, 'sha256').hexdigest()
+            
+            hash_sha256 = hashlib.sha256()
+            for chunk in iter(lambda: f.read(1 << 20), b""):
                 hash_sha256.update(chunk)
-        return hash_sha256.hexdigest()
+            return hash_sha256.hexdigest()
     
     def _process_content(self, content: str) -> str:
         """Processa il contenuto per renderlo più utilizzabile"""
@@ -281,50 +702,84 @@ class FileManager:
             return ""
         
         # Rimuovi caratteri di controllo
-        processed = ''.join(char for char in content if ord(char) >= 32 or char in '\n\t')
+        processed = content.translate(_CTRL_DROP)
         
-        # Normalizza spazi bianchi
-        lines = [line.strip() for line in processed.split('\n')]
-        processed = '\n'.join(line for line in lines if line)
-        
-        return processed
+        # Normalizza spazi bianchi: righe ripulite e senza righe vuote
+        return _LINE_BREAK_RE.sub('\n', processed).strip()
     
     def _save_file_metadata(self, file_info: Dict[str, Any], 
                            content: str, processed_content: str) -> int:
         """Salva i metadati del file nel database"""
-        # Inserisci metadati file
-        file_id = self.db.execute_query("""
-            INSERT INTO files (filename, original_path, file_hash, mime_type, 
-                              size, content_preview, project_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            file_info["filename"],
-            file_info["original_path"],
-            file_info["file_hash"],
-            file_info["mime_type"],
-            file_info["size"],
-            file_info["content_preview"],
-            file_info["project_id"]
-        ))
-        
-        # Inserisci contenuto
-        self.db.execute_query("""
-            INSERT INTO file_content (file_id, content, processed_content)
-            VALUES (?, ?, ?)
-        """, (file_id, content, processed_content))
-        
-        return file_id
+        return self._save_files_metadata([(file_info, content, processed_content)])[0]
+    
+    def _save_files_metadata(self, entries: List[tuple]) -> List[int]:
+        """Salva metadati e contenuti di più file in un'unica transazione"""
+        file_ids = []
+        with self.db.transaction() as conn:
+            for file_info, content, processed_content in entries:
+                # Inserisci metadati file
+                file_id = conn.execute("""
+                    INSERT INTO files (filename, original_path, file_hash, mime_type, 
+                                      size, content_preview, project_id, mtime_ns)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    file_info["filename"],
+                    file_info["original_path"],
+                    file_info["file_hash"],
+                    file_info["mime_type"],
+                    file_info["size"],
+                    file_info["content_preview"],
+                    file_info["project_id"],
+                    file_info.get("mtime_ns")
+                )).lastrowid
+                file_ids.append(file_id)
+            
+            # Inserisci contenuti
+            # Con zstandard il contenuto originale si salva compresso: la ricerca
+            # usa processed_content e l'indice FTS5, non serve in chiaro
+            compressor = zstandard.ZstdCompressor(level=self.ZSTD_LEVEL) if zstandard else None
+            rows = []
+            for file_id, (_, content, processed_content) in zip(file_ids, entries):
+                if compressor and content:
+                    stored, compressed = None, compressor.compress(content.encode('utf-8'))
+                else:
+                    stored, compressed = content, None
+                rows.append((file_id, stored, processed_content, processed_content.lower(), compressed))
+            
+            conn.executemany("""
+                INSERT INTO file_content (file_id, content, processed_content,
+                                          processed_content_lower, content_zstd)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+        
+        self._invalidate_files_cache()
+        return file_ids
     
     def get_files(self, project_id: str = None) -> List[Dict[str, Any]]:
         """Recupera la lista dei file del progetto"""
-        print(f"DEBUG get_files: project_id = {project_id}")
-        print(f"DEBUG get_files: database path = {self.db.db_path}")
+        logger.debug("get_files: project_id=%s, database=%s", project_id, self.db.db_path)
         
         # Prima controlla se il database esiste
         if not os.path.exists(self.db.db_path):
-            print(f"DEBUG: Database file does not exist at {self.db.db_path}")
+            logger.debug("Database non trovato: %s", self.db.db_path)
             return []
-            
+        
+        key = (self._db_key, project_id, self._data_version())
+        cache = FileManager._files_cache
+        files = cache.get(key)
+        if files is None:
+            files = self._query_files(project_id)
+            cache[key] = files
+            if len(cache) > self.FILES_CACHE_SIZE:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        
+        # Copie, così i chiamanti possono modificarle senza toccare la cache
+        return [dict(f) for f in files]
+    
+    def _query_files(self, project_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Legge la lista dei file dal database"""
         if project_id:
             query = """
                 SELECT id, filename, file_hash, mime_type, size, created_at, content_preview
@@ -340,9 +795,7 @@ class FileManager:
             params = None
         
         results = self.db.execute_query(query, params)
-        print(f"DEBUG get_files: query = {query}")
-        print(f"DEBUG get_files: params = {params}")  
-        print(f"DEBUG get_files: raw results = {results}")
+        logger.debug("get_files: %d file (params=%s)", len(results), params)
         
         files = []
         for row in results:
@@ -358,82 +811,188 @@ class FileManager:
         
         return files
     
-    def get_file_content(self, file_id: int) -> Optional[str]:
-        """Recupera il contenuto completo di un file"""
+    def get_file_content(self, file_id: int, offset: int = 0,
+                         length: Optional[int] = None) -> Optional[str]:
+        """Recupera il contenuto di un file, completo o solo una parte
+        
+        Con offset/length il taglio avviene in SQLite (substr), così per
+        un'anteprima non si carica in memoria l'intero testo.
+        """
+        # substr conta i caratteri da 1
+        if length is not None:
+            content_sql, params = "substr(content, ?, ?)", (offset + 1, length, file_id)
+        elif offset:
+            content_sql, params = "substr(content, ?)", (offset + 1, file_id)
+        else:
+            content_sql, params = "content", (file_id,)
+        results = self.db.execute_query(
+            f"SELECT {content_sql}, content_zstd FROM file_content WHERE file_id = ?", params
+        )
+        if not results:
+            return None
+        
+        content, compressed = results[0]
+        if compressed is None:
+            return content
+        return self._decompress_content(compressed, offset, length)
+    
+    def get_file_contents(self, file_ids: List[int]) -> Dict[int, Optional[str]]:
+        """Recupera il contenuto completo di più file con una sola query"""
+        contents: Dict[int, Optional[str]] = dict.fromkeys(file_ids)
+        if not contents:
+            return contents
+        
+        placeholders = ', '.join('?' * len(contents))
         results = self.db.execute_query(
-            "SELECT content FROM file_content WHERE file_id = ?", (file_id,)
+            f"SELECT file_id, content, content_zstd FROM file_content WHERE file_id IN ({placeholders})",
+            tuple(contents)
         )
-        return results[0][0] if results else None
+        for file_id, content, compressed in results:
+            contents[file_id] = (content if compressed is None
+                                 else self._decompress_content(compressed, 0, None))
+        return contents
+    
+    def _decompress_content(self, compressed: bytes, offset: int,
+                            length: Optional[int]) -> Optional[str]:
+        """Decomprime il contenuto salvato con zstd (solo quanto serve per la parte richiesta)"""
+        if zstandard is None:
+            # Non dovrebbe accadere: l'apertura del database lo verifica già
+            raise RuntimeError("zstandard non installato: impossibile leggere il contenuto compresso")
+        
+        reader = zstandard.ZstdDecompressor().stream_reader(compressed)
+        if length is None:
+            data = reader.read()
+            return data.decode('utf-8')[offset:]
+        
+        # Al massimo 4 byte per carattere in UTF-8
+        needed = (offset + length) * 4
+        parts, size = [], 0
+        while size < needed:
+            chunk = reader.read(needed - size)
+            if not chunk:
+                break
+            parts.append(chunk)
+            size += len(chunk)
+        # Un carattere troncato a fine lettura viene scartato
+        text = b"".join(parts).decode('utf-8', errors='ignore')
+        return text[offset:offset + length]
     
     def search_in_files(self, query: str, project_id: str = None, limit: int = 10) -> List[Dict[str, Any]]:
         """Cerca nei contenuti dei file - VERSIONE CORRETTA"""
-        print(f"DEBUG search_in_files: query='{query}', project_id='{project_id}', limit={limit}")
-        
-        # Debug: verifica contenuti
-        content_check = self.db.execute_query("""
-            SELECT f.id, f.filename, LENGTH(fc.content) as content_length, 
-                   LENGTH(fc.processed_content) as processed_length
-            FROM files f 
-            LEFT JOIN file_content fc ON f.id = fc.file_id 
-            WHERE f.project_id = ?
-        """, (project_id,))
-        print(f"DEBUG: File content check: {content_check}")
+        logger.debug("search_in_files: query=%r, project_id=%s, limit=%d", query, project_id, limit)
         
         # Se non c'è query, restituisci tutti i file
         if not query or not query.strip():
-            print("DEBUG: Empty query, returning all files")
+            logger.debug("search_in_files: query vuota")
             return []
         
+        if self.db.fts_enabled:
+            return self._search_fts(query, project_id, limit)
+        return self._search_like(query, project_id, limit)
+    
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def _build_fts_query(query: str) -> Optional[str]:
+        """Converte il testo dell'utente in una query MATCH sicura (prefissi in AND)
+        
+        Memorizzata: la stessa query viene convertita per ogni progetto cercato.
+        """
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return None
+        return ' '.join(f'"{term}"*' for term in terms)
+    
+    def _search_fts(self, query: str, project_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Ricerca tramite indice FTS5, ordinata per rilevanza (bm25)"""
+        match_query = self._build_fts_query(query)
+        if not match_query:
+            return []
+        
+        # Il nome del file pesa più del contenuto
+        sql_query = """
+            SELECT f.id, f.filename, f.mime_type,
+                   snippet(file_content_fts, 1, '', '', '...', 48),
+                   f.content_preview, f.size
+            FROM file_content_fts
+            JOIN files f ON f.id = file_content_fts.rowid
+            WHERE file_content_fts MATCH ?
+        """
+        params = [match_query]
+        if project_id:
+            sql_query += " AND f.project_id = ?"
+            params.append(project_id)
+        sql_query += " ORDER BY bm25(file_content_fts, 1.0, 1.0, 10.0) LIMIT ?"
+        params.append(limit)
+        
+        try:
+            results = self.db.execute_query(sql_query, tuple(params))
+        except sqlite3.OperationalError as e:
+            logger.debug("Ricerca FTS fallita, uso LIKE: %s", e)
+            return self._search_like(query, project_id, limit)
+        
+        logger.debug("Ricerca FTS: %d risultati", len(results))
+        
+        return [{
+            "file_id": row[0],
+            "filename": row[1],
+            "type": row[2],
+            "snippet": row[3] or "",
+            "preview": row[4],
+            "size": row[5]
+        } for row in results]
+    
+    def _search_like(self, query: str, project_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Ricerca per sottostringa (senza indice FTS5)
+        
+        Nome e contenuto elaborato sono già salvati in minuscolo. Il contenuto
+        originale non si interroga: può essere salvato solo compresso (zstd).
+        """
         search_query = f"%{query.lower()}%"
         
         if project_id:
             sql_query = """
-                SELECT f.id, f.filename, f.mime_type, fc.processed_content,
+                SELECT f.id, f.filename, f.mime_type, fc.processed_content_lower,
                        f.content_preview, f.size
                 FROM files f
                 LEFT JOIN file_content fc ON f.id = fc.file_id
                 WHERE f.project_id = ? AND (
-                    LOWER(f.filename) LIKE ? OR 
-                    LOWER(COALESCE(fc.processed_content, '')) LIKE ? OR
-                    LOWER(COALESCE(fc.content, '')) LIKE ?
+                    f.filename_lower LIKE ? OR 
+                    fc.processed_content_lower LIKE ?
                 )
                 ORDER BY 
-                    CASE WHEN LOWER(f.filename) LIKE ? THEN 1 ELSE 2 END,
+                    CASE WHEN f.filename_lower LIKE ? THEN 1 ELSE 2 END,
                     f.created_at DESC
                 LIMIT ?
             """
-            params = (project_id, search_query, search_query, search_query, search_query, limit)
+            params = (project_id, search_query, search_query, search_query, limit)
         else:
             sql_query = """
-                SELECT f.id, f.filename, f.mime_type, fc.processed_content,
+                SELECT f.id, f.filename, f.mime_type, fc.processed_content_lower,
                        f.content_preview, f.size
                 FROM files f
                 LEFT JOIN file_content fc ON f.id = fc.file_id
-                WHERE LOWER(f.filename) LIKE ? OR 
-                      LOWER(COALESCE(fc.processed_content, '')) LIKE ? OR
-                      LOWER(COALESCE(fc.content, '')) LIKE ?
+                WHERE f.filename_lower LIKE ? OR 
+                      fc.processed_content_lower LIKE ?
                 ORDER BY 
-                    CASE WHEN LOWER(f.filename) LIKE ? THEN 1 ELSE 2 END,
+                    CASE WHEN f.filename_lower LIKE ? THEN 1 ELSE 2 END,
                     f.created_at DESC
                 LIMIT ?
             """
-            params = (search_query, search_query, search_query, search_query, limit)
-        
-        print(f"DEBUG: SQL Query: {sql_query}")
-        print(f"DEBUG: Params: {params}")
+            params = (search_query, search_query, search_query, limit)
         
         results = self.db.execute_query(sql_query, params)
-        print(f"DEBUG: Search results: {len(results) if results else 0} items")
+        logger.debug("Ricerca LIKE: %d risultati", len(results) if results else 0)
         
         search_results = []
+        query_lower = query.lower()
         for row in results:
-            # Trova snippet rilevanti
-            content = (row[3] or "").lower()
-            query_lower = query.lower()
+            # Trova snippet rilevanti (contenuto già salvato in minuscolo)
+            content = row[3] or ""
             
             snippet = ""
-            if query_lower in content:
-                index = content.find(query_lower)
+            # Una sola scansione: find dà già sia la presenza sia la posizione
+            index = content.find(query_lower)
+            if index != -1:
                 start = max(0, index - 100)
                 end = min(len(content), index + 200)
                 snippet = content[start:end]
@@ -453,7 +1012,6 @@ class FileManager:
                 "size": row[5]
             })
         
-        print(f"DEBUG: Returning {len(search_results)} search results")
         return search_results
     
     def delete_file(self, file_id: int) -> bool:
@@ -474,9 +1032,16 @@ class FileManager:
             if file_path.exists():
                 file_path.unlink()
             
+            # Elimina il testo estratto in cache
+            for cache_file in (self.cache_dir / f"{file_hash}.txt",
+                               self.cache_dir / f"{file_hash}.proc.txt"):
+                cache_file.unlink(missing_ok=True)
+            
             # Elimina dal database
-            self.db.execute_query("DELETE FROM file_content WHERE file_id = ?", (file_id,))
-            self.db.execute_query("DELETE FROM files WHERE id = ?", (file_id,))
+            with self.db.transaction() as conn:
+                conn.execute("DELETE FROM file_content WHERE file_id = ?", (file_id,))
+                conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            self._invalidate_files_cache()
             
             return True
         except Exception:
@@ -486,6 +1051,12 @@ class FileManager:
 class ProjectManager:
     """Gestore principale dei progetti"""
     
+    # Formati già compressi: nell'export vengono salvati senza ricomprimerli
+    INCOMPRESSIBLE_EXTENSIONS = {
+        '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.zip', '.gz', '.7z',
+        '.mp3', '.mp4', '.xlsx', '.docx', '.pptx'
+    }
+    
     def __init__(self, projects_dir: str):
         self.projects_dir = Path(projects_dir)
         self.projects_dir.mkdir(parents=True, exist_ok=True)
@@ -496,7 +1067,9 @@ class ProjectManager:
     
     def create_project(self, name: str, description: str = "") -> str:
         """Crea un nuovo progetto"""
-        project_id = f"proj_{int(time.time())}_{hash(name) % 10000}"
+        # blake2b e non hash(): quest'ultimo cambia a ogni avvio (PYTHONHASHSEED)
+        name_hash = hashlib.blake2b(name.encode('utf-8'), digest_size=3).hexdigest()
+        project_id = f"proj_{int(time.time())}_{name_hash}"
         project_dir = self.projects_dir / project_id
         project_dir.mkdir(exist_ok=True)
         
@@ -572,9 +1145,10 @@ class ProjectManager:
     def delete_project(self, project_id: str) -> bool:
         """Elimina un progetto"""
         try:
-            # Elimina directory
+            # Elimina directory (chiudendo prima i database aperti al suo interno)
             project_dir = self.projects_dir / project_id
             if project_dir.exists():
+                DatabaseManager.close_all_in(project_dir)
                 shutil.rmtree(project_dir)
             
             # Elimina dal database
@@ -591,12 +1165,16 @@ class ProjectManager:
             if not project_dir.exists():
                 return False
             
-            with zipfile.ZipFile(export_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            with zipfile.ZipFile(export_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zipf:
                 for root, dirs, files in os.walk(project_dir):
                     for file in files:
                         file_path = os.path.join(root, file)
                         arcname = os.path.relpath(file_path, project_dir)
-                        zipf.write(file_path, arcname)
+                        # Livello 1: molto più veloce del 6 predefinito, dimensione quasi uguale
+                        if os.path.splitext(file)[1].lower() in self.INCOMPRESSIBLE_EXTENSIONS:
+                            zipf.write(file_path, arcname, compress_type=zipfile.ZIP_STORED)
+                        else:
+                            zipf.write(file_path, arcname, compresslevel=1)
             
             return True
         except Exception:
@@ -658,8 +1236,33 @@ class ProjectManager:
 class KnowledgeBase:
     """Sistema di knowledge base con ricerca avanzata - VERSIONE CORRETTA"""
     
+    # Unità di misura, una ogni 1024 (2**10) byte
+    SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB', 'EB', 'ZB', 'YB')
+    
     def __init__(self, project_manager: ProjectManager):
         self.project_manager = project_manager
+        # FileManager già aperti, per progetto
+        self._fm_cache: Dict[str, FileManager] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    def _search_executor(self) -> ThreadPoolExecutor:
+        """Pool per le ricerche su più progetti
+        
+        Resta attivo tra una ricerca e l'altra: i thread riusano le proprie
+        connessioni SQLite invece di aprirne di nuove a ogni ricerca.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1),
+                                                thread_name_prefix="kb-search")
+        return self._executor
+    
+    def _fm(self, project_id: str) -> FileManager:
+        """Restituisce il FileManager del progetto, creandolo alla prima richiesta"""
+        file_manager = self._fm_cache.get(project_id)
+        if file_manager is None:
+            file_manager = FileManager(str(self.project_manager.projects_dir / project_id))
+            self._fm_cache[project_id] = file_manager
+        return file_manager
     
     def search_across_projects(self, query: str, project_ids: List[str] = None, 
                               limit: int = 20) -> List[Dict[str, Any]]:
@@ -668,29 +1271,36 @@ class KnowledgeBase:
             projects = self.project_manager.get_projects()
             project_ids = [p['id'] for p in projects]
         
-        all_results = []
+        # Risultati per (progetto, file): ogni file compare una sola volta
+        all_results: Dict[tuple, Dict[str, Any]] = {}
+        per_limit = max(1, limit // len(project_ids)) if project_ids else 0
         
+        # Ogni progetto ha il proprio database: le ricerche procedono in parallelo
+        # (sqlite3 rilascia il GIL durante l'esecuzione delle query)
+        searches = []
         for project_id in project_ids:
             project_dir = self.project_manager.projects_dir / project_id
             if project_dir.exists():
-                file_manager = FileManager(str(project_dir))
-                results = file_manager.search_in_files(query, project_id, limit // len(project_ids))
-                
-                # Aggiungi info progetto ai risultati
-                project_info = self.project_manager.get_project(project_id)
-                for result in results:
-                    result['project_name'] = project_info['name'] if project_info else 'Sconosciuto'
-                    result['project_id'] = project_id
-                
-                all_results.extend(results)
+                file_manager = self._fm(project_id)
+                searches.append((project_id, self._search_executor().submit(
+                    file_manager.search_in_files, query, project_id, per_limit)))
         
-        # Ordina per rilevanza (i file nel nome hanno priorità)
-        all_results.sort(key=lambda x: (
-            0 if query.lower() in x['filename'].lower() else 1,
-            -len(x['snippet'])
-        ))
-        
-        return all_results[:limit]
+        for project_id, future in searches:
+            results = future.result()
+            
+            # Aggiungi info progetto ai risultati
+            project_info = self.project_manager.get_project(project_id)
+            for result in results:
+                result['project_name'] = project_info['name'] if project_info else 'Sconosciuto'
+                result['project_id'] = project_id
+                all_results.setdefault((project_id, result['file_id']), result)
+        
+        # Primi risultati per rilevanza: i file nel nome hanno priorità, poi l'ordine
+        # di ogni progetto (bm25 con l'indice FTS5); nsmallest è stabile a parità
+        # di chiave e costa O(N log limit) invece di ordinare tutto
+        query_lower = query.lower()
+        return heapq.nsmallest(limit, all_results.values(),
+                               key=lambda x: 0 if query_lower in x['filename'].lower() else 1)
     
     def generate_project_summary(self, project_id: str, max_files: int = 10) -> str:
         """Genera un riassunto della knowledge base del progetto"""
@@ -713,7 +1323,7 @@ class KnowledgeBase:
         # Elenca alcuni file recenti
         project_dir = self.project_manager.projects_dir / project_id
         if project_dir.exists():
-            file_manager = FileManager(str(project_dir))
+            file_manager = self._fm(project_id)
             recent_files = file_manager.get_files(project_id)[:max_files]
             
             if recent_files:
@@ -729,23 +1339,41 @@ class KnowledgeBase:
     def get_context_for_query(self, query: str, project_id: str, 
                              max_context_length: int = 2000) -> str:
         """Ottiene il contesto dalla knowledge base per una query - VERSIONE CORRETTA"""
-        print(f"DEBUG get_context_for_query: query='{query[:50]}...', project_id='{project_id}', max_length={max_context_length}")
+        logger.debug("get_context_for_query: query=%r, project_id=%s, max_length=%d",
+                     query[:50], project_id, max_context_length)
         
         project_dir = self.project_manager.projects_dir / project_id
         if not project_dir.exists():
-            print(f"DEBUG: Project directory does not exist: {project_dir}")
+            logger.debug("Directory del progetto non trovata: %s", project_dir)
             return ""
         
-        file_manager = FileManager(str(project_dir))
+        file_manager = self._fm(project_id)
+        
+        # Contenuti letti a gruppi (una query per gruppo) e mai riletti per lo stesso file
+        contents: Dict[int, Optional[str]] = {}
+        
+        def prefetch(file_ids):
+            missing = [file_id for file_id in file_ids if file_id not in contents]
+            if missing:
+                contents.update(file_manager.get_file_contents(missing))
+        
+        def file_content(file_id: int) -> Optional[str]:
+            prefetch((file_id,))
+            return contents[file_id]
         
         # Cerca in base alla query - usa una ricerca più ampia
         search_terms = query.split()[:3]  # Prendi le prime 3 parole
         search_results = []
         
-        # Prova con termini singoli se la query completa non trova nulla
-        for term in [query] + search_terms:
-            if len(term) > 2:  # Ignora parole troppo corte
-                results = file_manager.search_in_files(term.strip(), project_id, 3)
+        # Prova con termini singoli se la query completa non trova nulla; la ricerca
+        # ignora le maiuscole, quindi un termine ripetuto (o uguale alla query
+        # di una sola parola) darebbe lo stesso risultato vuoto
+        terms = {term.strip().casefold(): term.strip()
+                 for term in [query] + search_terms
+                 if len(term) > 2}  # Ignora parole troppo corte
+        for term in terms.values():
+            if term:
+                results = file_manager.search_in_files(term, project_id, 3)
                 search_results.extend(results)
                 if results:  # Se trova qualcosa, fermati
                     break
@@ -758,65 +1386,68 @@ class KnowledgeBase:
                 unique_results.append(result)
                 seen_ids.add(result['file_id'])
         
-        print(f"DEBUG: Found {len(unique_results)} unique search results")
+        logger.debug("%d risultati distinti", len(unique_results))
         
         if not unique_results:
             # Se non trova nulla con la ricerca, prendi i primi file disponibili
-            print("DEBUG: No search results, getting all files")
+            logger.debug("Nessun risultato, uso tutti i file")
             all_files = file_manager.get_files(project_id)
             if all_files:
+                prefetch(f['id'] for f in all_files[:2])
+                
+                # File con contenuto utile, letti solo finché servono
+                def files_with_content():
+                    for file_info in all_files:
+                        content = file_content(file_info['id'])
+                        if content and len(content.strip()) > 10:
+                            yield file_info, content
+                
                 # Converti in formato search_results
-                for file_info in all_files[:2]:  # Prendi i primi 2 file
-                    content = file_manager.get_file_content(file_info['id'])
-                    if content and len(content.strip()) > 10:
-                        unique_results.append({
-                            'file_id': file_info['id'],
-                            'filename': file_info['filename'],
-                            'type': file_info['type'],
-                            'snippet': content[:200] + "..." if len(content) > 200 else content,
-                            'preview': file_info.get('preview', ''),
-                            'size': file_info['size']
-                        })
+                for file_info, content in islice(files_with_content(), 2):  # Prendi i primi 2 file
+                    unique_results.append({
+                        'file_id': file_info['id'],
+                        'filename': file_info['filename'],
+                        'type': file_info['type'],
+                        'snippet': content[:200] + "..." if len(content) > 200 else content,
+                        'preview': file_info.get('preview', ''),
+                        'size': file_info['size']
+                    })
         
         if not unique_results:
-            print("DEBUG: No content found in any files")
+            logger.debug("Nessun contenuto nei file")
             return ""
         
         # Costruisci il contesto
-        context = "CONTESTO DALLA KNOWLEDGE BASE:\n\n"
-        current_length = len(context)
+        parts = ["CONTESTO DALLA KNOWLEDGE BASE:\n\n"]
+        current_length = len(parts[0])
         
+        prefetch(r['file_id'] for r in unique_results[:3])
         for result in unique_results[:3]:  # Massimo 3 file
             if current_length >= max_context_length:
                 break
             
-            print(f"DEBUG: Processing file {result['filename']} (ID: {result['file_id']})")
-            file_content = file_manager.get_file_content(result['file_id'])
+            logger.debug("Elaboro %s (ID: %s)", result['filename'], result['file_id'])
+            content = file_content(result['file_id'])
             
-            if file_content and len(file_content.strip()) > 10:
+            if content and len(content.strip()) > 10:
                 file_header = f"=== FILE: {result['filename']} ===\n"
                 
+                # Spazio disponibile calcolato prima: lo snippet (ellissi incluse)
+                # rientra sempre nel limite e non va troncato dopo
+                budget = min(800, max_context_length - current_length - len(file_header) - 10)
+                if budget <= 100:  # Solo se c'è spazio sufficiente per contenuto utile
+                    break
+                
                 # Estrai la parte più rilevante del contenuto
-                content_snippet = self._extract_relevant_snippet(
-                    file_content, query, min(800, max_context_length - current_length - len(file_header) - 10)
-                )
+                content_snippet = self._extract_relevant_snippet(content, query, budget)
                 
                 addition = file_header + content_snippet + "\n\n"
-                
-                if current_length + len(addition) <= max_context_length:
-                    context += addition
-                    current_length += len(addition)
-                    print(f"DEBUG: Added {len(addition)} chars from {result['filename']}")
-                else:
-                    remaining = max_context_length - current_length
-                    if remaining > 100:  # Solo se c'è spazio sufficiente per contenuto utile
-                        context += addition[:remaining] + "...\n\n"
-                        print(f"DEBUG: Added truncated {remaining} chars from {result['filename']}")
-                    break
+                parts.append(addition)
+                current_length += len(addition)
+                logger.debug("Aggiunti %d caratteri da %s", len(addition), result['filename'])
         
-        final_context = context.strip()
-        print(f"DEBUG: Final context length: {len(final_context)}")
-        print(f"DEBUG: Context preview: {final_context[:200]}...")
+        final_context = ''.join(parts).strip()
+        logger.debug("Contesto finale: %d caratteri", len(final_context))
         
         return final_context
     
@@ -824,25 +1455,18 @@ class KnowledgeBase:
         """Estrae uno snippet rilevante dal contenuto"""
         if max_length <= 0:
             return ""
-            
-        query_lower = query.lower()
-        content_lower = content.lower()
-        
-        # Trova la prima occorrenza della query o delle sue parole
-        query_words = [w.strip().lower() for w in query.split() if len(w.strip()) > 2]
-        best_index = -1
         
-        # Cerca la query completa prima
-        index = content_lower.find(query_lower)
-        if index != -1:
-            best_index = index
-        else:
-            # Cerca le singole parole
-            for word in query_words:
-                index = content_lower.find(word)
-                if index != -1:
-                    best_index = index
-                    break
+        # Contenuto già entro il limite: va incluso tutto, niente da cercare
+        if len(content) <= max_length:
+            return content
+            
+        # Trova la prima occorrenza della query o delle sue parole, senza creare
+        # una copia in minuscolo dell'intero contenuto
+        query_pattern, words_pattern = _snippet_patterns(query)
+        match = query_pattern.search(content)
+        if match is None and words_pattern is not None:
+            match = words_pattern.search(content)
+        best_index = match.start() if match else -1
         
         if best_index == -1:
             # Se non trova nulla, prendi l'inizio
@@ -851,13 +1475,13 @@ class KnowledgeBase:
             # Centra lo snippet attorno alla posizione trovata
             start = max(0, best_index - max_length // 3)
             end = min(len(content), start + max_length)
-            snippet = content[start:end]
             
-            # Aggiungi ellipsis se necessario
-            if start > 0:
-                snippet = "..." + snippet
-            if end < len(content):
-                snippet = snippet + "..."
+            # Aggiungi ellipsis se necessario (una sola stringa, senza copie intermedie)
+            snippet = "".join((
+                "..." if start > 0 else "",
+                content[start:end],
+                "..." if end < len(content) else "",
+            ))
         
         return snippet
     
@@ -865,20 +1489,7 @@ class KnowledgeBase:
         """Formatta la dimensione in formato leggibile"""
         if size_bytes < 1024:
             return f"{size_bytes} B"
-        elif size_bytes < 1024**2:
-            return f"{size_bytes/1024:.1f} KB"
-        elif size_bytes < 1024**3:
-            return f"{size_bytes/(1024**2):.1f} MB"
-        elif size_bytes < 1024**4:
-            return f"{size_bytes/(1024**3):.1f} GB"
-        elif size_bytes < 1024**5:
-            return f"{size_bytes/(1024**3):.1f} TB"
-        elif size_bytes < 1024**6:
-            return f"{size_bytes/(1024**3):.1f} PB"
-        elif size_bytes < 1024**7:
-            return f"{size_bytes/(1024**3):.1f} EB"
-        elif size_bytes < 1024**8:
-            return f"{size_bytes/(1024**3):.1f} ZB"
-        elif size_bytes < 1024**9:
-            return f"{size_bytes/(1024**3):.1f} YB"
+        # Esponente di 1024 dal numero di bit: 1024 -> 1 (KB), 1024**2 -> 2 (MB)...
+        unit = min((size_bytes.bit_length() - 1) // 10, len(self.SIZE_UNITS) - 1)
+        return f"{size_bytes / (1 << (10 * unit)):.1f} {self.SIZE_UNITS[unit]}"
         
\ No newline at end of file
@@ -4,11 +4,32 @@ Sistema di stili PULITO per Ollama Chat GUI
 Design minimalista con tema bianco professionale e coerenza completa
 """
 
+import re
+from functools import lru_cache
+from types import MappingProxyType
+
+
+# Minificazione QSS: commenti e spazi superflui non servono al parser di Qt
+_QSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_QSS_SPACE_RE = re.compile(r'\s+')
+_QSS_PUNCT_RE = re.compile(r' ?([{};]) ?')
+
+
+def _minify_qss(stylesheet):
+    """Rimuove commenti e spazi ridondanti da un foglio di stile QSS"""
+    stylesheet = _QSS_COMMENT_RE.sub('', stylesheet)
+    stylesheet = _QSS_SPACE_RE.sub(' ', stylesheet)
+    return _QSS_PUNCT_RE.sub(r'\1', stylesheet).strip()
+
+
 class StyleManager:
     """Gestore centralizzato degli stili con design pulito e coerente"""
     
-    # Palette colori pulita e coerente
-    COLORS = {
+    # Palette colori pulita e coerente (di sola lettura: i fogli di stile
+    # generati restano in cache, quindi i valori non devono cambiare)
+    # Alcuni ruoli hanno lo stesso valore (surface_hover/border_light,
+    # secondary/text_secondary) ma restano chiavi distinte: DarkTheme li differenzia
+    COLORS = MappingProxyType({
         'primary': '#2563eb',        # Blu professionale
         'primary_hover': '#1d4ed8',  # Blu hover
         'primary_light': '#dbeafe',  # Blu chiaro per backgrounds
@@ -29,124 +50,126 @@ class StyleManager:
         'text_muted': '#94a3b8',     # Testo disabilitato
         'shadow': 'rgba(0, 0, 0, 0.1)', # Ombra sottile
         'shadow_light': 'rgba(0, 0, 0, 0.05)', # Ombra più leggera
-    }
+    })
     
     # Font families coerenti
-    FONTS = {
+    FONTS = MappingProxyType({
         'primary': 'Segoe UI, system-ui, -apple-system, sans-serif',
         'code': 'Consolas, Monaco, "Courier New", monospace',
         'emoji': 'Segoe UI Emoji, "Apple Color Emoji", "Noto Color Emoji"'
-    }
+    })
     
-    @staticmethod
-    def get_main_window_style():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _style_values(cls):
+        """Valori per i template QSS: colori per nome, font come font_<nome>"""
+        values = dict(cls.COLORS)
+        values.update({f'font_{name}': family for name, family in cls.FONTS.items()})
+        return values
+    
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_main_window_style(cls):
         """Stile principale pulito"""
-        return f"""
+        return """
             QMainWindow {{
-                background-color: {StyleManager.COLORS['background']};
-                color: {StyleManager.COLORS['text_primary']};
-                font-family: {StyleManager.FONTS['primary']};
+                background-color: {background};
+                color: {text_primary};
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_sidebar_style():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_sidebar_style(cls):
         """Sidebar pulita e minimalista"""
-        return f"""
+        return """
             QFrame#modernSidebar {{
-                background-color: {StyleManager.COLORS['surface']};
-                border-right: 1px solid {StyleManager.COLORS['border']};
+                background-color: {surface};
+                border-right: 1px solid {border};
                 border-radius: 0px;
             }}
             
             QLabel#mainTitle {{
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-size: 22px;
                 font-weight: 700;
                 margin: 20px 0px;
                 padding: 20px;
-                background-color: {StyleManager.COLORS['background']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                border: 1px solid {border};
                 border-radius: 8px;
                 text-align: center;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#subtitle {{
-                color: {StyleManager.COLORS['text_secondary']};
+                color: {text_secondary};
                 font-size: 12px;
                 font-weight: 500;
                 margin-bottom: 20px;
                 text-align: center;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#sectionTitle {{
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-weight: 600;
                 font-size: 13px;
                 margin: 20px 0 10px 0;
                 padding: 8px 0px;
                 text-transform: uppercase;
                 letter-spacing: 0.5px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#currentProject {{
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-weight: 500;
-                background-color: {StyleManager.COLORS['background']};
+                background-color: {background};
                 padding: 12px;
                 border-radius: 6px;
-                border: 1px solid {StyleManager.COLORS['border']};
+                border: 1px solid {border};
                 margin: 8px 0;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#connectionTitle {{
-                color: {StyleManager.COLORS['text_secondary']};
+                color: {text_secondary};
                 font-weight: 600;
                 font-size: 11px;
                 margin-top: 8px;
                 text-transform: uppercase;
                 letter-spacing: 0.5px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#connectionStatus {{
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-size: 12px;
                 padding: 8px 12px;
-                background-color: {StyleManager.COLORS['background']};
+                background-color: {background};
                 border-radius: 4px;
-                border: 1px solid {StyleManager.COLORS['border_light']};
+                border: 1px solid {border_light};
                 margin: 4px 0;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#panelTitle {{
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-weight: 600;
                 font-size: 14px;
                 margin: 10px 0;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#statsLabel {{
-                color: {StyleManager.COLORS['text_secondary']};
+                color: {text_secondary};
                 font-size: 11px;
                 font-weight: 500;
                 margin-bottom: 15px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_button_styles():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_button_styles(cls):
         """Pulsanti puliti e moderni"""
-        return f"""
+        return """
             QPushButton#primaryButton {{
-                background-color: {StyleManager.COLORS['primary']};
+                background-color: {primary};
                 color: white;
                 border: none;
                 border-radius: 6px;
@@ -154,45 +177,43 @@ class StyleManager:
                 font-weight: 500;
                 font-size: 12px;
                 min-height: 20px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QPushButton#primaryButton:hover {{
-                background-color: {StyleManager.COLORS['primary_hover']};
+                background-color: {primary_hover};
             }}
             
             QPushButton#primaryButton:pressed {{
-                background-color: {StyleManager.COLORS['primary_hover']};
+                background-color: {primary_hover};
             }}
             
             QPushButton#primaryButton:disabled {{
-                background-color: {StyleManager.COLORS['text_muted']};
+                background-color: {text_muted};
                 color: white;
             }}
             
             QPushButton#secondaryButton {{
-                background-color: {StyleManager.COLORS['background']};
-                color: {StyleManager.COLORS['text_primary']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                color: {text_primary};
+                border: 1px solid {border};
                 border-radius: 6px;
                 padding: 10px 16px;
                 font-weight: 500;
                 font-size: 12px;
                 min-height: 20px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QPushButton#secondaryButton:hover {{
-                background-color: {StyleManager.COLORS['surface']};
-                border-color: {StyleManager.COLORS['primary']};
+                background-color: {surface};
+                border-color: {primary};
             }}
             
             QPushButton#secondaryButton:pressed {{
-                background-color: {StyleManager.COLORS['border_light']};
+                background-color: {border_light};
             }}
             
             QPushButton#warningButton {{
-                background-color: {StyleManager.COLORS['warning']};
+                background-color: {warning};
                 color: white;
                 border: none;
                 border-radius: 6px;
@@ -200,7 +221,6 @@ class StyleManager:
                 font-weight: 500;
                 font-size: 12px;
                 min-height: 20px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QPushButton#warningButton:hover {{
@@ -208,7 +228,7 @@ class StyleManager:
             }}
             
             QPushButton#sendButton {{
-                background-color: {StyleManager.COLORS['success']};
+                background-color: {success};
                 color: white;
                 border: none;
                 border-radius: 6px;
@@ -216,7 +236,6 @@ class StyleManager:
                 font-size: 13px;
                 min-width: 80px;
                 padding: 10px 20px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QPushButton#sendButton:hover {{
@@ -224,11 +243,11 @@ class StyleManager:
             }}
             
             QPushButton#sendButton:disabled {{
-                background-color: {StyleManager.COLORS['text_muted']};
+                background-color: {text_muted};
             }}
             
             QPushButton#stopButton {{
-                background-color: {StyleManager.COLORS['danger']};
+                background-color: {danger};
                 color: white;
                 border: none;
                 border-radius: 6px;
@@ -236,7 +255,6 @@ class StyleManager:
                 font-size: 13px;
                 min-width: 80px;
                 padding: 10px 20px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QPushButton#stopButton:hover {{
@@ -244,58 +262,57 @@ class StyleManager:
             }}
             
             QPushButton#attachButton {{
-                background-color: {StyleManager.COLORS['background']};
-                color: {StyleManager.COLORS['text_secondary']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                color: {text_secondary};
+                border: 1px solid {border};
                 border-radius: 6px;
                 font-weight: 500;
                 font-size: 14px;
                 padding: 10px;
-                font-family: {StyleManager.FONTS['emoji']};
+                font-family: {font_emoji};
             }}
             
             QPushButton#attachButton:hover {{
-                background-color: {StyleManager.COLORS['surface']};
-                color: {StyleManager.COLORS['primary']};
-                border-color: {StyleManager.COLORS['primary']};
+                background-color: {surface};
+                color: {primary};
+                border-color: {primary};
             }}
             
             QPushButton#sectionHeader {{
-                background-color: {StyleManager.COLORS['surface']};
-                color: {StyleManager.COLORS['text_primary']};
-                border: 1px solid {StyleManager.COLORS['border_light']};
+                background-color: {surface};
+                color: {text_primary};
+                border: 1px solid {border_light};
                 border-radius: 8px;
                 padding: 10px 15px;
                 text-align: left;
                 font-weight: 600;
                 font-size: 12px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QPushButton#sectionHeader:hover {{
-                background-color: {StyleManager.COLORS['surface_hover']};
-                border-color: {StyleManager.COLORS['border']};
+                background-color: {surface_hover};
+                border-color: {border};
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_input_styles():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_input_styles(cls):
         """Input puliti e moderni"""
-        return f"""
+        return """
             QComboBox#modernCombo, QComboBox#templateCombo {{
-                background-color: {StyleManager.COLORS['background']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                border: 1px solid {border};
                 border-radius: 6px;
                 padding: 10px 12px;
                 font-size: 12px;
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-weight: 500;
                 min-height: 20px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QComboBox#modernCombo:focus, QComboBox#templateCombo:focus {{
-                border-color: {StyleManager.COLORS['primary']};
+                border-color: {primary};
                 outline: none;
             }}
             
@@ -309,93 +326,88 @@ class StyleManager:
                 image: none;
                 border-left: 4px solid transparent;
                 border-right: 4px solid transparent;
-                border-top: 6px solid {StyleManager.COLORS['text_secondary']};
+                border-top: 6px solid {text_secondary};
                 margin-right: 6px;
             }}
             
             QComboBox#modernCombo QAbstractItemView, QComboBox#templateCombo QAbstractItemView {{
-                background-color: {StyleManager.COLORS['background']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                border: 1px solid {border};
                 border-radius: 6px;
-                selection-background-color: {StyleManager.COLORS['surface']};
-                selection-color: {StyleManager.COLORS['text_primary']};
-                color: {StyleManager.COLORS['text_primary']};
+                selection-background-color: {surface};
+                selection-color: {text_primary};
+                color: {text_primary};
                 font-weight: 500;
                 padding: 4px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLineEdit#messageInput, QLineEdit#projectNameInput {{
-                background-color: {StyleManager.COLORS['background']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                border: 1px solid {border};
                 border-radius: 8px;
                 padding: 12px 16px;
                 font-size: 13px;
-                color: {StyleManager.COLORS['text_primary']};
-                font-family: {StyleManager.FONTS['primary']};
+                color: {text_primary};
                 font-weight: 400;
             }}
             
             QLineEdit#messageInput:focus, QLineEdit#projectNameInput:focus {{
-                border-color: {StyleManager.COLORS['primary']};
+                border-color: {primary};
                 outline: none;
             }}
             
             QLineEdit#messageInput::placeholder, QLineEdit#projectNameInput::placeholder {{
-                color: {StyleManager.COLORS['text_muted']};
+                color: {text_muted};
             }}
             
             QTextEdit#projectDescInput, QTextEdit#knowledgeSummary {{
-                background-color: {StyleManager.COLORS['background']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                border: 1px solid {border};
                 border-radius: 6px;
                 padding: 12px;
                 font-size: 12px;
-                color: {StyleManager.COLORS['text_primary']};
-                font-family: {StyleManager.FONTS['primary']};
+                color: {text_primary};
                 font-weight: 400;
             }}
             
             QTextEdit#projectDescInput:focus, QTextEdit#knowledgeSummary:focus {{
-                border-color: {StyleManager.COLORS['primary']};
+                border-color: {primary};
                 outline: none;
             }}
             
             QSpinBox {{
-                background-color: {StyleManager.COLORS['background']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                border: 1px solid {border};
                 border-radius: 6px;
                 padding: 8px 12px;
                 font-size: 12px;
-                color: {StyleManager.COLORS['text_primary']};
-                font-family: {StyleManager.FONTS['primary']};
+                color: {text_primary};
                 font-weight: 400;
             }}
             
             QSpinBox:focus {{
-                border-color: {StyleManager.COLORS['primary']};
+                border-color: {primary};
                 outline: none;
             }}
             
             QCheckBox {{
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-size: 11px;
                 font-weight: 400;
-                font-family: {StyleManager.FONTS['primary']};
                 spacing: 8px;
             }}
             
             QCheckBox::indicator {{
                 width: 16px;
                 height: 16px;
-                border: 2px solid {StyleManager.COLORS['border']};
+                border: 2px solid {border};
                 border-radius: 3px;
-                background-color: {StyleManager.COLORS['background']};
+                background-color: {background};
             }}
             
             QCheckBox::indicator:checked {{
-                background-color: {StyleManager.COLORS['primary']};
-                border-color: {StyleManager.COLORS['primary']};
+                background-color: {primary};
+                border-color: {primary};
                 image: none;
             }}
             
@@ -405,46 +417,44 @@ class StyleManager:
                 font-weight: bold;
                 font-size: 12px;
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_chat_area_styles():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_chat_area_styles(cls):
         """Area chat pulita"""
-        return f"""
+        return """
             QWidget#chatArea {{
-                background-color: {StyleManager.COLORS['background']};
-                border-left: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                border-left: 1px solid {border};
             }}
             
             QFrame#chatHeader {{
-                background-color: {StyleManager.COLORS['background']};
-                border-bottom: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                border-bottom: 1px solid {border};
             }}
             
             QLabel#chatTitle {{
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-size: 18px;
                 font-weight: 600;
                 margin: 8px 0;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#typingIndicator {{
-                color: {StyleManager.COLORS['success']};
+                color: {success};
                 font-size: 12px;
                 font-weight: 500;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#contextLabel {{
-                color: {StyleManager.COLORS['text_secondary']};
+                color: {text_secondary};
                 font-size: 11px;
                 font-weight: 500;
-                background-color: {StyleManager.COLORS['surface']};
+                background-color: {surface};
                 padding: 8px 12px;
                 border-radius: 4px;
-                border: 1px solid {StyleManager.COLORS['border_light']};
-                font-family: {StyleManager.FONTS['primary']};
+                border: 1px solid {border_light};
             }}
             
             QScrollArea#messagesScrollArea, QScrollArea#smartScrollArea {{
@@ -457,17 +467,18 @@ class StyleManager:
             }}
             
             QFrame#inputArea {{
-                background-color: {StyleManager.COLORS['surface']};
-                border-top: 1px solid {StyleManager.COLORS['border']};
+                background-color: {surface};
+                border-top: 1px solid {border};
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_message_styles():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_message_styles(cls):
         """Messaggi puliti e leggibili"""
-        return f"""
+        return """
             QFrame#userMessage {{
-                background-color: {StyleManager.COLORS['primary']};
+                background-color: {primary};
                 border: none;
                 border-radius: 12px 12px 4px 12px;
                 margin: 8px 60px 8px 8px;
@@ -475,42 +486,44 @@ class StyleManager:
             }}
             
             QFrame#assistantMessage {{
-                background-color: {StyleManager.COLORS['surface']};
-                border: 1px solid {StyleManager.COLORS['border_light']};
+                background-color: {surface};
+                border: 1px solid {border_light};
                 border-radius: 12px 12px 12px 4px;
                 margin: 8px 8px 8px 60px;
                 padding: 12px 16px;
             }}
             
             QLabel#messageContent {{
-                color: {StyleManager.COLORS['text_primary']}; /* Corretto: usa il colore del testo primario del tema */
+                color: {text_primary}; /* Corretto: usa il colore del testo primario del tema */
                 font-size: 13px;
                 line-height: 1.5;
                 background: transparent;
                 border: none;
                 font-weight: 400;
-                font-family: {StyleManager.FONTS['primary']};
+            }}
+            
+            QLabel#messageContent[error="true"] {{
+                color: {danger};
+                font-weight: 500;
             }}
             
             QLabel#userMessageContent {{
-                color: {StyleManager.COLORS['text_primary']}; /* Usa il colore del testo primario del tema */
+                color: {text_primary}; /* Usa il colore del testo primario del tema */
                 font-size: 13px;
                 line-height: 1.5;
                 background: transparent;
                 border: none;
                 font-weight: 400;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#messageHeader {{
-                color: {StyleManager.COLORS['text_muted']};
+                color: {text_muted};
                 font-size: 10px;
                 font-weight: 600;
                 margin-bottom: 6px;
                 background: transparent;
                 text-transform: uppercase;
                 letter-spacing: 0.5px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#userMessageHeader {{
@@ -521,52 +534,50 @@ class StyleManager:
                 background: transparent;
                 text-transform: uppercase;
                 letter-spacing: 0.5px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#statusIndicator {{
-                color: {StyleManager.COLORS['success']};
+                color: {success};
                 font-size: 11px;
                 font-weight: 500;
                 padding: 4px 8px;
-                background-color: {StyleManager.COLORS['success_light']};
+                background-color: rgba(5, 150, 105, 0.1);
                 border-radius: 4px;
                 border: 1px solid rgba(5, 150, 105, 0.2);
-                font-family: {StyleManager.FONTS['primary']};
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_dialog_styles():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_dialog_styles(cls):
         """Dialog con design pulito, moderno e coesivo"""
-        return f"""
+        return """
             QDialog {{
-                background-color: {StyleManager.COLORS['surface']};
-                color: {StyleManager.COLORS['text_primary']};
+                background-color: {surface};
+                color: {text_primary};
                 border-radius: 12px;
-                border: 1px solid {StyleManager.COLORS['border']};
-                font-family: {StyleManager.FONTS['primary']};
+                border: 1px solid {border};
             }}
             
             /* Header del Dialog */
             QFrame#dialogHeader {{
                 background-color: transparent;
-                border-bottom: 1px solid {StyleManager.COLORS['border']};
+                border-bottom: 1px solid {border};
                 border-radius: 0;
                 padding: 10px 20px;
             }}
             
             QLabel#dialogIcon {{
-                background-color: {StyleManager.COLORS['primary_light']};
+                background-color: {primary_light};
                 border-radius: 25px; /* Cerchio perfetto */
                 font-size: 22px;
-                color: {StyleManager.COLORS['primary']};
-                font-family: {StyleManager.FONTS['emoji']};
+                color: {primary};
+                font-family: {font_emoji};
                 qproperty-alignment: 'AlignCenter';
             }}
             
             QLabel#dialogTitle {{
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-weight: 600;
                 font-size: 18px;
                 margin-left: 10px;
@@ -585,12 +596,12 @@ class StyleManager:
             /* Stile per GroupBox pulito */
             QGroupBox, QGroupBox#formGroup {{
                 font-weight: 600;
-                color: {StyleManager.COLORS['text_primary']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                color: {text_primary};
+                border: 1px solid {border};
                 border-radius: 8px;
                 margin-top: 20px;
                 padding: 20px 15px 15px 15px;
-                background-color: {StyleManager.COLORS['background']};
+                background-color: {background};
             }}
             
             QGroupBox::title, QGroupBox#formGroup::title {{
@@ -599,8 +610,8 @@ class StyleManager:
                 left: 15px;
                 top: -12px;
                 padding: 4px 8px;
-                background-color: {StyleManager.COLORS['surface']};
-                color: {StyleManager.COLORS['text_secondary']};
+                background-color: {surface};
+                color: {text_secondary};
                 border-radius: 4px;
                 font-weight: 500;
                 font-size: 11px;
@@ -609,25 +620,18 @@ class StyleManager:
             }}
 
             /* Layout e Input */
-            QFormLayout QLabel {{
-                color: {StyleManager.COLORS['text_secondary']};
-                font-weight: 500;
-                font-size: 12px;
-                padding-top: 5px;
-            }}
-            
             QLineEdit, QTextEdit, QPlainTextEdit, QComboBox, QSpinBox {{
-                background-color: {StyleManager.COLORS['background']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                border: 1px solid {border};
                 border-radius: 6px;
                 padding: 10px 12px;
                 font-size: 13px;
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-weight: 400;
             }}
             
             QLineEdit:focus, QTextEdit:focus, QPlainTextEdit:focus, QComboBox:focus, QSpinBox:focus {{
-                border-color: {StyleManager.COLORS['primary']};
+                border-color: {primary};
                 outline: none;
             }}
 
@@ -642,15 +646,15 @@ class StyleManager:
 
             /* Stile per TabWidget */
             QTabWidget::pane {{
-                border: 1px solid {StyleManager.COLORS['border']};
+                border: 1px solid {border};
                 border-radius: 8px;
-                background-color: {StyleManager.COLORS['background']};
+                background-color: {background};
                 margin-top: 5px;
             }}
             
             QTabBar::tab {{
                 background-color: transparent;
-                color: {StyleManager.COLORS['text_secondary']};
+                color: {text_secondary};
                 padding: 10px 20px;
                 margin-right: 2px;
                 border: 1px solid transparent;
@@ -662,68 +666,68 @@ class StyleManager:
             }}
             
             QTabBar::tab:selected {{
-                background-color: {StyleManager.COLORS['background']};
-                color: {StyleManager.COLORS['primary']};
-                border-color: {StyleManager.COLORS['border']};
-                border-bottom-color: {StyleManager.COLORS['background']}; /* Nasconde il bordo inferiore */
+                background-color: {background};
+                color: {primary};
+                border-color: {border};
+                border-bottom-color: {background}; /* Nasconde il bordo inferiore */
             }}
             
             QTabBar::tab:hover:!selected {{
-                background-color: {StyleManager.COLORS['surface_hover']};
-                color: {StyleManager.COLORS['text_primary']};
+                background-color: {surface_hover};
+                color: {text_primary};
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_tree_widget_styles():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_tree_widget_styles(cls):
         """Tree widget pulito"""
-        return f"""
+        return """
             QTreeWidget {{
-                background-color: {StyleManager.COLORS['background']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                border: 1px solid {border};
                 border-radius: 6px;
                 font-size: 12px;
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-weight: 400;
-                alternate-background-color: {StyleManager.COLORS['surface']};
-                font-family: {StyleManager.FONTS['primary']};
+                alternate-background-color: {surface};
             }}
             
             QTreeWidget::item {{
                 padding: 8px;
-                border-bottom: 1px solid {StyleManager.COLORS['border_light']};
+                border-bottom: 1px solid {border_light};
                 border-radius: 0px;
                 margin: 0px;
             }}
             
             QTreeWidget::item:selected {{
-                background-color: {StyleManager.COLORS['primary']};
+                background-color: {primary};
                 color: white;
             }}
             
             QTreeWidget::item:hover {{
-                background-color: {StyleManager.COLORS['surface']};
+                background-color: {surface};
             }}
             
             QHeaderView::section {{
-                background-color: {StyleManager.COLORS['surface']};
+                background-color: {surface};
                 border: none;
-                border-bottom: 1px solid {StyleManager.COLORS['border']};
-                border-right: 1px solid {StyleManager.COLORS['border_light']};
+                border-bottom: 1px solid {border};
+                border-right: 1px solid {border_light};
                 padding: 8px 12px;
                 font-weight: 600;
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-size: 11px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_scrollbar_styles():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_scrollbar_styles(cls):
         """Scrollbar pulite"""
-        return f"""
+        return """
             QScrollBar:vertical {{
-                background-color: {StyleManager.COLORS['surface']};
+                background-color: {surface};
                 width: 12px;
                 border-radius: 6px;
                 margin: 0;
@@ -731,14 +735,14 @@ class StyleManager:
             }}
             
             QScrollBar::handle:vertical {{
-                background-color: {StyleManager.COLORS['border']};
+                background-color: {border};
                 border-radius: 6px;
                 min-height: 20px;
                 margin: 2px;
             }}
             
             QScrollBar::handle:vertical:hover {{
-                background-color: {StyleManager.COLORS['text_muted']};
+                background-color: {text_muted};
             }}
             
             QScrollBar::add-line:vertical,
@@ -754,7 +758,7 @@ class StyleManager:
             }}
             
             QScrollBar:horizontal {{
-                background-color: {StyleManager.COLORS['surface']};
+                background-color: {surface};
                 height: 12px;
                 border-radius: 6px;
                 margin: 0;
@@ -762,44 +766,44 @@ class StyleManager:
             }}
             
             QScrollBar::handle:horizontal {{
-                background-color: {StyleManager.COLORS['border']};
+                background-color: {border};
                 border-radius: 6px;
                 min-width: 20px;
                 margin: 2px;
             }}
             
             QScrollBar::handle:horizontal:hover {{
-                background-color: {StyleManager.COLORS['text_muted']};
+                background-color: {text_muted};
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_status_bar_style():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_status_bar_style(cls):
         """Status bar pulita"""
-        return f"""
+        return """
             QStatusBar {{
-                background-color: {StyleManager.COLORS['surface']};
-                border-top: 1px solid {StyleManager.COLORS['border']};
-                color: {StyleManager.COLORS['text_secondary']};
+                background-color: {surface};
+                border-top: 1px solid {border};
+                color: {text_secondary};
                 font-weight: 500;
                 font-size: 11px;
                 padding: 4px 8px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_menu_bar_style():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_menu_bar_style(cls):
         """Menu bar pulita"""
-        return f"""
+        return """
             QMenuBar {{
-                background-color: {StyleManager.COLORS['background']};
-                border-bottom: 1px solid {StyleManager.COLORS['border']};
-                color: {StyleManager.COLORS['text_primary']};
+                background-color: {background};
+                border-bottom: 1px solid {border};
+                color: {text_primary};
                 font-weight: 500;
                 font-size: 12px;
                 padding: 4px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QMenuBar::item {{
@@ -810,19 +814,18 @@ class StyleManager:
             }}
             
             QMenuBar::item:selected {{
-                background-color: {StyleManager.COLORS['surface']};
-                color: {StyleManager.COLORS['text_primary']};
+                background-color: {surface};
+                color: {text_primary};
             }}
             
             QMenu {{
-                background-color: {StyleManager.COLORS['background']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                border: 1px solid {border};
                 border-radius: 6px;
                 padding: 4px;
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-size: 12px;
                 font-weight: 400;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QMenu::item {{
@@ -833,137 +836,136 @@ class StyleManager:
             }}
             
             QMenu::item:selected {{
-                background-color: {StyleManager.COLORS['primary']};
+                background-color: {primary};
                 color: white;
             }}
             
             QMenu::separator {{
                 height: 1px;
-                background-color: {StyleManager.COLORS['border']};
+                background-color: {border};
                 margin: 4px 8px;
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_progress_styles():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_progress_styles(cls):
         """Progress bar pulita"""
-        return f"""
+        return """
             QProgressBar, QProgressBar#modernProgress {{
-                background-color: {StyleManager.COLORS['surface']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {surface};
+                border: 1px solid {border};
                 border-radius: 6px;
                 text-align: center;
                 font-size: 11px;
                 font-weight: 500;
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 height: 20px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QProgressBar::chunk, QProgressBar#modernProgress::chunk {{
-                background-color: {StyleManager.COLORS['primary']};
+                background-color: {primary};
                 border-radius: 5px;
                 margin: 1px;
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_project_card_styles():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_project_card_styles(cls):
         """Project card pulite"""
-        return f"""
+        return """
             QFrame#projectCard {{
-                background-color: {StyleManager.COLORS['background']};
-                border: 1px solid {StyleManager.COLORS['border']};
+                background-color: {background};
+                border: 1px solid {border};
                 border-radius: 8px;
                 margin: 8px;
                 padding: 4px;
             }}
             
             QFrame#projectCard:hover {{
-                border-color: {StyleManager.COLORS['primary']};
-                background-color: {StyleManager.COLORS['surface']};
+                border-color: {primary};
+                background-color: {surface};
             }}
             
-            QFrame#projectCardSelected {{
-                background-color: {StyleManager.COLORS['primary_light']};
-                border: 2px solid {StyleManager.COLORS['primary']};
-                border-radius: 8px;
-                margin: 8px;
-                padding: 4px;
+            QFrame#projectCard[selected="true"] {{
+                background-color: {primary_light};
+                border: 2px solid {primary};
             }}
             
             QLabel#projectName {{
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-weight: 600;
                 font-size: 14px;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#projectDescription {{
-                color: {StyleManager.COLORS['text_secondary']};
+                color: {text_secondary};
                 font-size: 12px;
                 font-weight: 400;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#projectDate, QLabel#projectFiles {{
-                color: {StyleManager.COLORS['text_muted']};
+                color: {text_muted};
                 font-size: 11px;
                 font-weight: 500;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#projectStatus {{
-                background-color: {StyleManager.COLORS['success']};
+                background-color: {success};
                 color: white;
                 border-radius: 12px;
                 padding: 6px 12px;
                 font-size: 10px;
                 font-weight: 600;
-                font-family: {StyleManager.FONTS['primary']};
             }}
             
             QLabel#projectIcon {{
-                background-color: {StyleManager.COLORS['primary']};
+                background-color: {primary};
                 border-radius: 20px;
                 color: white;
                 font-size: 18px;
                 padding: 8px;
-                font-family: {StyleManager.FONTS['emoji']};
+                font-family: {font_emoji};
             }}
 
             /* Projects Panel Specific */
             QScrollArea#projectsScrollArea {{
-                background-color: {StyleManager.COLORS['surface']};
+                background-color: {surface};
                 border: none;
             }}
             
             QWidget#projectsContainer {{
-                background-color: {StyleManager.COLORS['surface']};
+                background-color: {surface};
             }}
-        """
+        """.format_map(cls._style_values())
     
-    @staticmethod
-    def get_form_styles():
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_form_styles(cls):
         """Stili per form e labels"""
-        return f"""
+        return """
             QFormLayout QLabel {{
-                color: {StyleManager.COLORS['text_primary']};
+                color: {text_primary};
                 font-weight: 500;
                 font-size: 12px;
-                font-family: {StyleManager.FONTS['primary']};
+                padding-top: 5px;
             }}
             
             QLabel {{
-                color: {StyleManager.COLORS['text_primary']};
-                font-family: {StyleManager.FONTS['primary']};
+                color: {text_primary};
             }}
-        """
+        """.format_map(cls._style_values())
     
     @classmethod
+    @lru_cache(maxsize=None)
     def get_complete_stylesheet(cls):
-        """Restituisce il foglio di stile completo PULITO e COERENTE"""
-        return "".join([
+        """Restituisce il foglio di stile completo PULITO e COERENTE
+        
+        Colori e font sono costanti: ogni foglio di stile viene generato una
+        sola volta (per tema), minificato e poi restituito dalla cache.
+        """
+        return _minify_qss("".join([
             cls.get_main_window_style(),
             cls.get_sidebar_style(),
             cls.get_button_styles(),
@@ -978,12 +980,12 @@ class StyleManager:
             cls.get_progress_styles(),
             cls.get_project_card_styles(),
             cls.get_form_styles()
-        ])
+        ]))
 
 
 class DarkTheme(StyleManager):
     """Dark theme color palette."""
-    COLORS = {
+    COLORS = MappingProxyType({
         'primary': '#3498db',
         'primary_hover': '#2980b9',
         'primary_light': '#2c3e50',
@@ -1004,7 +1006,7 @@ class DarkTheme(StyleManager):
         'text_muted': '#7f8c8d',
         'shadow': 'rgba(0, 0, 0, 0.4)',
         'shadow_light': 'rgba(0, 0, 0, 0.2)',
-    }
+    })
 
 class ThemeManager:
     """Gestore semplificato dei temi con coerenza completa"""
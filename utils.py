@@ -8,15 +8,18 @@ import os
 import re
 import sys
 import json
+import time
 import hashlib
 import mimetypes
 import unicodedata
+from collections import Counter
+from functools import lru_cache
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Union, Tuple
+from typing import List, Dict, Any, Optional, Union, Tuple, Iterator
 from PyQt6.QtWidgets import QMessageBox, QApplication
 from PyQt6.QtCore import QTimer, QSize
-from PyQt6.QtGui import QPixmap, QIcon
+from PyQt6.QtGui import QPixmap, QIcon, QFont
 
 
 # ===============================
@@ -44,22 +47,19 @@ def format_timestamp(dt: Optional[datetime] = None, format_type: str = "default"
         return dt.strftime(format_type)
 
 
+_SIZE_NAMES = ("B", "KB", "MB", "GB", "TB")
+
+
 def format_file_size(size_bytes: int) -> str:
     """Formatta la dimensione di un file in formato leggibile"""
     if size_bytes == 0:
         return "0 B"
     
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    import math
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    
-    if i >= len(size_names):
-        i = len(size_names) - 1
-    
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
+    # Esponente di 1024 dal numero di bit (esatto, senza logaritmi in virgola mobile)
+    i = min(max((int(size_bytes).bit_length() - 1) // 10, 0), len(_SIZE_NAMES) - 1)
+    s = round(size_bytes / (1 << (10 * i)), 2)
     
-    return f"{s} {size_names[i]}"
+    return f"{s} {_SIZE_NAMES[i]}"
 
 
 def format_duration(seconds: float) -> str:
@@ -88,18 +88,35 @@ def format_number(number: Union[int, float], precision: int = 2) -> str:
 # STRING UTILITIES
 # ===============================
 
+# Caratteri non validi nei nomi file -> '_', caratteri di controllo rimossi
+_FILENAME_TRANS = {ord(char): '_' for char in '<>:"/\\|?*'}
+_FILENAME_TRANS.update({code: None for code in range(32)})
+
+_WS_RE = re.compile(r'\s+')
+_NONWORD_RE = re.compile(r'[^\w\s-]')
+_WORD_RE = re.compile(r'\b\w+\b')
+
+# Parole comuni da ignorare (stop words italiane)
+_STOP_WORDS = frozenset({
+    'il', 'lo', 'la', 'i', 'gli', 'le', 'un', 'uno', 'una', 'di', 'a', 'da', 
+    'in', 'con', 'su', 'per', 'tra', 'fra', 'e', 'o', 'ma', 'se', 'che', 
+    'chi', 'cui', 'come', 'quando', 'dove', 'mentre', 'quindi', 'però', 
+    'anche', 'ancora', 'più', 'molto', 'tutto', 'ogni', 'alcuni', 'qualche',
+    'essere', 'avere', 'fare', 'dire', 'andare', 'vedere', 'sapere', 'dare',
+    'this', 'that', 'with', 'have', 'will', 'from', 'they', 'know', 'want',
+    'been', 'good', 'much', 'some', 'time', 'very', 'when', 'come', 'here',
+    'just', 'like', 'long', 'make', 'many', 'over', 'such', 'take', 'than',
+    'them', 'well', 'were'
+})
+
+
 def sanitize_filename(filename: str, max_length: int = 255) -> str:
     """Sanitizza un nome file rimuovendo caratteri non validi"""
-    # Rimuovi caratteri non validi
-    invalid_chars = '<>:"/\\|?*'
-    for char in invalid_chars:
-        filename = filename.replace(char, '_')
-    
-    # Rimuovi caratteri di controllo
-    filename = ''.join(char for char in filename if ord(char) >= 32)
+    # Sostituisci caratteri non validi e rimuovi caratteri di controllo
+    filename = filename.translate(_FILENAME_TRANS)
     
     # Normalizza spazi
-    filename = re.sub(r'\s+', ' ', filename.strip())
+    filename = _WS_RE.sub(' ', filename.strip())
     
     # Limita lunghezza
     if len(filename) > max_length:
@@ -124,59 +141,41 @@ def truncate_text(text: str, max_length: int, suffix: str = "...") -> str:
 
 def normalize_text(text: str) -> str:
     """Normalizza un testo rimuovendo diacritici e caratteri speciali"""
-    # Normalizza unicode
-    text = unicodedata.normalize('NFKD', text)
-    
-    # Rimuovi diacritici
-    text = ''.join(c for c in text if not unicodedata.combining(c))
+    # Testo ASCII: niente da normalizzare né diacritici da rimuovere
+    if not text.isascii():
+        # Normalizza unicode
+        text = unicodedata.normalize('NFKD', text)
+        
+        # Rimuovi diacritici
+        text = ''.join(c for c in text if not unicodedata.combining(c))
     
     # Converti a lowercase
     text = text.lower()
     
     # Rimuovi caratteri speciali
-    text = re.sub(r'[^\w\s-]', '', text)
+    text = _NONWORD_RE.sub('', text)
     
     # Normalizza spazi
-    text = re.sub(r'\s+', ' ', text.strip())
+    text = _WS_RE.sub(' ', text.strip())
     
     return text
 
 
 def extract_keywords(text: str, min_length: int = 3, max_keywords: int = 10) -> List[str]:
     """Estrae parole chiave da un testo"""
-    # Parole comuni da ignorare (stop words italiane)
-    stop_words = {
-        'il', 'lo', 'la', 'i', 'gli', 'le', 'un', 'uno', 'una', 'di', 'a', 'da', 
-        'in', 'con', 'su', 'per', 'tra', 'fra', 'e', 'o', 'ma', 'se', 'che', 
-        'chi', 'cui', 'come', 'quando', 'dove', 'mentre', 'quindi', 'però', 
-        'anche', 'ancora', 'più', 'molto', 'tutto', 'ogni', 'alcuni', 'qualche',
-        'essere', 'avere', 'fare', 'dire', 'andare', 'vedere', 'sapere', 'dare',
-        'this', 'that', 'with', 'have', 'will', 'from', 'they', 'know', 'want',
-        'been', 'good', 'much', 'some', 'time', 'very', 'when', 'come', 'here',
-        'just', 'like', 'long', 'make', 'many', 'over', 'such', 'take', 'than',
-        'them', 'well', 'were'
-    }
-    
     # Normalizza testo
     text = normalize_text(text)
     
-    # Estrai parole
-    words = re.findall(r'\b\w+\b', text)
-    
-    # Filtra parole
-    keywords = []
-    word_count = {}
-    
-    for word in words:
+    # Estrai e filtra parole, contando le occorrenze
+    word_count = Counter(
+        word for word in _WORD_RE.findall(text)
         if (len(word) >= min_length and 
-            word not in stop_words and 
-            not word.isdigit()):
-            word_count[word] = word_count.get(word, 0) + 1
-    
-    # Ordina per frequenza
-    sorted_words = sorted(word_count.items(), key=lambda x: x[1], reverse=True)
+            word not in _STOP_WORDS and 
+            not word.isdigit())
+    )
     
-    return [word for word, count in sorted_words[:max_keywords]]
+    # Le più frequenti (a parità, in ordine di apparizione)
+    return [word for word, count in word_count.most_common(max_keywords)]
 
 
 # ===============================
@@ -185,41 +184,55 @@ def extract_keywords(text: str, min_length: int = 3, max_keywords: int = 10) ->
 
 def get_file_hash(file_path: Union[str, Path], algorithm: str = "sha256") -> str:
     """Calcola l'hash di un file"""
-    hash_obj = hashlib.new(algorithm)
-    
     with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b""):
+        # Python 3.11+: lettura e hashing interamente in C
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, algorithm).hexdigest()
+        
+        hash_obj = hashlib.new(algorithm)
+        for chunk in iter(lambda: f.read(1 << 20), b""):
             hash_obj.update(chunk)
     
     return hash_obj.hexdigest()
 
 
+# Estensioni di testo comuni non sempre note a mimetypes
+_TEXT_EXTENSIONS = frozenset({
+    '.txt', '.md', '.py', '.js', '.html', '.css', '.json', '.xml', 
+    '.yaml', '.yml', '.ini', '.cfg', '.conf', '.log', '.csv', 
+    '.sql', '.sh', '.bat', '.ps1', '.dockerfile', '.gitignore'
+})
+
+
+@lru_cache(maxsize=512)
+def _guess_type(suffixes: str) -> Tuple[Optional[str], Optional[str]]:
+    """mimetypes.guess_type in cache: il risultato dipende solo dalle estensioni"""
+    return mimetypes.guess_type("file" + suffixes)
+
+
 def is_text_file(file_path: Union[str, Path]) -> bool:
     """Verifica se un file è di testo"""
-    mime_type, _ = mimetypes.guess_type(str(file_path))
+    path = Path(file_path)
     
-    if mime_type and mime_type.startswith('text/'):
+    # Controlla prima le estensioni comuni (caso più frequente, nessuna lookup)
+    if path.suffix.lower() in _TEXT_EXTENSIONS:
         return True
     
-    # Controlla estensioni comuni
-    text_extensions = {
-        '.txt', '.md', '.py', '.js', '.html', '.css', '.json', '.xml', 
-        '.yaml', '.yml', '.ini', '.cfg', '.conf', '.log', '.csv', 
-        '.sql', '.sh', '.bat', '.ps1', '.dockerfile', '.gitignore'
-    }
-    
-    return Path(file_path).suffix.lower() in text_extensions
+    mime_type, _ = _guess_type("".join(path.suffixes))
+    return bool(mime_type and mime_type.startswith('text/'))
 
 
 def get_file_info(file_path: Union[str, Path]) -> Dict[str, Any]:
     """Ottiene informazioni dettagliate su un file"""
     path = Path(file_path)
     
-    if not path.exists():
+    # Una sola stat: l'assenza del file emerge dall'eccezione
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
         return {"error": "File non trovato"}
     
-    stat = path.stat()
-    mime_type, encoding = mimetypes.guess_type(str(path))
+    mime_type, encoding = _guess_type("".join(path.suffixes))
     
     return {
         "name": path.name,
@@ -234,31 +247,33 @@ def get_file_info(file_path: Union[str, Path]) -> Dict[str, Any]:
         "encoding": encoding,
         "is_text": is_text_file(path),
         "is_hidden": path.name.startswith('.'),
-        "absolute_path": str(path.absolute()),
+        "absolute_path": os.path.abspath(path),
         "parent": str(path.parent)
     }
 
 
+_READ_ENCODINGS = ('utf-8', 'latin-1', 'cp1252', 'iso-8859-1')
+
+
 def safe_read_file(file_path: Union[str, Path], max_size: int = 10 * 1024 * 1024) -> Optional[str]:
     """Legge un file in modo sicuro con limite di dimensione"""
     path = Path(file_path)
     
-    if not path.exists():
-        return None
-    
-    if path.stat().st_size > max_size:
+    # Una sola lettura: le codifiche vengono provate sui byte in memoria
+    try:
+        if path.stat().st_size > max_size:
+            return None
+        data = path.read_bytes()
+    except OSError:
         return None
     
-    encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-    
-    for encoding in encodings:
+    for encoding in _READ_ENCODINGS:
         try:
-            with open(path, 'r', encoding=encoding) as f:
-                return f.read()
+            text = data.decode(encoding)
         except UnicodeDecodeError:
             continue
-        except Exception:
-            break
+        # Newline universali, come la lettura in modalità testo
+        return text.replace('\r\n', '\n').replace('\r', '\n')
     
     return None
 
@@ -276,25 +291,30 @@ def ensure_directory(dir_path: Union[str, Path]) -> bool:
 # VALIDATION UTILITIES
 # ===============================
 
+_URL_RE = re.compile(
+    r'^https?://'  # http:// o https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain
+    r'localhost|'  # localhost
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # IP
+    r'(?::\d+)?'  # porta opzionale
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
+_EMAIL_RE = re.compile(
+    r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+)
+
+
 def is_valid_url(url: str) -> bool:
     """Verifica se un URL è valido"""
-    url_pattern = re.compile(
-        r'^https?://'  # http:// o https://
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain
-        r'localhost|'  # localhost
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # IP
-        r'(?::\d+)?'  # porta opzionale
-        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-    
-    return bool(url_pattern.match(url))
+    # Scarto rapido senza regex: lo schema deve essere http(s)
+    if not url[:8].lower().startswith(('http://', 'https://')):
+        return False
+    return bool(_URL_RE.match(url))
 
 
 def is_valid_email(email: str) -> bool:
     """Verifica se un'email è valida"""
-    email_pattern = re.compile(
-        r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    )
-    return bool(email_pattern.match(email))
+    return '@' in email and bool(_EMAIL_RE.match(email))
 
 
 def validate_json(json_string: str) -> Tuple[bool, Optional[str]]:
@@ -364,8 +384,17 @@ def center_window(window, parent=None):
         window.move(x, y)
 
 
+@lru_cache(maxsize=None)
+def get_font(point_size: int, weight: QFont.Weight = QFont.Weight.Normal,
+             family: str = "Segoe UI") -> QFont:
+    """Restituisce un QFont condiviso, creato una sola volta per combinazione di parametri"""
+    # Creazione lazy: un QFont richiede che la QApplication esista già
+    return QFont(family, point_size, weight)
+
+
+@lru_cache(maxsize=8)
 def get_app_icon(size: int = 32) -> QIcon:
-    """Restituisce l'icona dell'applicazione"""
+    """Restituisce l'icona dell'applicazione, creata una sola volta per dimensione"""
     # Crea un'icona semplice se non esiste un file
     pixmap = QPixmap(size, size)
     pixmap.fill()  # Riempie di bianco
@@ -429,16 +458,17 @@ class Timer:
     
     def start(self):
         """Inizia il timer"""
-        self.start_time = datetime.now()
+        # Orologio monotono ad alta risoluzione, non influenzato da cambi d'ora
+        self.start_time = time.perf_counter()
     
     def stop(self):
         """Ferma il timer"""
-        self.end_time = datetime.now()
+        self.end_time = time.perf_counter()
     
     def elapsed(self) -> float:
         """Restituisce il tempo trascorso in secondi"""
-        if self.start_time and self.end_time:
-            return (self.end_time - self.start_time).total_seconds()
+        if self.start_time is not None and self.end_time is not None:
+            return self.end_time - self.start_time
         return 0.0
     
     def elapsed_formatted(self) -> str:
@@ -457,19 +487,23 @@ def debounce(wait_time: int):
     """Decorator per debounce di funzioni"""
     def decorator(func):
         timer = None
+        pending = ((), {})
+        
+        def call_func():
+            args, kwargs = pending
+            func(*args, **kwargs)
         
         def debounced(*args, **kwargs):
-            nonlocal timer
+            nonlocal timer, pending
+            pending = (args, kwargs)
             
-            def call_func():
-                func(*args, **kwargs)
+            # Un solo timer per funzione, creato alla prima chiamata:
+            # start() su un timer attivo lo fa ripartire da capo
+            if timer is None:
+                timer = QTimer()
+                timer.setSingleShot(True)
+                timer.timeout.connect(call_func)
             
-            if timer:
-                timer.stop()
-            
-            timer = QTimer()
-            timer.setSingleShot(True)
-            timer.timeout.connect(call_func)
             timer.start(wait_time)
         
         return debounced
@@ -495,22 +529,35 @@ def deep_merge_dicts(dict1: Dict, dict2: Dict) -> Dict:
 
 def flatten_dict(d: Dict, parent_key: str = '', sep: str = '.') -> Dict:
     """Appiattisce un dizionario annidato"""
-    items = []
-    
-    for k, v in d.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        
-        if isinstance(v, dict):
-            items.extend(flatten_dict(v, new_key, sep=sep).items())
+    result = {}
+    # Visita iterativa in profondità: una pila di iteratori mantiene l'ordine
+    # delle chiavi senza ricorsione né dizionari intermedi
+    stack = [(parent_key, iter(d.items()))]
+    
+    while stack:
+        prefix, items = stack[-1]
+        for k, v in items:
+            new_key = f"{prefix}{sep}{k}" if prefix else k
+            
+            if isinstance(v, dict):
+                stack.append((new_key, iter(v.items())))
+                break
+            result[new_key] = v
         else:
-            items.append((new_key, v))
+            stack.pop()
     
-    return dict(items)
+    return result
+
+
+def iter_chunks(lst: List, chunk_size: int) -> Iterator[List]:
+    """Come chunk_list, ma produce i chunk uno alla volta senza materializzarli"""
+    for i in range(0, len(lst), chunk_size):
+        yield lst[i:i + chunk_size]
 
 
 def chunk_list(lst: List, chunk_size: int) -> List[List]:
     """Divide una lista in chunk di dimensione specifica"""
-    return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
+    return list(iter_chunks(lst, chunk_size))
 
 
 # ===============================
@@ -525,10 +572,19 @@ class SimpleLogger:
         self.level = level
         self.levels = {"DEBUG": 0, "INFO": 1, "WARNING": 2, "ERROR": 3}
         self.current_level = self.levels.get(level, 1)
+        
+        # I livelli sotto soglia diventano no-op: nessun controllo per chiamata
+        for name, value in self.levels.items():
+            if value < self.current_level:
+                setattr(self, name.lower(), self._discard)
+    
+    @staticmethod
+    def _discard(message: str):
+        pass
     
     def _log(self, level: str, message: str):
         if self.levels.get(level, 1) >= self.current_level:
-            timestamp = format_timestamp(format_type="display")
+            timestamp = time.strftime("%d/%m/%Y %H:%M")
             print(f"[{timestamp}] {level:7} {self.name}: {message}")
     
     def debug(self, message: str):
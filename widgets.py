@@ -6,14 +6,29 @@ Componenti UI riutilizzabili e ottimizzati con stile coerente
 
 import os
 import math
-from datetime import datetime
+import time
 from PyQt6.QtWidgets import (
     QFrame, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, 
     QPushButton, QWidget, QScrollArea, QSizePolicy, QProgressBar,
     QPlainTextEdit, QSizePolicy
 )
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QSize, QPropertyAnimation, QEasingCurve
-from PyQt6.QtGui import QFont, QTextCursor, QPixmap, QPainter, QColor
+from PyQt6.QtGui import QFont, QTextCursor, QPixmap, QPainter, QColor, QBrush, QPen
+
+from utils import get_font
+
+
+# Ultimo timestamp formattato: (secondo epoch, "HH:MM:SS")
+_last_timestamp = (None, "")
+
+
+def current_timestamp() -> str:
+    """Ora corrente come HH:MM:SS, formattata una sola volta per secondo"""
+    global _last_timestamp
+    second = int(time.time())
+    if _last_timestamp[0] != second:
+        _last_timestamp = (second, time.strftime("%H:%M:%S", time.localtime(second)))
+    return _last_timestamp[1]
 
 
 class AnimatedWidget(QWidget):
@@ -23,45 +38,49 @@ class AnimatedWidget(QWidget):
         super().__init__(parent)
         self.animation = None
         
-    def fade_in(self, duration=300):
-        """Animazione di fade in"""
-        if self.animation:
+    def _animate_opacity(self, duration, start, end, easing):
+        """Avvia l'animazione di opacità, riusando sempre la stessa istanza"""
+        if self.animation is None:
+            self.animation = QPropertyAnimation(self, b"windowOpacity", self)
+        else:
             self.animation.stop()
-            
-        self.animation = QPropertyAnimation(self, b"windowOpacity")
+        
         self.animation.setDuration(duration)
-        self.animation.setStartValue(0.0)
-        self.animation.setEndValue(1.0)
-        self.animation.setEasingCurve(QEasingCurve.Type.OutCubic)
+        self.animation.setStartValue(start)
+        self.animation.setEndValue(end)
+        self.animation.setEasingCurve(easing)
         self.animation.start()
     
+    def fade_in(self, duration=300):
+        """Animazione di fade in"""
+        self._animate_opacity(duration, 0.0, 1.0, QEasingCurve.Type.OutCubic)
+    
     def fade_out(self, duration=300):
         """Animazione di fade out"""
-        if self.animation:
-            self.animation.stop()
-            
-        self.animation = QPropertyAnimation(self, b"windowOpacity")
-        self.animation.setDuration(duration)
-        self.animation.setStartValue(1.0)
-        self.animation.setEndValue(0.0)
-        self.animation.setEasingCurve(QEasingCurve.Type.InCubic)
-        self.animation.start()
+        self._animate_opacity(duration, 1.0, 0.0, QEasingCurve.Type.InCubic)
 
 
 class MessageWidget(AnimatedWidget):
     """Widget ottimizzato per visualizzare i messaggi della chat"""
     
+    # Intervallo minimo tra due setText durante lo streaming (~60fps)
+    FLUSH_INTERVAL_MS = 16
+    # Prefissi dell'header per ruolo (utente / assistente)
+    HEADER_PREFIX = {True: "👤 Tu • ", False: "🤖 Assistente • "}
+    
     def __init__(self, message: str, is_user: bool = True, 
                  timestamp: str = None, settings: dict = None, parent=None):
         super().__init__(parent)
         self.message = message
         self.is_user = is_user
-        self.timestamp = timestamp or datetime.now().strftime("%H:%M:%S")
+        self.timestamp = timestamp or current_timestamp()
         self.settings = settings or {}
         self.is_streaming = False
+        # Timer per raggruppare gli aggiornamenti di streaming (creato al primo uso)
+        self._flush_timer = None
+        self._faded_in = False
         
         self.setup_ui()
-        self.fade_in(200)
     
     def setup_ui(self):
         """Configura l'interfaccia del widget messaggio"""
@@ -76,6 +95,7 @@ class MessageWidget(AnimatedWidget):
         message_container = QFrame()
         message_container.setObjectName("messageContainer")
         container_layout = QVBoxLayout(message_container)
+        self.container_layout = container_layout
         container_layout.setContentsMargins(15, 12, 15, 12)
         container_layout.setSpacing(8)
         
@@ -89,6 +109,8 @@ class MessageWidget(AnimatedWidget):
         self.content_label.setObjectName(
             "userMessageContent" if self.is_user else "messageContent"
         )
+        # Testo semplice: nessun rilevamento rich text né QTextDocument a ogni setText
+        self.content_label.setTextFormat(Qt.TextFormat.PlainText)
         self.content_label.setWordWrap(True)
         self.content_label.setTextInteractionFlags(
             Qt.TextInteractionFlag.TextSelectableByMouse | 
@@ -98,34 +120,33 @@ class MessageWidget(AnimatedWidget):
         
         # Font basato sulle impostazioni - usa Segoe UI coerentemente
         font_size = self.settings.get("font_size", 13)
-        font = QFont("Segoe UI", font_size, QFont.Weight.Normal)
+        font = get_font(font_size, QFont.Weight.Normal)
         self.content_label.setFont(font)
         
         container_layout.addWidget(self.content_label)
         
-        # Indicatore di stato per messaggi in streaming
-        self.status_indicator = QLabel()
-        self.status_indicator.setObjectName("statusIndicator")
-        self.status_indicator.setVisible(False)
-        # Usa colori coerenti con il sistema
-        self.status_indicator.setStyleSheet("""
-            QLabel#statusIndicator {
-                color: #059669;
-                font-size: 11px;
-                font-weight: 500;
-                padding: 4px 8px;
-                background-color: rgba(5, 150, 105, 0.1);
-                border-radius: 4px;
-                border: 1px solid rgba(5, 150, 105, 0.2);
-            }
-        """)
-        container_layout.addWidget(self.status_indicator)
+        # Indicatore di stato per messaggi in streaming: creato solo
+        # quando lo streaming inizia (mai per i messaggi dell'utente)
+        self.status_indicator = None
         
         layout.addWidget(message_container)
         
         # Imposta politiche di dimensionamento
         self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
     
+    def showEvent(self, event):
+        """Dissolvenza alla prima comparsa effettiva del messaggio
+        
+        windowOpacity agisce solo sulle finestre di primo livello: per i
+        messaggi inseriti nell'area chat l'animazione non avrebbe effetti
+        visibili, quindi viene avviata solo se il widget è una finestra.
+        """
+        super().showEvent(event)
+        if not self._faded_in:
+            self._faded_in = True
+            if self.isWindow():
+                self.fade_in(200)
+    
     def create_header(self):
         """Crea l'header del messaggio con timestamp"""
         header = QLabel()
@@ -133,30 +154,50 @@ class MessageWidget(AnimatedWidget):
             "userMessageHeader" if self.is_user else "messageHeader"
         )
         
-        role_text = "👤 Tu" if self.is_user else "🤖 Assistente"
-        header_text = f"{role_text} • {self.timestamp}"
-        
-        header.setText(header_text)
+        header.setTextFormat(Qt.TextFormat.PlainText)
+        header.setText(self.HEADER_PREFIX[self.is_user] + self.timestamp)
         # Font coerente con il sistema
-        header.setFont(QFont("Segoe UI", 10, QFont.Weight.DemiBold))
+        header.setFont(get_font(10, QFont.Weight.DemiBold))
         
         return header
     
     def update_content(self, new_content: str):
-        """Aggiorna il contenuto del messaggio (per streaming)"""
+        """Aggiorna il contenuto del messaggio (per streaming)
+        
+        Il testo viene applicato alla label al massimo una volta per frame:
+        aggiornamenti ravvicinati si fondono nell'ultimo.
+        """
         self.message = new_content
-        self.content_label.setText(new_content)
+        if self._flush_timer is None:
+            self._flush_timer = QTimer(self)
+            self._flush_timer.setSingleShot(True)
+            self._flush_timer.timeout.connect(self._flush_content)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start(self.FLUSH_INTERVAL_MS)
         
         # Mostra indicatore di streaming
         if not self.is_streaming and not self.is_user:
             self.is_streaming = True
-            self.status_indicator.setText("⌛ Generando...")
+            if self.status_indicator is None:
+                self.status_indicator = QLabel("⌛ Generando...")
+                self.status_indicator.setObjectName("statusIndicator")
+                # Stile da QLabel#statusIndicator nel foglio di stile dell'applicazione
+                self.container_layout.addWidget(self.status_indicator)
             self.status_indicator.setVisible(True)
     
+    def _flush_content(self):
+        """Applica alla label il testo più recente"""
+        self.content_label.setText(self.message)
+    
     def finalize_message(self):
         """Finalizza il messaggio (fine streaming)"""
+        # Applica subito l'eventuale ultimo aggiornamento ancora in attesa
+        if self._flush_timer is not None and self._flush_timer.isActive():
+            self._flush_timer.stop()
+            self._flush_content()
         self.is_streaming = False
-        self.status_indicator.setVisible(False)
+        if self.status_indicator is not None:
+            self.status_indicator.setVisible(False)
     
     def get_message_data(self):
         """Restituisce i dati del messaggio per il salvataggio"""
@@ -170,9 +211,13 @@ class MessageWidget(AnimatedWidget):
         """Imposta lo stato di errore per il messaggio"""
         if not self.is_user:
             error_text = error_message or "❌ Errore nella generazione"
+            if self._flush_timer is not None:
+                self._flush_timer.stop()
             self.content_label.setText(error_text)
-            # Usa colore di errore coerente
-            self.content_label.setStyleSheet("color: #dc2626; font-weight: 500;")
+            # Colore di errore dal foglio di stile: QLabel#messageContent[error="true"]
+            self.content_label.setProperty("error", True)
+            self.content_label.style().unpolish(self.content_label)
+            self.content_label.style().polish(self.content_label)
             self.finalize_message()
 
 
@@ -181,16 +226,21 @@ class ProjectCard(AnimatedWidget):
     
     clicked = pyqtSignal(object)  # Emesso quando la card viene cliccata
     
+    # Testo del conteggio file
+    FILES_TEMPLATE = "📄 %d file"
+    
     def __init__(self, project_data: dict, parent=None):
         super().__init__(parent)
         self.project_data = project_data
         self.is_selected = False
+        self._files_count = 0
         self.setup_ui()
         self.fade_in(150)
     
     def setup_ui(self):
         """Configura l'interfaccia della card"""
         self.setObjectName("projectCard")
+        self.setProperty("selected", False)
         self.setFixedHeight(140)
         self.setCursor(Qt.CursorShape.PointingHandCursor)
         
@@ -215,7 +265,8 @@ class ProjectCard(AnimatedWidget):
         # Nome progetto - usa font coerente
         name_label = QLabel(self.project_data['name'])
         name_label.setObjectName("projectName")
-        name_font = QFont("Segoe UI", 14, QFont.Weight.DemiBold)
+        name_label.setTextFormat(Qt.TextFormat.PlainText)
+        name_font = get_font(14, QFont.Weight.DemiBold)
         name_label.setFont(name_font)
         name_label.setWordWrap(True)
         
@@ -224,10 +275,11 @@ class ProjectCard(AnimatedWidget):
         
         desc_label = QLabel(desc_text)
         desc_label.setObjectName("projectDescription")
+        desc_label.setTextFormat(Qt.TextFormat.PlainText)
         desc_label.setWordWrap(True)
         desc_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
         desc_label.setMaximumHeight(35)
-        desc_label.setFont(QFont("Segoe UI", 11, QFont.Weight.Normal))
+        desc_label.setFont(get_font(11, QFont.Weight.Normal))
         
         info_layout.addWidget(name_label)
         info_layout.addWidget(desc_label)
@@ -235,7 +287,7 @@ class ProjectCard(AnimatedWidget):
         # Badge stato - usa colori coerenti
         status_badge = QLabel("🟢 Attivo")
         status_badge.setObjectName("projectStatus")
-        status_badge.setFont(QFont("Segoe UI", 10, QFont.Weight.DemiBold))
+        status_badge.setFont(get_font(10, QFont.Weight.DemiBold))
         
         header_layout.addWidget(icon_label)
         header_layout.addLayout(info_layout)
@@ -254,36 +306,28 @@ class ProjectCard(AnimatedWidget):
         
         date_label = QLabel(f"📅 {created_date}")
         date_label.setObjectName("projectDate")
-        date_label.setFont(QFont("Segoe UI", 10, QFont.Weight.Normal))
+        date_label.setFont(get_font(10, QFont.Weight.Normal))
         
         # File count (sarà aggiornato dal genitore)
-        self.files_label = QLabel("📄 0 file")
+        self.files_label = QLabel(self.FILES_TEMPLATE % 0)
         self.files_label.setObjectName("projectFiles")
-        self.files_label.setFont(QFont("Segoe UI", 10, QFont.Weight.Normal))
+        self.files_label.setFont(get_font(10, QFont.Weight.Normal))
         
         footer_layout.addWidget(date_label)
         footer_layout.addStretch()
         footer_layout.addWidget(self.files_label)
         
         layout.addLayout(footer_layout)
-        
-        # Applica stili dal sistema centralizzato
-        self.update_style()
-        # Force style refresh per assicurarsi che vengano applicati
-        self.style().unpolish(self)
-        self.style().polish(self)
     
     def update_style(self):
         """Aggiorna lo stile della card basato sullo stato di selezione"""
-        if self.is_selected:
-            self.setObjectName("projectCardSelected")
-        else:
-            self.setObjectName("projectCard")
+        # Proprietà dinamica: il foglio di stile usa [selected="true"]
+        self.setProperty("selected", self.is_selected)
         
-        # Forza l'aggiornamento del stylesheet
-        parent_widget = self.parent()
-        if parent_widget:
-            parent_widget.setStyleSheet(parent_widget.styleSheet())
+        # Riapplica le regole del foglio di stile solo a questa card
+        # (senza rianalizzare il foglio di stile del contenitore)
+        self.style().unpolish(self)
+        self.style().polish(self)
     
     def set_selected(self, selected: bool):
         """Imposta lo stato di selezione della card"""
@@ -292,12 +336,19 @@ class ProjectCard(AnimatedWidget):
     
     def update_files_count(self, count: int):
         """Aggiorna il conteggio dei file"""
-        self.files_label.setText(f"📄 {count} file")
+        # Stesso conteggio: niente nuovo testo né relayout della label
+        if count == self._files_count:
+            return
+        self._files_count = count
+        self.files_label.setText(self.FILES_TEMPLATE % count)
     
     def mousePressEvent(self, event):
         """Gestisce il click sulla card"""
         if event.button() == Qt.MouseButton.LeftButton:
+            # Click gestito qui: l'evento non viene propagato al contenitore
             self.clicked.emit(self)
+            event.accept()
+            return
         super().mousePressEvent(event)
 
 
@@ -307,22 +358,50 @@ class LoadingIndicator(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.angle = 0
-        self.timer = QTimer()
+        self.running = False
+        self.timer = QTimer(self)
         self.timer.timeout.connect(self.rotate)
         self.setFixedSize(40, 40)
         # Usa colore primario coerente
         self.primary_color = QColor(37, 99, 235)  # #2563eb
+        # Colori dei punti (alpha crescente) calcolati una volta sola
+        self._dot_colors = [
+            QColor(self.primary_color.red(), self.primary_color.green(),
+                   self.primary_color.blue(), int(255 * (i + 1) / 8))
+            for i in range(8)
+        ]
+        # Pennelli e penne già pronti: nessuna conversione da QColor nel paintEvent
+        self._dot_styles = [(QBrush(color), QPen(color)) for color in self._dot_colors]
+        # Posizioni dei punti (a 45° l'uno dall'altro) con rotazione nulla
+        self._dot_offsets = [
+            (math.cos(math.radians(i * 45)), math.sin(math.radians(i * 45)))
+            for i in range(8)
+        ]
     
     def start(self):
         """Avvia l'animazione"""
-        self.timer.start(50)
+        self.running = True
         self.show()
+        # Già visibile (nessun showEvent) oppure appena mostrato
+        if self.isVisible():
+            self.timer.start(50)
     
     def stop(self):
         """Ferma l'animazione"""
-        self.timer.stop()
+        self.running = False
         self.hide()
     
+    def showEvent(self, event):
+        """Il timer gira solo mentre l'indicatore è visibile"""
+        super().showEvent(event)
+        if self.running:
+            self.timer.start(50)
+    
+    def hideEvent(self, event):
+        """Nessun ridisegno mentre l'indicatore è nascosto"""
+        super().hideEvent(event)
+        self.timer.stop()
+    
     def rotate(self):
         """Ruota l'indicatore"""
         self.angle = (self.angle + 10) % 360
@@ -335,20 +414,22 @@ class LoadingIndicator(QWidget):
         
         # Centro
         center = self.rect().center()
-        radius = min(self.width(), self.height()) // 2 - 5
+        cx, cy = center.x(), center.y()
+        radius = (min(self.width(), self.height()) // 2 - 5) * 0.7
+        
+        # Rotazione corrente: un solo cos/sin per frame
+        angle = math.radians(self.angle)
+        rot_cos = radius * math.cos(angle)
+        rot_sin = radius * math.sin(angle)
         
         # Disegna i punti
-        for i in range(8):
-            angle = (self.angle + i * 45) * 3.14159 / 180
-            x = center.x() + radius * 0.7 * cos(angle)
-            y = center.y() + radius * 0.7 * sin(angle)
+        for (dx, dy), (brush, pen) in zip(self._dot_offsets, self._dot_styles):
+            x = cx + rot_cos * dx - rot_sin * dy
+            y = cy + rot_sin * dx + rot_cos * dy
             
-            # Alpha basato sulla posizione
-            alpha = int(255 * (i + 1) / 8)
-            color = QColor(self.primary_color.red(), self.primary_color.green(), 
-                          self.primary_color.blue(), alpha)
-            painter.setBrush(color)
-            painter.setPen(color)
+            # Alpha basato sulla posizione (precalcolato)
+            painter.setBrush(brush)
+            painter.setPen(pen)
             
             painter.drawEllipse(int(x-3), int(y-3), 6, 6)
 
@@ -362,7 +443,7 @@ class CustomProgressBar(QProgressBar):
         self.setTextVisible(True)
         self.setAlignment(Qt.AlignmentFlag.AlignCenter)
         # Font coerente
-        self.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        self.setFont(get_font(11, QFont.Weight.Medium))
 
 
 class CollapsibleSection(QWidget):
@@ -385,7 +466,7 @@ class CollapsibleSection(QWidget):
         self.header = QPushButton(f"▼ {self.title}")
         self.header.setObjectName("sectionHeader")
         # Font coerente
-        self.header.setFont(QFont("Segoe UI", 12, QFont.Weight.DemiBold))
+        self.header.setFont(get_font(12, QFont.Weight.DemiBold))
         self.header.clicked.connect(self.toggle_expanded)
         
         # Contenuto
@@ -425,7 +506,7 @@ class CollapsibleSection(QWidget):
         self.animation.setEasingCurve(QEasingCurve.Type.OutCubic)
         
         if expanded:
-            # Espandi
+            # Espandi: altezza ricalcolata ogni volta, il contenuto può essere cambiato
             self.content_widget.setMaximumHeight(0)
             self.animation.setStartValue(0)
             self.animation.setEndValue(self.content_widget.sizeHint().height())
@@ -448,49 +529,22 @@ class SmartScrollArea(QScrollArea):
         self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
         self.setFrameStyle(QFrame.Shape.NoFrame)
         
-        # Timer per smooth scrolling
-        self.scroll_timer = QTimer()
-        self.scroll_timer.timeout.connect(self.smooth_scroll_step)
-        self.target_value = 0
-        self.current_value = 0
-        self.scroll_speed = 0
+        # Smooth scrolling interpolato da Qt (nessun passo in Python per frame)
+        self.scroll_animation = QPropertyAnimation(self.verticalScrollBar(), b"value", self)
+        self.scroll_animation.setDuration(200)
+        self.scroll_animation.setEasingCurve(QEasingCurve.Type.OutCubic)
     
     def smooth_scroll_to_bottom(self):
         """Scorre dolcemente fino in fondo"""
         scrollbar = self.verticalScrollBar()
-        self.target_value = scrollbar.maximum()
-        self.current_value = scrollbar.value()
+        self.scroll_animation.stop()
         
-        if self.target_value != self.current_value:
-            self.scroll_speed = max(1, abs(self.target_value - self.current_value) // 10)
-            self.scroll_timer.start(16)  # ~60fps
-    
-    def smooth_scroll_step(self):
-        """Step dell'animazione di scroll"""
-        scrollbar = self.verticalScrollBar()
-        
-        if self.current_value < self.target_value:
-            self.current_value = min(self.target_value, self.current_value + self.scroll_speed)
-        elif self.current_value > self.target_value:
-            self.current_value = max(self.target_value, self.current_value - self.scroll_speed)
-        
-        scrollbar.setValue(int(self.current_value))
-        
-        if self.current_value == self.target_value:
-            self.scroll_timer.stop()
+        if scrollbar.value() != scrollbar.maximum():
+            self.scroll_animation.setStartValue(scrollbar.value())
+            self.scroll_animation.setEndValue(scrollbar.maximum())
+            self.scroll_animation.start()
     
     def scroll_to_bottom(self):
         """Scorre immediatamente in fondo"""
         scrollbar = self.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
-
-
-def cos(angle):
-    """Coseno per l'indicatore di caricamento"""
-    import math
-    return math.cos(angle)
-
-def sin(angle):
-    """Seno per l'indicatore di caricamento"""
-    import math
-    return math.sin(angle)
\ No newline at end of file